@@ -0,0 +1,310 @@
+"""
+Benchmark for the Markdown → HTML → PDF pipeline.
+
+Times parsing, template rendering and PDF generation separately for the
+examples/*.md files and for synthetic documents of 1, 10, 100 and 1000 pages
+with each of the five presets from examples/config.yaml. Runs headless.
+
+    python3 benchmark.py                       # run, write benchmark_results.json
+    python3 benchmark.py --save-baseline       # also store the run as the baseline
+    python3 benchmark.py --pages 1 10 --repeat 5 --skip-pdf
+    python3 benchmark.py --startup-only        # only time application startup
+
+With --startup (or --startup-only) the application is also launched --repeat
+times with --measure-startup to time its startup stages (imports, window,
+first_paint, ready, warm_up), and once with -X importtime for an import profile.
+
+Each run is compared against benchmark_baseline.json if it exists; the exit code
+is 1 if any stage is slower than the baseline by more than --threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import yaml
+
+from md2quote.core.parser import MarkdownParser
+from md2quote.core.renderer import TemplateRenderer, build_context, page_margins
+from md2quote.core.fonts import font_cache
+
+DEFAULT_RESULTS = ROOT / "benchmark_results.json"
+DEFAULT_BASELINE = ROOT / "benchmark_baseline.json"
+DEFAULT_PAGES = [1, 10, 100, 1000]
+PRESETS = ["preset_1", "preset_2", "preset_3", "preset_4", "preset_5"]
+STAGES = ["parse", "render", "pdf"]
+STARTUP_STAGES = ["imports", "window", "first_paint", "ready", "warm_up"]
+
+# Imports listed in the startup import profile
+IMPORT_PROFILE_SIZE = 15
+
+STARTUP_TIMEOUT = 120
+
+# Stages faster than this in both runs are too noisy to report as regressions
+MIN_COMPARABLE_MS = 1.0
+
+
+def synthetic_document(pages: int) -> str:
+    """Returns a deterministic quotation with the given number of +++ separated pages."""
+    parts = [
+        "---",
+        "quotation:",
+        "  number: BENCH-0001",
+        "  date: 2025-01-01",
+        "client:",
+        "  institution: Benchmark Ltd.",
+        "  contact: Jane Doe",
+        "  email: jane@example.com",
+        "---",
+        "",
+    ]
+    for page in range(1, pages + 1):
+        parts += [
+            f"## Phase {page}: Implementation",
+            "",
+            f"This phase covers **scope item {page}** with *detailed* planning, "
+            "implementation and review. See https://example.com for the `spec`.",
+            "",
+            "- Requirements workshop",
+            "- Architecture and design",
+            "  - Data model",
+            "  - Interfaces",
+            "- Delivery and ~~handover~~ acceptance",
+            "",
+            "| Item | Hours | Rate | Total |",
+            "|------|------:|-----:|------:|",
+        ]
+        for row in range(1, 9):
+            parts.append(f"| Task {page}.{row} | {row * 2} | 95.00 | {row * 190:.2f} |")
+        parts += [
+            "",
+            "> Prices exclude VAT.",
+            "",
+            "```python",
+            f"def phase_{page}():",
+            "    return 'done'",
+            "```",
+            "",
+        ]
+        if page < pages:
+            parts += ["+++", ""]
+    return "\n".join(parts)
+
+
+def load_presets() -> dict:
+    with open(ROOT / "examples" / "config.yaml", 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)['presets']
+
+
+def _time(func, repeat: int) -> tuple[float, object]:
+    """Returns the median duration in ms over repeat calls and the last result."""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+class Benchmark:
+    def __init__(self, repeat: int, with_pdf: bool):
+        self.repeat = repeat
+        self.renderer = TemplateRenderer(use_bytecode_cache=False)
+        self.pdf_generator = None
+        if with_pdf:
+            from PyQt6.QtWidgets import QApplication
+            from md2quote.core.pdf import PDFGenerator
+            self.app = QApplication.instance() or QApplication([sys.argv[0]])
+            self.pdf_generator = PDFGenerator()
+
+    def run_case(self, text: str, preset: dict) -> dict:
+        parser = MarkdownParser()
+        parse_ms, (metadata, html_body) = _time(lambda: parser.parse_text(text), self.repeat)
+
+        context = build_context(metadata, html_body, preset)
+        render = lambda: self.renderer.render("base", context, preset_config=context)
+        render()  # Template compilation is not part of the steady-state timing
+        render_ms, full_html = _time(render, self.repeat)
+
+        result = {'parse': round(parse_ms, 3), 'render': round(render_ms, 3), 'html_bytes': len(full_html)}
+
+        if self.pdf_generator:
+            self.pdf_generator.set_margins(page_margins(context, (20, 20, 20, 20)))
+            pdf_ms, pdf_bytes = _time(lambda: self.pdf_generator.generate_bytes(full_html), self.repeat)
+            result['pdf'] = round(pdf_ms, 3)
+            result['pdf_bytes'] = len(pdf_bytes)
+
+        return result
+
+
+def _launch_app(extra_args: list = ()) -> subprocess.CompletedProcess:
+    """Starts the GUI with --measure-startup; it exits on its own once startup is complete."""
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    return subprocess.run(
+        [sys.executable, *extra_args, str(ROOT / "main.py"), "--measure-startup"],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=STARTUP_TIMEOUT
+    )
+
+
+def _startup_marks(stdout: str) -> dict:
+    for line in reversed(stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    raise RuntimeError("The application did not report its startup times")
+
+
+def import_profile(stderr: str) -> list:
+    """Returns the imports of an -X importtime log, highest cumulative time first."""
+    entries = []
+    for line in stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        entries.append({'module': name.strip(), 'cumulative_ms': round(int(cumulative_us) / 1000, 1)})
+    entries.sort(key=lambda e: e['cumulative_ms'], reverse=True)
+    return entries[:IMPORT_PROFILE_SIZE]
+
+
+def measure_startup(repeat: int) -> tuple[dict, list]:
+    """Returns the median startup marks over repeat launches and an import profile."""
+    samples = {stage: [] for stage in STARTUP_STAGES}
+    for _ in range(repeat):
+        result = _launch_app()
+        if result.returncode != 0:
+            raise RuntimeError(f"Application exited with {result.returncode}:\n{result.stderr[-2000:]}")
+        marks = _startup_marks(result.stdout)
+        for stage in STARTUP_STAGES:
+            if stage in marks:
+                samples[stage].append(marks[stage])
+
+    medians = {stage: round(statistics.median(values), 3) for stage, values in samples.items() if values}
+    profile = import_profile(_launch_app(["-X", "importtime"]).stderr)
+    return medians, profile
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(args) -> dict:
+    cases = {}
+    results = {}
+
+    if args.startup or args.startup_only:
+        # Before this process loads Qt, so the launches do not compete with it
+        print("startup ...", flush=True)
+        cases['startup'], results['import_profile'] = measure_startup(args.repeat)
+        for entry in results['import_profile']:
+            print(f"  {entry['cumulative_ms']:>8.1f}ms  {entry['module']}")
+
+    if not args.startup_only:
+        presets = load_presets()
+        bench = Benchmark(repeat=args.repeat, with_pdf=not args.skip_pdf)
+
+        for example in sorted((ROOT / "examples").glob("*.md")):
+            text = example.read_text(encoding='utf-8')
+            name = f"example/{example.stem}"
+            print(f"{name} ...", flush=True)
+            cases[name] = bench.run_case(text, presets['preset_1'])
+
+        for pages in args.pages:
+            text = synthetic_document(pages)
+            for preset_key in PRESETS:
+                name = f"synthetic/{pages}p/{preset_key}"
+                print(f"{name} ...", flush=True)
+                cases[name] = bench.run_case(text, presets[preset_key])
+
+    return {
+        **results,
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'cases': cases,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Prints a comparison table and returns (case, stage, ratio) for regressions."""
+    regressions = []
+    print(f"\n{'case':<34} {'stage':<7} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in results['cases'].items():
+        previous = baseline.get('cases', {}).get(name)
+        if not previous:
+            continue
+        for stage in STAGES + STARTUP_STAGES:
+            if stage not in current or not previous.get(stage):
+                continue
+            ratio = current[stage] / previous[stage]
+            marker = ""
+            if ratio > 1 + threshold and current[stage] >= MIN_COMPARABLE_MS:
+                marker = "  REGRESSION"
+                regressions.append((name, stage, ratio))
+            print(f"{name:<34} {stage:<7} {previous[stage]:>8.2f}ms {current[stage]:>8.2f}ms "
+                  f"{(ratio - 1) * 100:>+7.1f}%{marker}")
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Markdown → HTML → PDF pipeline.")
+    parser.add_argument('--pages', type=int, nargs='+', default=DEFAULT_PAGES,
+                        help="Synthetic document sizes in pages (default: 1 10 100 1000)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Runs per stage; the median is reported (default: 3)")
+    parser.add_argument('--skip-pdf', action='store_true', help="Only time parsing and rendering")
+    parser.add_argument('--startup', action='store_true', help="Also time application startup")
+    parser.add_argument('--startup-only', action='store_true', help="Only time application startup")
+    parser.add_argument('-o', '--output', default=str(DEFAULT_RESULTS), help="Results file")
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help="Baseline file to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the baseline")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Relative slowdown reported as a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    # Font downloads would dominate the first render
+    font_cache.offline = True
+
+    results = run(args)
+
+    Path(args.output).write_text(json.dumps(results, indent=2), encoding='utf-8')
+    print(f"Results written to {args.output}")
+
+    regressions = []
+    baseline_path = Path(args.baseline)
+    if baseline_path.exists() and not args.save_baseline:
+        baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+        regressions = compare(results, baseline, args.threshold)
+        print(f"\n{len(regressions)} regressions against {baseline_path} "
+              f"(revision {baseline.get('meta', {}).get('revision')})")
+
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2), encoding='utf-8')
+        print(f"Baseline written to {baseline_path}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -29,16 +29,31 @@ a = Analysis(
     hiddenimports=[
         'md2quote',
         'md2quote.main',
+        'md2quote.batch',
         'md2quote.core',
+        'md2quote.core.clients_io',
+        'md2quote.core.clients_store',
         'md2quote.core.config',
+        'md2quote.core.fonts',
+        'md2quote.core.http_client',
+        'md2quote.core.llm_cache',
+        'md2quote.core.llm_edits',
+        'md2quote.core.numbering',
         'md2quote.core.parser',
         'md2quote.core.pdf',
+        'md2quote.core.pdf_pages',
+        'md2quote.core.pdf_cache',
         'md2quote.core.renderer',
+        'md2quote.core.startup',
+        'md2quote.core.style_patch',
+        'md2quote.core.tracing',
         'md2quote.ui',
         'md2quote.ui.main_window',
         'md2quote.ui.editor',
         'md2quote.ui.preview',
+        'md2quote.ui.scheduler',
         'md2quote.ui.header',
+        'md2quote.ui.clients_model',
         'md2quote.ui.config_dialog',
         'md2quote.ui.styles',
         'md2quote.ui.icons',
@@ -0,0 +1,278 @@
+"""
+Headless batch rendering for MD2Quote.
+
+Renders many Markdown quotations to PDF without opening the main window,
+using a pool of off-screen WebEngine pages:
+
+    python3 main.py batch quotes/ -o out/ -j 4
+    python3 main.py batch quotes/ --number    # number documents that have none, saving the numbers
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import Qt, QCoreApplication, QObject, pyqtSignal
+
+from .core.parser import MarkdownParser
+from .core.renderer import TemplateRenderer, build_context, page_margins
+from .core.config import config
+from .core.fonts import font_cache
+from .core.tracing import tracer
+from .utils import yaml_load, yaml_dump
+
+FRONTMATTER_RE = re.compile(r'^---\s*\n(.*?)\n---\s*\n', re.DOTALL)
+
+
+def collect_inputs(patterns: list) -> list[Path]:
+    """
+    Expands directories, glob patterns and file paths into a sorted list of
+    Markdown files without duplicates.
+    """
+    files = []
+    for pattern in patterns:
+        path = Path(os.path.expanduser(pattern))
+        if path.is_dir():
+            matches = sorted(path.glob('*.md'))
+        elif path.exists():
+            matches = [path]
+        else:
+            matches = sorted(Path(p) for p in glob.glob(str(path), recursive=True))
+        files.extend(m for m in matches if m.is_file())
+
+    seen = set()
+    result = []
+    for f in files:
+        key = f.resolve()
+        if key not in seen:
+            seen.add(key)
+            result.append(f)
+    return result
+
+
+def write_quotation_number(path: Path, number: str):
+    """
+    Stores a quotation number in the frontmatter of a Markdown file.
+
+    Raises:
+        yaml.YAMLError: If the existing frontmatter cannot be parsed; the file is left unchanged
+        ValueError: If the frontmatter is not a mapping
+    """
+    text = path.read_text(encoding='utf-8')
+    match = FRONTMATTER_RE.match(text)
+    metadata = (yaml_load(match.group(1)) or {}) if match else {}
+    if not isinstance(metadata, dict):
+        raise ValueError("frontmatter is not a mapping")
+    body = text[match.end():] if match else text
+
+    quotation = metadata.get('quotation')
+    metadata['quotation'] = {**(quotation if isinstance(quotation, dict) else {}), 'number': number}
+    new_yaml = yaml_dump(metadata, allow_unicode=True, sort_keys=False)
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(f"---\n{new_yaml}---\n{body}", encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+class BatchRun(QObject):
+    """Feeds Markdown files through parse, render and the PDF render pool."""
+
+    finished = pyqtSignal()
+
+    def __init__(self, files: list, output_dir: Path = None, preset_key: str = None,
+                 jobs: int = 1, assign_numbers: bool = False, parent=None):
+        super().__init__(parent)
+        self.output_dir = output_dir
+        self.preset_key = preset_key or config.get_active_preset_name()
+        self.jobs = max(1, jobs)
+        self.assign_numbers = assign_numbers
+        self.numbers = {}  # source -> quotation number assigned by this run
+
+        self.parser = MarkdownParser()
+        self.renderer = TemplateRenderer()
+        self.service = None  # Created in start(), so a run can be set up without QtWebEngine
+
+        self._pending = deque(files)
+        self._active = {}  # job_id -> (source, target)
+        self.total = len(files)
+        self.succeeded = 0
+        self.failures = []  # (source, error message)
+        self.started_at = None
+        self.elapsed = 0.0
+
+    def start(self):
+        from .core.pdf import PDFRenderService
+        self.service = PDFRenderService(worker_count=self.jobs, parent=self)
+        self.service.pdfReady.connect(self._on_pdf_ready)
+        self.service.renderFailed.connect(self._on_render_failed)
+        self.service.jobDropped.connect(lambda job_id: self._on_render_failed(job_id, "Render job was dropped"))
+
+        self.started_at = time.perf_counter()
+        if self.assign_numbers:
+            self._reserve_numbers()
+        self._fill()
+
+    def _reserve_numbers(self):
+        """
+        Reserves one block of quotation numbers for the documents without a number
+        and saves each number into its document, so later runs keep it.
+        """
+        unnumbered = []
+        for source in self._pending:
+            try:
+                quotation = self.parser.read_metadata(str(source)).get('quotation')
+            except Exception:
+                continue  # Reported when the document is rendered
+            if not isinstance(quotation, dict) or not quotation.get('number'):
+                unnumbered.append(source)
+        if not unnumbered:
+            return
+        numbers = config.generate_quotation_numbers(self.preset_key, len(unnumbered))
+        self.numbers = dict(zip(unnumbered, numbers))
+        for source, number in self.numbers.items():
+            try:
+                write_quotation_number(source, number)
+            except Exception as e:
+                print(f"Warning: Could not save quotation number {number} to {source}: {e}")
+
+    def _target_for(self, source: Path) -> Path:
+        directory = self.output_dir if self.output_dir else source.parent
+        return directory / f"{source.stem}.pdf"
+
+    def _render_html(self, source: Path) -> tuple[str, tuple]:
+        """Parses a Markdown file and renders it with the selected preset."""
+        from .core.pdf import DEFAULT_PAGE_MARGINS
+        metadata, html_body = self.parser.parse_file(str(source))
+        if source in self.numbers:
+            quotation = metadata.get('quotation')
+            metadata['quotation'] = {**(quotation if isinstance(quotation, dict) else {}),
+                                     'number': self.numbers[source]}
+        context = build_context(metadata, html_body, config.get_preset(self.preset_key))
+        full_html = self.renderer.render(metadata.get("template", "base"), context, preset_config=context)
+        return full_html, page_margins(context, DEFAULT_PAGE_MARGINS)
+
+    def _fill(self):
+        """Keeps the render queue filled without holding every document in memory."""
+        while self._pending and len(self._active) < self.jobs * 2:
+            source = self._pending.popleft()
+            try:
+                full_html, margins = self._render_html(source)
+            except Exception as e:
+                self.failures.append((source, str(e)))
+                continue
+            job_id = self.service.submit(full_html, margins, coalesce=False)
+            self._active[job_id] = (source, self._target_for(source))
+
+        if self.is_done():
+            self.elapsed = time.perf_counter() - self.started_at
+            self.finished.emit()
+
+    def _on_pdf_ready(self, job_id: int, pdf_bytes: bytes):
+        source, target = self._active.pop(job_id)
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(pdf_bytes)
+            self.succeeded += 1
+        except Exception as e:
+            self.failures.append((source, str(e)))
+        self._fill()
+
+    def _on_render_failed(self, job_id: int, error_message: str):
+        source, _ = self._active.pop(job_id)
+        self.failures.append((source, error_message))
+        self._fill()
+
+    def is_done(self) -> bool:
+        return not self._active and not self._pending
+
+    def throughput(self) -> float:
+        """Successfully rendered documents per second."""
+        return self.succeeded / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="md2quote batch",
+        description="Render Markdown quotations to PDF without opening the GUI."
+    )
+    parser.add_argument('inputs', nargs='+',
+                        help="Markdown files, directories or glob patterns")
+    parser.add_argument('-o', '--output-dir',
+                        help="Directory for the PDFs (default: next to each input)")
+    parser.add_argument('-p', '--preset',
+                        help="Template key to render with (default: active template)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Number of parallel WebEngine pages (default: CPU count)")
+    parser.add_argument('--number', action='store_true',
+                        help="Give documents without a quotation number the next numbers of the template "
+                             "and save them into the documents' frontmatter")
+    parser.add_argument('--offline', action='store_true',
+                        help="Never access the network; use only locally cached fonts")
+    parser.add_argument('--trace', metavar='PATH',
+                        help="Write stage timings to PATH (Chrome trace JSON, or JSON Lines for .jsonl)")
+    return parser
+
+
+def main(argv: list = None) -> int:
+    """Runs a batch render and returns the process exit code."""
+    args = build_arg_parser().parse_args(argv)
+
+    files = collect_inputs(args.inputs)
+    if not files:
+        print("No Markdown files found.")
+        return 1
+
+    if args.preset and args.preset not in config.get('presets', {}):
+        print(f"Unknown template: {args.preset}")
+        return 1
+
+    if args.trace:
+        tracer.start(args.trace)
+
+    if args.offline:
+        font_cache.offline = True
+    else:
+        # Download missing fonts up front so that every document uses them
+        typography = config.get_preset(args.preset or config.get_active_preset_name()).get('typography', {})
+        font_cache.ensure_families([typography.get(r) for r in ('heading', 'body', 'mono')], wait=True)
+
+    # Batch runs never show a window, so they also work on machines without a display
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    # core.pdf imports QtWebEngine only once the run starts, which requires
+    # shared OpenGL contexts to be enabled before the QApplication exists
+    QCoreApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
+
+    qt_argv = [sys.argv[0]]
+    if sys.platform == "darwin":
+        qt_argv.append("--disable-features=UseSkiaGraphite")
+
+    app = QApplication.instance() or QApplication(qt_argv)
+    app.setApplicationName("MD2Quote")
+
+    output_dir = Path(os.path.expanduser(args.output_dir)) if args.output_dir else None
+    run = BatchRun(files, output_dir=output_dir, preset_key=args.preset, jobs=args.jobs,
+                   assign_numbers=args.number)
+    run.finished.connect(app.quit)
+
+    print(f"Rendering {run.total} documents with {run.jobs} parallel pages...")
+    run.start()
+    if not run.is_done():
+        app.exec()
+
+    for source, number in run.numbers.items():
+        print(f"{source}: {number}")
+    for source, message in run.failures:
+        print(f"FAILED {source}: {message}")
+
+    print(
+        f"Rendered {run.succeeded}/{run.total} documents in {run.elapsed:.2f}s "
+        f"({run.throughput():.2f} documents/s), {len(run.failures)} failed"
+    )
+    return 1 if run.failures else 0
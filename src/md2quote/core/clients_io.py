@@ -0,0 +1,230 @@
+"""
+Import and export of clients as CSV or vCard files.
+
+Files are read and written as streams: a reader yields one client at a time
+and keeps count of the bytes consumed for progress reporting, and the writers
+take any iterable of clients, so large address books never have to be held in
+memory at once. ConfigLoader.import_clients merges the clients into the saved
+ones, matching them by email.
+
+CSV files need a header row; columns are matched case-insensitively by the
+names in CSV_COLUMNS and other columns are ignored. vCard files (.vcf) take FN
+as the contact, ORG as the institution and the first EMAIL and ADR.
+"""
+
+import csv
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from .clients_store import CLIENT_FIELDS
+
+# CSV header names (lower case) accepted for each client field
+CSV_COLUMNS = {
+    'contact': ('contact', 'name', 'full name', 'contact name', 'contact person'),
+    'institution': ('institution', 'company', 'organization', 'organisation', 'company name'),
+    'email': ('email', 'e-mail', 'email address', 'e-mail address', 'mail'),
+    'address': ('address', 'street address', 'postal address'),
+}
+
+VCARD_EXTENSIONS = ('.vcf', '.vcard')
+
+# vCard ADR components, in order
+_ADR_PARTS = ('po_box', 'extended', 'street', 'locality', 'region', 'postal_code', 'country')
+
+
+def is_vcard(path) -> bool:
+    """Returns True if the file name says it is a vCard file rather than CSV."""
+    return Path(path).suffix.lower() in VCARD_EXTENSIONS
+
+
+class ClientFileReader:
+    """
+    Streams clients from a CSV or vCard file.
+
+    Iterating yields one dict per client with the keys of CLIENT_FIELDS.
+    bytes_read and size give the progress through the file.
+
+    Args:
+        path: The file; .vcf/.vcard files are read as vCard, anything else as CSV
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.size = self.path.stat().st_size
+        self.bytes_read = 0
+
+    def __iter__(self) -> Iterator[dict]:
+        with open(self.path, 'rb') as f:
+            lines = self._lines(f)
+            if is_vcard(self.path):
+                yield from _read_vcards(lines)
+            else:
+                yield from _read_csv(lines)
+
+    def _lines(self, f) -> Iterator[str]:
+        first = True
+        for raw in f:
+            self.bytes_read += len(raw)
+            line = raw.decode('utf-8', errors='replace')
+            if first:
+                line = line.lstrip('\ufeff')  # Byte order mark
+                first = False
+            yield line
+
+
+def _read_csv(lines: Iterator[str]) -> Iterator[dict]:
+    rows = csv.reader(lines)
+    header = next(rows, None)
+    if header is None:
+        return
+    names = [name.strip().lower() for name in header]
+    columns = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                columns[field] = names.index(alias)
+                break
+    if not columns:
+        raise ValueError("The CSV header has none of the columns contact, institution, email or address.")
+
+    for row in rows:
+        if not any(cell.strip() for cell in row):
+            continue
+        yield {
+            field: row[columns[field]].strip() if field in columns and columns[field] < len(row) else ''
+            for field in CLIENT_FIELDS
+        }
+
+
+def _unescape_vcard(value: str) -> str:
+    result = []
+    chars = iter(value)
+    for char in chars:
+        if char == '\\':
+            following = next(chars, '')
+            result.append('\n' if following in ('n', 'N') else following)
+        else:
+            result.append(char)
+    return ''.join(result)
+
+
+def _split_vcard(value: str, separator: str = ';') -> list[str]:
+    """Splits a structured value at unescaped separators."""
+    parts, current, escaped = [], [], False
+    for char in value:
+        if escaped:
+            current.append('\\' + char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == separator:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append(''.join(current))
+    return [_unescape_vcard(part) for part in parts]
+
+
+def _unfold(lines: Iterator[str]) -> Iterator[str]:
+    """Joins folded vCard lines (continuations start with a space or tab)."""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _read_vcards(lines: Iterator[str]) -> Iterator[dict]:
+    card = None
+    for line in _unfold(lines):
+        name, _, value = line.partition(':')
+        name = name.split(';')[0].split('.')[-1].strip().upper()
+        if name == 'BEGIN' and value.strip().upper() == 'VCARD':
+            card = {}
+        elif name == 'END' and card is not None:
+            if card.get('contact') and card.get('contact') == card.get('institution'):
+                # Organization cards (and our exports of clients without a contact) repeat ORG as FN
+                card['contact'] = ''
+            if any(card.values()):
+                yield {field: card.get(field, '') for field in CLIENT_FIELDS}
+            card = None
+        elif card is None:
+            continue
+        elif name == 'FN':
+            card['contact'] = _unescape_vcard(value).strip()
+        elif name == 'ORG':
+            card['institution'] = _split_vcard(value)[0].strip()
+        elif name == 'EMAIL' and not card.get('email'):
+            card['email'] = _unescape_vcard(value).strip()
+        elif name == 'ADR' and not card.get('address'):
+            parts = dict(zip(_ADR_PARTS, _split_vcard(value)))
+            city = ' '.join(p for p in (parts.get('postal_code', ''), parts.get('locality', '')) if p.strip())
+            address_lines = [parts.get('po_box', ''), parts.get('extended', ''), parts.get('street', ''),
+                             city, parts.get('region', ''), parts.get('country', '')]
+            card['address'] = '\n'.join(p.strip() for p in address_lines if p.strip())
+
+
+def write_csv(path, clients: Iterable[dict]) -> int:
+    """
+    Writes clients to a CSV file with a header row.
+
+    Returns:
+        The number of clients written
+    """
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CLIENT_FIELDS)
+        for client in clients:
+            writer.writerow([client.get(field, '') or '' for field in CLIENT_FIELDS])
+            count += 1
+    return count
+
+
+def _escape_vcard(value: str) -> str:
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\n').replace('\n', '\\n'))
+
+
+def write_vcard(path, clients: Iterable[dict]) -> int:
+    """
+    Writes clients to a vCard 3.0 file.
+
+    The whole address goes into the street part of ADR. vCards require a
+    formatted name, so clients without a contact are written with the
+    institution as FN.
+
+    Returns:
+        The number of clients written
+    """
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for client in clients:
+            contact = client.get('contact', '') or ''
+            institution = client.get('institution', '') or ''
+            lines = ['BEGIN:VCARD', 'VERSION:3.0',
+                     f"FN:{_escape_vcard(contact or institution)}",
+                     f"N:{_escape_vcard(contact or institution)};;;;",
+                     f"ORG:{_escape_vcard(institution)}"]
+            if client.get('email'):
+                lines.append(f"EMAIL;TYPE=INTERNET:{_escape_vcard(client['email'])}")
+            if client.get('address'):
+                lines.append(f"ADR;TYPE=WORK:;;{_escape_vcard(client['address'])};;;;")
+            lines.append('END:VCARD')
+            f.write('\r\n'.join(lines) + '\r\n')
+            count += 1
+    return count
+
+
+def write_clients(path, clients: Iterable[dict]) -> int:
+    """Writes clients as vCard or CSV depending on the file name; returns the number written."""
+    if is_vcard(path):
+        return write_vcard(path, clients)
+    return write_csv(path, clients)
@@ -0,0 +1,377 @@
+"""
+SQLite storage for saved clients.
+
+By default clients live in config.yaml, which is loaded, searched and rewritten
+as a whole. With many thousands of clients that makes startup, search and every
+save slow. Setting
+
+    clients_store: sqlite
+
+in config.yaml moves them into ~/.config/md2quote/clients.db instead: clients are
+read one page at a time and searched through an FTS5 index over institution,
+contact, email and address. Clients still in the YAML are imported on first use.
+"""
+
+import re
+import sqlite3
+import string
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+CLIENT_FIELDS = ('contact', 'institution', 'email', 'address')
+
+# Clients read and written per statement batch by bulk imports and exports
+IMPORT_BATCH_SIZE = 1000
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    key TEXT PRIMARY KEY,
+    contact TEXT NOT NULL DEFAULT '',
+    institution TEXT NOT NULL DEFAULT '',
+    email TEXT NOT NULL DEFAULT '',
+    address TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS clients_by_institution ON clients (institution COLLATE NOCASE, key);
+CREATE INDEX IF NOT EXISTS clients_by_email ON clients (email COLLATE NOCASE);
+"""
+
+# External-content index kept in sync with the clients table by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS clients_fts USING fts5(
+    contact, institution, email, address,
+    content='clients', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS clients_ai AFTER INSERT ON clients BEGIN
+    INSERT INTO clients_fts (rowid, contact, institution, email, address)
+    VALUES (new.rowid, new.contact, new.institution, new.email, new.address);
+END;
+CREATE TRIGGER IF NOT EXISTS clients_ad AFTER DELETE ON clients BEGIN
+    INSERT INTO clients_fts (clients_fts, rowid, contact, institution, email, address)
+    VALUES ('delete', old.rowid, old.contact, old.institution, old.email, old.address);
+END;
+CREATE TRIGGER IF NOT EXISTS clients_au AFTER UPDATE ON clients BEGIN
+    INSERT INTO clients_fts (clients_fts, rowid, contact, institution, email, address)
+    VALUES ('delete', old.rowid, old.contact, old.institution, old.email, old.address);
+    INSERT INTO clients_fts (rowid, contact, institution, email, address)
+    VALUES (new.rowid, new.contact, new.institution, new.email, new.address);
+END;
+"""
+
+
+def fold(text: str) -> str:
+    """Lower-cases text and removes diacritics, like the FTS5 unicode61 tokenizer ("Zürich" -> "zurich")."""
+    decomposed = unicodedata.normalize('NFKD', (text or '').lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def nocase(text: str) -> str:
+    """Lower-cases ASCII letters only, like SQLite's NOCASE collation."""
+    return (text or '').translate(_ASCII_LOWER)
+
+
+def search_words(query: str) -> list[str]:
+    """Splits a search query into folded words (see fold)."""
+    return _WORD_RE.findall(fold(query))
+
+
+def client_sort_key(client_key: str, institution: str) -> tuple:
+    """Sort key of client lists: institution ignoring ASCII case (like SQLite's NOCASE), then key."""
+    return (nocase(institution), client_key)
+
+
+def client_matches(client: dict, words: list) -> bool:
+    """
+    Returns True if every word starts a word in one of the client's fields.
+
+    Mirrors the FTS5 prefix query used by ClientStore, for clients kept in YAML:
+    both sides are folded, so "zur" finds "Zürich".
+    """
+    tokens = set()
+    for field in CLIENT_FIELDS:
+        tokens.update(search_words(client.get(field, '')))
+    return all(any(token.startswith(word) for token in tokens) for word in words)
+
+
+def clean_imported_client(client: dict) -> dict | None:
+    """
+    Returns an imported client with every field as a stripped string.
+
+    The institution is required, so a client without one takes its contact as
+    institution. Returns None for a client with neither.
+    """
+    cleaned = {field: str(client.get(field) or '').strip() for field in CLIENT_FIELDS}
+    if not cleaned['institution']:
+        cleaned['institution'] = cleaned['contact'].split('\n')[0].strip()
+    if not cleaned['institution']:
+        return None
+    return cleaned
+
+
+def merge_imported_client(saved: dict, imported: dict) -> dict:
+    """Returns a saved client updated with the non-empty fields of an imported one."""
+    return {field: imported.get(field) or saved.get(field, '') or '' for field in CLIENT_FIELDS}
+
+
+class ClientStore:
+    """
+    Client repository backed by an SQLite database.
+
+    Rows are returned sorted by institution (case-insensitive). Falls back to
+    LIKE matching if the SQLite build lacks FTS5.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._importing = False  # Set while merge_clients runs; single writes are rejected
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+            try:
+                self._conn.executescript(_FTS_SCHEMA)
+                self.has_fts = True
+            except sqlite3.OperationalError:
+                self.has_fts = False
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _where(self, query: str, named_only: bool = False) -> tuple[str, list]:
+        """Returns the FROM/WHERE part of a search and its parameters."""
+        words = search_words(query)
+        conditions, params = [], []
+        if named_only:
+            conditions.append("institution != ''")
+        if words and self.has_fts:
+            conditions.append("rowid IN (SELECT rowid FROM clients_fts WHERE clients_fts MATCH ?)")
+            params.append(" ".join(f'"{word}"*' for word in words))
+        elif words:
+            for word in words:
+                pattern = f"%{word}%"
+                conditions.append("(" + " OR ".join(f"{field} LIKE ?" for field in CLIENT_FIELDS) + ")")
+                params.extend([pattern] * len(CLIENT_FIELDS))
+        if not conditions:
+            return "FROM clients", []
+        return "FROM clients WHERE " + " AND ".join(conditions), params
+
+    def count(self, query: str = '', named_only: bool = False) -> int:
+        """Returns the number of clients matching query (all clients if empty)."""
+        where, params = self._where(query, named_only)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) {where}", params).fetchone()[0]
+
+    def search(self, query: str = '', offset: int = 0, limit: int = None,
+               named_only: bool = False) -> list[tuple[str, str]]:
+        """
+        Returns (client_key, institution) tuples for one page of matching clients.
+
+        Args:
+            query: Words that must each start a word in any client field
+            offset: Number of matching rows to skip
+            limit: Maximum number of rows, or None for all
+            named_only: If True, leave out clients without an institution
+        """
+        where, params = self._where(query, named_only)
+        sql = f"SELECT key, institution {where} ORDER BY institution COLLATE NOCASE, key LIMIT ? OFFSET ?"
+        with self._lock:
+            return self._conn.execute(sql, params + [-1 if limit is None else limit, offset]).fetchall()
+
+    def get(self, client_key: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT contact, institution, email, address FROM clients WHERE key = ?", (client_key,)
+            ).fetchone()
+        return dict(zip(CLIENT_FIELDS, row)) if row else None
+
+    def find_key(self, institution: str) -> str | None:
+        """Returns the key of a client with exactly this institution, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key FROM clients WHERE institution = ? LIMIT 1", (institution,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def all(self) -> dict:
+        """Returns every client as {client_key: client data}."""
+        with self._lock:
+            rows = self._conn.execute("SELECT key, contact, institution, email, address FROM clients").fetchall()
+        return {row[0]: dict(zip(CLIENT_FIELDS, row[1:])) for row in rows}
+
+    def contains(self, client_key: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM clients WHERE key = ?", (client_key,)).fetchone() is not None
+
+    def _check_writable(self):
+        """Raises RuntimeError while an import is running. Call with _lock held."""
+        if self._importing:
+            raise RuntimeError("Clients are being imported. Try again when the import has finished.")
+
+    def put(self, client_key: str, client_data: dict):
+        """
+        Inserts or replaces a client.
+
+        Raises:
+            RuntimeError: If an import is running
+        """
+        values = [client_data.get(field, '') or '' for field in CLIENT_FIELDS]
+        with self._lock, self._conn:
+            self._check_writable()
+            self._conn.execute(
+                "INSERT INTO clients (key, contact, institution, email, address) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET contact = excluded.contact, institution = excluded.institution, "
+                "email = excluded.email, address = excluded.address",
+                [client_key] + values,
+            )
+
+    def delete(self, client_key: str) -> bool:
+        """
+        Deletes a client. Returns False if it did not exist.
+
+        Raises:
+            RuntimeError: If an import is running
+        """
+        with self._lock, self._conn:
+            self._check_writable()
+            return self._conn.execute("DELETE FROM clients WHERE key = ?", (client_key,)).rowcount > 0
+
+    def iter_clients(self) -> Iterator[dict]:
+        """Yields every client, sorted by institution, reading IMPORT_BATCH_SIZE rows at a time."""
+        columns = "SELECT key, contact, institution, email, address FROM clients"
+        order = " ORDER BY institution COLLATE NOCASE, key LIMIT ?"
+        last = None
+        while True:
+            with self._lock:
+                if last is None:
+                    rows = self._conn.execute(columns + order, (IMPORT_BATCH_SIZE,)).fetchall()
+                else:
+                    rows = self._conn.execute(
+                        columns + " WHERE (institution COLLATE NOCASE, key) > (?, ?)" + order,
+                        (last[2], last[0], IMPORT_BATCH_SIZE)
+                    ).fetchall()
+            for row in rows:
+                yield dict(zip(CLIENT_FIELDS, row[1:]))
+            if len(rows) < IMPORT_BATCH_SIZE:
+                return
+            last = rows[-1]
+
+    def merge_clients(self, clients: Iterable[dict], new_key: Callable[[], str],
+                      progress: Callable[[int], None] = None) -> tuple[int, int, int]:
+        """
+        Adds or updates many clients in a single transaction.
+
+        A client with an email updates the saved client with the same email
+        (ignoring case); one without updates the saved client with the same
+        institution and contact. Anything else is added. Clients are processed
+        in batches of IMPORT_BATCH_SIZE, so an import streamed from a file needs
+        constant memory. If the iterable or progress raises, nothing is imported.
+
+        The import runs on its own connection, so searches meanwhile see the
+        clients as they were before it; put() and delete() raise RuntimeError
+        until it has finished.
+
+        Args:
+            clients: Client dicts, cleaned with clean_imported_client (None entries are skipped)
+            new_key: Returns a key for a new client; called again while the key is taken
+            progress: Called with the number of clients processed after each batch
+
+        Returns:
+            (added, updated, skipped) counts
+        """
+        with self._lock:
+            self._check_writable()
+            self._importing = True
+        conn = sqlite3.connect(str(self.path), isolation_level=None)
+        counts = [0, 0, 0]
+        processed = 0
+        batch = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for client in clients:
+                batch.append(client)
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    self._merge_batch(conn, batch, new_key, counts)
+                    processed += len(batch)
+                    batch = []
+                    if progress:
+                        progress(processed)
+            if batch:
+                self._merge_batch(conn, batch, new_key, counts)
+                processed += len(batch)
+                if progress:
+                    progress(processed)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+            with self._lock:
+                self._importing = False
+        return tuple(counts)
+
+    def _merge_batch(self, conn: sqlite3.Connection, batch: list, new_key: Callable[[], str], counts: list):
+        """Merges one batch of merge_clients inside the open transaction of conn."""
+        for client in batch:
+            if client is None:
+                counts[2] += 1
+                continue
+            if client['email']:
+                row = conn.execute(
+                    "SELECT key, contact, institution, email, address FROM clients "
+                    "WHERE email = ? COLLATE NOCASE LIMIT 1", (client['email'],)
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    "SELECT key, contact, institution, email, address FROM clients "
+                    "WHERE institution = ? COLLATE NOCASE AND contact = ? LIMIT 1",
+                    (client['institution'], client['contact'])
+                ).fetchone()
+
+            if row is not None:
+                merged = merge_imported_client(dict(zip(CLIENT_FIELDS, row[1:])), client)
+                conn.execute(
+                    "UPDATE clients SET contact = ?, institution = ?, email = ?, address = ? WHERE key = ?",
+                    [merged[field] for field in CLIENT_FIELDS] + [row[0]],
+                )
+                counts[1] += 1
+                continue
+
+            key = new_key()
+            while conn.execute("SELECT 1 FROM clients WHERE key = ?", (key,)).fetchone():
+                key = new_key()
+            conn.execute(
+                "INSERT INTO clients (key, contact, institution, email, address) VALUES (?, ?, ?, ?, ?)",
+                [key] + [client[field] for field in CLIENT_FIELDS],
+            )
+            counts[0] += 1
+
+    def import_clients(self, clients: dict) -> int:
+        """
+        Adds clients from a {client_key: client data} dict in one transaction.
+
+        Keys already in the store are left untouched. Returns the number of
+        clients added.
+        """
+        rows = [
+            [key] + [(data or {}).get(field, '') or '' for field in CLIENT_FIELDS]
+            for key, data in clients.items()
+        ]
+        with self._lock, self._conn:
+            before = self._conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO clients (key, contact, institution, email, address) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            return self._conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0] - before
@@ -1,13 +1,21 @@
+import atexit
 import os
-import yaml
+import pickle
 import shutil
 import copy
+import itertools
+import threading
 import time
 import zipfile
 from pathlib import Path
 from datetime import datetime
+from PyQt6.QtCore import QCoreApplication, QObject, QTimer, pyqtSignal, pyqtSlot
 from .llm import DEFAULT_SYSTEM_PROMPT
-from ..utils import get_app_path, get_templates_path
+from .clients_store import (ClientStore, IMPORT_BATCH_SIZE, client_matches, client_sort_key, nocase,
+                            search_words, clean_imported_client, merge_imported_client)
+from .numbering import QuotationCounter
+from ..utils import get_app_path, get_templates_path, yaml_load, yaml_dump
+from .. import __version__
 
 
 DEFAULT_PRESET_KEYS = ['preset_1', 'preset_2', 'preset_3', 'preset_4', 'preset_5']
@@ -45,6 +53,48 @@ DEFAULT_LLM_CONFIG = {
     'system_prompt': DEFAULT_SYSTEM_PROMPT
 }
 
+# Seconds between the first unsaved change and the write that persists it
+SAVE_DELAY = 0.5
+
+# Bump when loading or migrations change, so older snapshots are not reused
+CONFIG_SNAPSHOT_VERSION = 1
+
+
+class _SaveTimer(QObject):
+    """
+    Write-behind timer living in the application's main thread.
+
+    start() may be called from any thread; the timer starts, and the callback
+    runs, in the main thread, which owns the configuration.
+    """
+
+    _startRequested = pyqtSignal()
+
+    def __init__(self, callback, thread):
+        super().__init__()
+        self._callback = callback
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(int(SAVE_DELAY * 1000))
+        # Decorated slots are called in the thread this object lives in
+        self._timer.timeout.connect(self._on_timeout)
+        self._startRequested.connect(self._start)
+        self.moveToThread(thread)
+
+    def start(self):
+        self._startRequested.emit()
+
+    @pyqtSlot()
+    def _on_timeout(self):
+        self._callback()
+
+    @pyqtSlot()
+    def _start(self):
+        # Changes while the timer runs join the pending write
+        if not self._timer.isActive():
+            self._timer.start()
+
+
 class ConfigLoader:
     APP_NAME = "md2quote"
     
@@ -52,11 +102,32 @@ class ConfigLoader:
         self.project_root = get_app_path()
         self.config_dir = self._get_config_dir()
         self.config_path = self.config_dir / "config.yaml"
+        self.snapshot_path = self.config_dir / "cache" / "config.pickle"
         self.templates_dir = self.config_dir / "templates"
         self.styles_dir = self.config_dir / "styles"
         self.logos_dir = self.config_dir / "logos"
+        
+        self._save_lock = threading.RLock()
+        self._save_timer = None  # Created with the first change once a Qt application exists
+        self._dirty = False
+        atexit.register(self.flush)
+        self._client_store = None
+        self._quotation_counter = None
+        
         self._ensure_config_exists()
-        self.config = self._load_config()
+        
+        # An unchanged config.yaml is restored from the snapshot of its parsed,
+        # migrated content instead of being parsed again
+        self.config = self._load_snapshot()
+        if self.config is None:
+            self._snapshot_allowed = False
+            self.config = self._load_config()
+            
+            # Migrations only mark the config as changed; persist them with one write
+            if self._dirty:
+                self.flush()
+            elif self._snapshot_allowed:
+                self._write_snapshot(self.config)
 
     def _get_config_dir(self) -> Path:
         """Returns the user configuration directory."""
@@ -92,7 +163,7 @@ class ConfigLoader:
         
         try:
             with open(self.config_path, 'r', encoding='utf-8') as f:
-                data = yaml.safe_load(f) or {}
+                data = yaml_load(f) or {}
                 
             if 'company' in data and 'presets' not in data:
                 return self._migrate_config(data)
@@ -136,23 +207,16 @@ class ConfigLoader:
                     
             if updated:
                 print("Backfilled missing config keys (layout/snippets/company_flags)")
-                try:
-                     with open(self.config_path, 'w', encoding='utf-8') as f:
-                        yaml.dump(data, f, allow_unicode=True, sort_keys=False, default_flow_style=False)
-                except Exception as e:
-                    print(f"Error saving backfilled config: {e}")
+                self._dirty = True
 
             if 'llm' not in data:
                 data['llm'] = DEFAULT_LLM_CONFIG.copy()
-                try:
-                    with open(self.config_path, 'w', encoding='utf-8') as f:
-                        yaml.dump(data, f, allow_unicode=True, sort_keys=False, default_flow_style=False)
-                    print("Backfilled LLM config")
-                except Exception as e:
-                    print(f"Error saving backfilled LLM config: {e}")
+                print("Backfilled LLM config")
+                self._dirty = True
 
             data = self._migrate_llm_prompt(data)
             data = self._migrate_logos(data)
+            self._snapshot_allowed = True
             return data
         except Exception as e:
             print(f"Error loading config: {e}")
@@ -178,11 +242,7 @@ class ConfigLoader:
         
         if updated:
             print("Migrated old template names to new preset names.")
-            try:
-                 with open(self.config_path, 'w', encoding='utf-8') as f:
-                    yaml.dump(data, f, allow_unicode=True, sort_keys=False, default_flow_style=False)
-            except Exception as e:
-                print(f"Error saving config after template migration: {e}")
+            self._dirty = True
         
         return data
 
@@ -203,12 +263,8 @@ class ConfigLoader:
             updated = True
 
         if updated:
-            try:
-                with open(self.config_path, 'w', encoding='utf-8') as f:
-                    yaml.dump(data, f, allow_unicode=True, sort_keys=False, default_flow_style=False)
-                print("Updated LLM system prompt to latest default.")
-            except Exception as e:
-                print(f"Error saving config after LLM prompt migration: {e}")
+            print("Updated LLM system prompt to latest default.")
+            self._dirty = True
 
         return data
 
@@ -237,12 +293,8 @@ class ConfigLoader:
                     print(f"Migrated logo for '{preset.get('name', preset_key)}' to internal storage")
         
         if updated:
-            try:
-                with open(self.config_path, 'w', encoding='utf-8') as f:
-                    yaml.dump(data, f, allow_unicode=True, sort_keys=False, default_flow_style=False)
-                print("Saved logo migration changes.")
-            except Exception as e:
-                print(f"Error saving config after logo migration: {e}")
+            print("Migrated logos to internal storage.")
+            self._dirty = True
         
         return data
 
@@ -352,11 +404,7 @@ class ConfigLoader:
              
         preset1['name'] = old_data.get('company', {}).get('name', 'Migrated Template')
         
-        try:
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                yaml.dump(new_config, f, allow_unicode=True, sort_keys=False)
-        except Exception as e:
-            print(f"Error saving migrated config: {e}")
+        self._dirty = True
             
         return new_config
 
@@ -403,6 +451,13 @@ class ConfigLoader:
         api_key = llm_config.get('api_key', '')
         return bool(api_key and api_key.strip())
 
+    @property
+    def quotation_counter(self) -> QuotationCounter:
+        """The counter database shared with other MD2Quote processes."""
+        if self._quotation_counter is None:
+            self._quotation_counter = QuotationCounter(self.config_dir / "counters.db")
+        return self._quotation_counter
+
     def generate_quotation_number(self, preset_key: str) -> str:
         """
         Generates a new quotation number for the given preset based on its format.
@@ -418,64 +473,47 @@ class ConfigLoader:
         
         Returns empty string if quotation numbering is disabled.
         """
+        numbers = self.generate_quotation_numbers(preset_key, 1)
+        return numbers[0] if numbers else ''
+
+    def generate_quotation_numbers(self, preset_key: str, count: int) -> list[str]:
+        """
+        Reserves a block of count consecutive quotation numbers.
+        
+        Numbers are allocated atomically across all running MD2Quote processes,
+        so no two calls ever receive the same number (see core/numbering.py).
+        The counter in the config is only a copy for display; use
+        set_quotation_counter() to move the shared counter.
+        
+        Returns an empty list if quotation numbering is disabled.
+        """
         preset = self.config.get('presets', {}).get(preset_key, {})
         qn_config = preset.get('quotation_number', {})
         
         if not qn_config.get('enabled', True):
-            return ''
+            return []
         
         format_str = qn_config.get('format', '{YYYY}-{NNN}')
-        counter = qn_config.get('counter', 0)
-        last_reset_year = qn_config.get('last_reset_year')
-        last_reset_month = qn_config.get('last_reset_month')
-        
         now = datetime.now()
-        current_year = now.year
-        current_month = now.month
-        
-        reset_counter = False
-        
-        if '{YYYY}' in format_str or '{YY}' in format_str:
-            if last_reset_year != current_year:
-                reset_counter = True
         
-        if '{MM}' in format_str:
-            if last_reset_year != current_year or last_reset_month != current_month:
-                reset_counter = True
+        first = self.quotation_counter.reserve(
+            preset_key, format_str, now.year, now.month, count=count,
+            seed=(qn_config.get('counter', 0), qn_config.get('last_reset_year'), qn_config.get('last_reset_month'))
+        )
+        last = first + count - 1
         
-        if reset_counter:
-            counter = 0
-        
-        counter += 1
-        
-        result = format_str
-        result = result.replace('{YYYY}', str(current_year))
-        result = result.replace('{YY}', str(current_year)[-2:])
-        result = result.replace('{MM}', f'{current_month:02d}')
-        result = result.replace('{DD}', f'{now.day:02d}')
-        
-        result = result.replace('{NNNN}', f'{counter:04d}')
-        result = result.replace('{NNN}', f'{counter:03d}')
-        result = result.replace('{NN}', f'{counter:02d}')
-        result = result.replace('{N}', str(counter))
-        
-        company_name = preset.get('company', {}).get('name', '')
-        if company_name:
-            prefix = ''.join(word[0].upper() for word in company_name.split() if word)[:3]
-        else:
-            prefix = 'QT'
-        result = result.replace('{PREFIX}', prefix)
-        
-        if 'quotation_number' not in self.config['presets'][preset_key]:
-            self.config['presets'][preset_key]['quotation_number'] = {}
-        
-        self.config['presets'][preset_key]['quotation_number']['counter'] = counter
-        self.config['presets'][preset_key]['quotation_number']['last_reset_year'] = current_year
-        self.config['presets'][preset_key]['quotation_number']['last_reset_month'] = current_month
-        
-        self._save_config()
+        # Keep a copy in the config for display
+        if preset_key in self.config.get('presets', {}):
+            qn = self.config['presets'][preset_key].setdefault('quotation_number', {})
+            qn['counter'] = last
+            qn['last_reset_year'] = now.year
+            qn['last_reset_month'] = now.month
+            self._save_config()
         
-        return result
+        return [
+            self._format_quotation_number(preset, format_str, counter, now.year, now.month, now.day)
+            for counter in range(first, last + 1)
+        ]
 
     def get_last_quotation_number(self, preset_key: str) -> str:
         """
@@ -490,27 +528,68 @@ class ConfigLoader:
         
         format_str = qn_config.get('format', '{YYYY}-{NNN}')
         counter = qn_config.get('counter', 0)
+        last_year = qn_config.get('last_reset_year')
+        last_month = qn_config.get('last_reset_month')
         
-        if counter == 0:
+        # Another process may have allocated numbers since the config was loaded
+        try:
+            stored = self.quotation_counter.peek(preset_key)
+        except Exception as e:
+            print(f"Error reading quotation counter: {e}")
+            stored = None
+        if stored is not None:
+            counter, last_year, last_month = stored
+        
+        if not counter:
             return ''  # No quotation generated yet
         
         now = datetime.now()
-        last_year = qn_config.get('last_reset_year', now.year)
-        last_month = qn_config.get('last_reset_month', now.month)
+        return self._format_quotation_number(
+            preset, format_str, counter, last_year or now.year, last_month or now.month, now.day
+        )
+
+    def set_quotation_counter(self, preset_key: str, counter: int):
+        """
+        Continues the preset's numbering after counter, e.g. after numbers were issued elsewhere.
         
-        # Build the quotation number with stored values
+        Raises:
+            ValueError: If counter is below the shared counter; use
+                reset_quotation_counter() to start over
+        """
+        qn_config = self.config.get('presets', {}).get(preset_key, {}).get('quotation_number', {})
+        now = datetime.now()
+        self.quotation_counter.set(preset_key, counter, qn_config.get('format', '{YYYY}-{NNN}'), now.year, now.month)
+        if preset_key in self.config.get('presets', {}):
+            qn = self.config['presets'][preset_key].setdefault('quotation_number', {})
+            qn['counter'] = counter
+            qn['last_reset_year'] = now.year
+            qn['last_reset_month'] = now.month
+            self._save_config()
+
+    def reset_quotation_counter(self, preset_key: str):
+        """Starts the preset's quotation counter over, so the next number uses 1."""
+        self.quotation_counter.reset(preset_key)
+        if preset_key in self.config.get('presets', {}):
+            qn = self.config['presets'][preset_key].setdefault('quotation_number', {})
+            qn['counter'] = 0
+            qn['last_reset_year'] = None
+            qn['last_reset_month'] = None
+            self._save_config()
+
+    def _format_quotation_number(self, preset: dict, format_str: str, counter: int,
+                                 year: int, month: int, day: int) -> str:
+        """Fills the placeholders of a quotation number format."""
         result = format_str
-        result = result.replace('{YYYY}', str(last_year))
-        result = result.replace('{YY}', str(last_year)[-2:])
-        result = result.replace('{MM}', f'{last_month:02d}')
-        result = result.replace('{DD}', f'{now.day:02d}')
+        result = result.replace('{YYYY}', str(year))
+        result = result.replace('{YY}', str(year)[-2:])
+        result = result.replace('{MM}', f'{month:02d}')
+        result = result.replace('{DD}', f'{day:02d}')
         
         result = result.replace('{NNNN}', f'{counter:04d}')
         result = result.replace('{NNN}', f'{counter:03d}')
         result = result.replace('{NN}', f'{counter:02d}')
         result = result.replace('{N}', str(counter))
         
-        preset = self.config.get('presets', {}).get(preset_key, {})
         company_name = preset.get('company', {}).get('name', '')
         if company_name:
             prefix = ''.join(word[0].upper() for word in company_name.split() if word)[:3]
@@ -520,13 +599,102 @@ class ConfigLoader:
         
         return result
 
+    # ─────────────────────────────────────────────────────────────────────────
+    # Persistence
+    # ─────────────────────────────────────────────────────────────────────────
+
     def _save_config(self):
-        """Saves the current configuration to disk."""
+        """
+        Marks the configuration as changed and schedules it to be written.
+        
+        Nothing is serialized here. The write-behind timer runs in the main
+        thread, which owns the config, and serializes it once for all changes
+        made within SAVE_DELAY seconds, followed by one atomic write. Without a
+        Qt application (scripts, tests) there is no timer; changes are written by
+        flush(), which also runs at exit. Reads always see the in-memory state.
+        """
+        with self._save_lock:
+            self._dirty = True
+            app = QCoreApplication.instance()
+            if app is None:
+                return
+            if self._save_timer is None:
+                self._save_timer = _SaveTimer(self.flush, app.thread())
+        self._save_timer.start()
+
+    def flush(self):
+        """Writes pending changes to disk now. Does nothing if there are none."""
+        with self._save_lock:
+            if not self._dirty:
+                return
+            # Serialized from a copy, so the snapshot is exactly what was written
+            data = copy.deepcopy(self.config)
+            text = yaml_dump(data, allow_unicode=True, sort_keys=False, default_flow_style=False)
+            try:
+                self._write_atomic(text)
+            except Exception as e:
+                print(f"Error saving config: {e}")
+                return
+            self._dirty = False
+            self._write_snapshot(data)
+
+    def replace_config(self, new_config: dict, text: str):
+        """
+        Replaces the configuration with new_config, persisted immediately as text.
+        
+        Used by the settings dialogs, which write their own YAML layout.
+        """
+        with self._save_lock:
+            self._write_atomic(text)
+            self.config = new_config
+            self._dirty = False
+
+    def _write_atomic(self, text: str):
+        """Writes the config file via a synced temporary file and an atomic rename."""
+        tmp_path = self.config_path.with_name(self.config_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.config_path)
+        
+        if hasattr(os, 'O_DIRECTORY'):
+            # Make the rename itself durable
+            dir_fd = os.open(self.config_dir, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def _snapshot_key(self) -> tuple:
+        stat = self.config_path.stat()
+        return (CONFIG_SNAPSHOT_VERSION, __version__, stat.st_mtime_ns, stat.st_size)
+
+    def _load_snapshot(self) -> dict | None:
+        """Returns the snapshot of the config if config.yaml has not changed since it was taken."""
         try:
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                yaml.dump(self.config, f, allow_unicode=True, sort_keys=False, default_flow_style=False)
+            with open(self.snapshot_path, 'rb') as f:
+                snapshot = pickle.load(f)
+            if snapshot.get('key') != self._snapshot_key():
+                return None
+            return snapshot['config']
+        except Exception:
+            return None
+
+    def _write_snapshot(self, data: dict):
+        """
+        Stores data as the snapshot of config.yaml, keyed by the file's size and mtime.
+        
+        data must be exactly what loading the file would produce.
+        """
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            snapshot = pickle.dumps({'key': self._snapshot_key(), 'config': data}, pickle.HIGHEST_PROTOCOL)
+            tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + '.tmp')
+            tmp_path.write_bytes(snapshot)
+            os.replace(tmp_path, self.snapshot_path)
         except Exception as e:
-            print(f"Error saving config: {e}")
+            print(f"Error writing config snapshot: {e}")
 
     def resolve_path(self, path_str: str) -> Path:
         """Resolves a path string to an absolute Path object."""
@@ -807,7 +975,7 @@ class ConfigLoader:
                         zf.write(logo_path, arcname=logo_arcname)
                         export_data['company']['logo'] = logo_arcname
                 
-                zf.writestr('profile.yaml', yaml.dump(export_data, allow_unicode=True, sort_keys=False))
+                zf.writestr('profile.yaml', yaml_dump(export_data, allow_unicode=True, sort_keys=False))
 
                 template_name = preset_data.get('layout', {}).get('template', preset_key)
                 
@@ -837,7 +1005,7 @@ class ConfigLoader:
                 
                 # Load config
                 try:
-                    profile_data = yaml.safe_load(zf.read('profile.yaml'))
+                    profile_data = yaml_load(zf.read('profile.yaml'))
                 except Exception:
                     return (None, "Invalid profile.yaml format")
                 
@@ -926,19 +1094,56 @@ class ConfigLoader:
     # Client Management
     # ─────────────────────────────────────────────────────────────────────────
 
+    @property
+    def client_store(self) -> ClientStore | None:
+        """
+        The SQLite client store if `clients_store: sqlite` is set, else None.
+        
+        Clients found in the YAML are moved into the store on first access.
+        """
+        if self.config.get('clients_store') != 'sqlite':
+            return None
+        
+        if self._client_store is None:
+            self._client_store = ClientStore(self.config_dir / "clients.db")
+        
+        yaml_clients = self.config.get('clients')
+        if yaml_clients:
+            imported = self._client_store.import_clients(yaml_clients)
+            print(f"Imported {imported} clients into {self._client_store.path}")
+            del self.config['clients']
+            self._save_config()
+        
+        return self._client_store
+
     def _generate_client_key(self) -> str:
         """Generates a unique client key using timestamp."""
-        return f"client_{int(time.time() * 1000)}"
+        stamp = int(time.time() * 1000)
+        store = self.client_store
+        if store is not None:
+            while store.contains(f"client_{stamp}"):
+                stamp += 1
+            return f"client_{stamp}"
+        clients = self.config.get('clients') or {}
+        while f"client_{stamp}" in clients:
+            stamp += 1
+        return f"client_{stamp}"
 
     def get_clients(self) -> dict:
         """
         Returns all saved clients as a dictionary.
         Keys are client IDs, values are client data dicts.
         """
+        store = self.client_store
+        if store is not None:
+            return store.all()
         return self.config.get('clients', {})
 
     def get_client(self, client_key: str) -> dict | None:
         """Returns a specific client by key, or None if not found."""
+        store = self.client_store
+        if store is not None:
+            return store.get(client_key)
         return self.config.get('clients', {}).get(client_key)
 
     def get_clients_list(self) -> list[tuple[str, str]]:
@@ -946,13 +1151,132 @@ class ConfigLoader:
         Returns a list of (client_key, institution) tuples for all clients,
         sorted alphabetically by institution name.
         """
-        clients = self.get_clients()
-        result = []
-        for key, data in clients.items():
-            institution = data.get('institution', '')
-            result.append((key, institution))
-        result.sort(key=lambda x: x[1].lower())
-        return result
+        return self.search_clients()
+
+    def search_clients(self, query: str = '', offset: int = 0, limit: int = None,
+                       named_only: bool = False) -> list[tuple[str, str]]:
+        """
+        Returns one page of (client_key, institution) tuples for clients matching
+        query, sorted alphabetically by institution name.
+        
+        Args:
+            query: Words that must each start a word in the client's institution,
+                contact, email or address; empty matches every client
+            offset: Number of matching clients to skip
+            limit: Maximum number of results, or None for all
+            named_only: If True, leave out clients without an institution
+        """
+        store = self.client_store
+        if store is not None:
+            return store.search(query, offset, limit, named_only)
+        
+        words = search_words(query)
+        result = [
+            (key, data.get('institution', ''))
+            for key, data in self.config.get('clients', {}).items()
+            if (not words or client_matches(data, words)) and (data.get('institution') or not named_only)
+        ]
+        result.sort(key=lambda x: client_sort_key(*x))
+        return result[offset:None if limit is None else offset + limit]
+
+    def count_clients(self, query: str = '', named_only: bool = False) -> int:
+        """Returns the number of clients matching query (see search_clients)."""
+        store = self.client_store
+        if store is not None:
+            return store.count(query, named_only)
+        words = search_words(query)
+        clients = self.config.get('clients', {})
+        if not words and not named_only:
+            return len(clients)
+        return sum(1 for data in clients.values()
+                   if (not words or client_matches(data, words)) and (data.get('institution') or not named_only))
+
+    def find_client_key(self, institution: str) -> str | None:
+        """Returns the key of a client with exactly this institution, if any."""
+        store = self.client_store
+        if store is not None:
+            return store.find_key(institution)
+        for key, data in self.config.get('clients', {}).items():
+            if data.get('institution') == institution:
+                return key
+        return None
+
+    def iter_clients(self):
+        """Yields every saved client, sorted by institution, without loading them all at once."""
+        store = self.client_store
+        if store is not None:
+            yield from store.iter_clients()
+            return
+        clients = self.config.get('clients', {})
+        for key, _ in self.search_clients():
+            yield clients[key]
+
+    def import_clients(self, clients, progress=None) -> tuple[int, int, int]:
+        """
+        Merges many clients into the saved ones with a single write.
+        
+        Clients with an email update the saved client with the same email;
+        clients without one update the saved client with the same institution
+        and contact; all others are added. Clients with neither institution nor
+        contact are skipped. With the SQLite store the clients are streamed in
+        batches within one transaction; otherwise config.yaml is saved once.
+        
+        Args:
+            clients: Iterable of client dicts (e.g. a ClientFileReader)
+            progress: Called with the number of clients processed so far;
+                an exception raised by it aborts the import without changes
+            
+        Returns:
+            Tuple of (added, updated, skipped)
+        """
+        stamp = itertools.count(int(time.time() * 1000))
+        new_key = lambda: f"client_{next(stamp)}"
+        cleaned = (clean_imported_client(client) for client in clients)
+        
+        store = self.client_store
+        if store is not None:
+            return store.merge_clients(cleaned, new_key, progress)
+        
+        saved = dict(self.config.get('clients') or {})
+        by_email = {}
+        by_name = {}
+        for key, data in saved.items():
+            # Compared like the SQLite store does, with COLLATE NOCASE
+            if data.get('email'):
+                by_email.setdefault(nocase(data['email']), key)
+            else:
+                by_name.setdefault((nocase(data.get('institution')), data.get('contact') or ''), key)
+        
+        added = updated = skipped = 0
+        for processed, client in enumerate(cleaned, 1):
+            if client is None:
+                skipped += 1
+            else:
+                if client['email']:
+                    key = by_email.get(nocase(client['email']))
+                else:
+                    key = by_name.get((nocase(client['institution']), client['contact']))
+                if key is not None:
+                    saved[key] = merge_imported_client(saved[key], client)
+                    updated += 1
+                else:
+                    key = new_key()
+                    while key in saved:
+                        key = new_key()
+                    saved[key] = client
+                    if client['email']:
+                        by_email[nocase(client['email'])] = key
+                    else:
+                        by_name[(nocase(client['institution']), client['contact'])] = key
+                    added += 1
+            if progress and processed % IMPORT_BATCH_SIZE == 0:
+                progress(processed)
+        if progress:
+            progress(added + updated + skipped)
+        
+        self.config['clients'] = saved
+        self._save_config()
+        return (added, updated, skipped)
 
     def add_client(self, client_data: dict) -> tuple[str, str | None]:
         """
@@ -968,17 +1292,26 @@ class ConfigLoader:
             return (None, "Institution is required")
         
         new_key = self._generate_client_key()
-        
-        if 'clients' not in self.config:
-            self.config['clients'] = {}
-        
-        self.config['clients'][new_key] = {
+        client = {
             'contact': client_data.get('contact', ''),
             'institution': client_data.get('institution', ''),
             'email': client_data.get('email', ''),
             'address': client_data.get('address', '')
         }
         
+        store = self.client_store
+        if store is not None:
+            try:
+                store.put(new_key, client)
+            except Exception as e:
+                return (None, str(e))
+            return (new_key, None)
+        
+        if 'clients' not in self.config:
+            self.config['clients'] = {}
+        
+        self.config['clients'][new_key] = client
+        
         self._save_config()
         return (new_key, None)
 
@@ -993,19 +1326,33 @@ class ConfigLoader:
         Returns:
             Tuple of (success, error_message or None)
         """
-        if 'clients' not in self.config or client_key not in self.config['clients']:
+        store = self.client_store
+        if store is not None:
+            exists = store.contains(client_key)
+        else:
+            exists = client_key in self.config.get('clients', {})
+        if not exists:
             return (False, f"Client '{client_key}' not found")
         
         if not client_data.get('institution'):
             return (False, "Institution is required")
         
-        self.config['clients'][client_key] = {
+        client = {
             'contact': client_data.get('contact', ''),
             'institution': client_data.get('institution', ''),
             'email': client_data.get('email', ''),
             'address': client_data.get('address', '')
         }
         
+        if store is not None:
+            try:
+                store.put(client_key, client)
+            except Exception as e:
+                return (False, str(e))
+            return (True, None)
+        
+        self.config['clients'][client_key] = client
+        
         self._save_config()
         return (True, None)
 
@@ -1019,6 +1366,15 @@ class ConfigLoader:
         Returns:
             Tuple of (success, error_message or None)
         """
+        store = self.client_store
+        if store is not None:
+            try:
+                if not store.delete(client_key):
+                    return (False, f"Client '{client_key}' not found")
+            except Exception as e:
+                return (False, str(e))
+            return (True, None)
+        
         if 'clients' not in self.config or client_key not in self.config['clients']:
             return (False, f"Client '{client_key}' not found")
         
@@ -1031,8 +1387,7 @@ class ConfigLoader:
         Ensures at least one default client exists.
         Creates a default client if the clients list is empty.
         """
-        clients = self.get_clients()
-        if not clients:
+        if not self.count_clients():
             default_client = {
                 'contact': '',
                 'institution': 'New Client',
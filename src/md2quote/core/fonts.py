@@ -0,0 +1,361 @@
+"""
+Local font cache for layouts.
+
+Layouts used to load their fonts from fonts.googleapis.com on every render, which
+made each PDF render wait on the network and stall when offline. Font families are
+now downloaded (or imported from local files) once into ~/.config/md2quote/fonts,
+and the renderer emits @font-face rules pointing at those files.
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from html import unescape
+from pathlib import Path
+
+from .config import config
+
+GOOGLE_FONTS_CSS_URL = "https://fonts.googleapis.com/css2"
+
+# Google Fonts serves woff2 (supported by QtWebEngine) to current browsers
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+# Requested axes, most complete first. Google Fonts rejects a request naming a
+# weight or style the family lacks, so the next variant is tried.
+FAMILY_AXES = [
+    "ital,wght@0,300;0,400;0,500;0,600;0,700;1,400",
+    "wght@300;400;500;600;700",
+    "wght@400;700",
+    "",
+]
+
+# Unicode subsets kept from the Google Fonts stylesheet
+FONT_SUBSETS = ('latin', 'latin-ext')
+
+FONT_EXTENSIONS = ('.woff2', '.woff', '.ttf', '.otf')
+
+DOWNLOAD_TIMEOUT = 10
+
+OFFLINE_ENV_VAR = "MD2QUOTE_OFFLINE"
+
+_FACE_RE = re.compile(r'(?:/\*\s*([\w-]+)\s*\*/\s*)?@font-face\s*{([^}]*)}', re.S)
+_URL_RE = re.compile(r'url\(([^)]+)\)')
+
+_WEIGHT_NAMES = [
+    ('thin', 100), ('extralight', 200), ('ultralight', 200), ('light', 300),
+    ('medium', 500), ('semibold', 600), ('demibold', 600), ('extrabold', 800),
+    ('ultrabold', 800), ('bold', 700), ('black', 900), ('heavy', 900),
+]
+
+
+def family_slug(family: str) -> str:
+    """Returns the directory name used for a font family."""
+    return re.sub(r'[^a-z0-9]+', '-', family.lower()).strip('-')
+
+
+def _guess_weight_and_style(filename: str) -> tuple[int, str]:
+    """Guesses weight and style from a font file name such as 'Inter-SemiBoldItalic.ttf'."""
+    name = re.sub(r'[^a-z]', '', Path(filename).stem.lower())
+    style = 'italic' if 'italic' in name or 'oblique' in name else 'normal'
+    for keyword, weight in _WEIGHT_NAMES:
+        if keyword in name:
+            return weight, style
+    return 400, style
+
+
+def google_fonts_families(url: str) -> list[str]:
+    """
+    Returns the families a Google Fonts stylesheet URL requests.
+
+    Handles both the css2 API (family=Inter:wght@400;600&family=...) and the
+    older css API (family=Inter:400,600|Roboto). The URL may be HTML-escaped.
+    """
+    query = urllib.parse.urlsplit(unescape(url)).query
+    families = []
+    for value in urllib.parse.parse_qs(query).get('family', []):
+        for family in value.split('|'):
+            name = family.split(':')[0].strip()
+            if name:
+                families.append(name)
+    return families
+
+
+def _css_string(value: str) -> str:
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+
+class FontCache:
+    """
+    Keeps font families in the config directory and builds @font-face rules for them.
+
+    Each family lives in fonts/<slug>/ with a manifest.json listing its faces
+    (file, weight, style, unicode range). Missing families are downloaded from
+    Google Fonts in the background unless offline mode is enabled.
+    """
+
+    def __init__(self, fonts_dir: Path = None, offline: bool = None):
+        self.fonts_dir = Path(fonts_dir) if fonts_dir else config.config_dir / "fonts"
+        self._offline = offline
+        self._lock = threading.Lock()
+        self._downloading = set()
+        self._failed = set()  # Families not to retry during this session
+        self._download_listeners = []
+        self._css_cache = {}
+
+    @property
+    def offline(self) -> bool:
+        """True if the cache must never touch the network."""
+        if self._offline is not None:
+            return self._offline
+        if os.environ.get(OFFLINE_ENV_VAR, '').lower() in ('1', 'true', 'yes'):
+            return True
+        return bool(config.get('fonts', {}).get('offline', False))
+
+    @offline.setter
+    def offline(self, value: bool):
+        self._offline = value
+
+    def _family_dir(self, family: str) -> Path:
+        return self.fonts_dir / family_slug(family)
+
+    def _load_manifest(self, family: str) -> list | None:
+        path = self._family_dir(family) / "manifest.json"
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('faces', [])
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, family: str, faces: list):
+        family_dir = self._family_dir(family)
+        tmp_path = family_dir / "manifest.json.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'family': family, 'faces': faces}, f, indent=2)
+        os.replace(tmp_path, family_dir / "manifest.json")
+        self._css_cache.clear()
+
+    def has_family(self, family: str) -> bool:
+        """Returns True if the family is available locally."""
+        return bool(self._load_manifest(family))
+
+    def list_families(self) -> list[str]:
+        """Returns the names of all locally available families."""
+        families = []
+        if not self.fonts_dir.exists():
+            return families
+        for manifest in sorted(self.fonts_dir.glob('*/manifest.json')):
+            try:
+                with open(manifest, 'r', encoding='utf-8') as f:
+                    families.append(json.load(f)['family'])
+            except (OSError, ValueError, KeyError):
+                continue
+        return families
+
+    def import_family(self, family: str, paths: list) -> tuple[bool, str]:
+        """
+        Imports local font files (or directories containing them) as a family.
+
+        Weight and style are derived from each file name.
+
+        Returns:
+            Tuple of (success, message)
+        """
+        files = []
+        for p in paths:
+            p = Path(p)
+            if p.is_dir():
+                files.extend(sorted(f for f in p.iterdir() if f.suffix.lower() in FONT_EXTENSIONS))
+            elif p.suffix.lower() in FONT_EXTENSIONS and p.exists():
+                files.append(p)
+
+        if not files:
+            return False, f"No font files found for {family}"
+
+        family_dir = self._family_dir(family)
+        try:
+            family_dir.mkdir(parents=True, exist_ok=True)
+            faces = []
+            for source in files:
+                shutil.copy2(source, family_dir / source.name)
+                weight, style = _guess_weight_and_style(source.name)
+                faces.append({'file': source.name, 'weight': weight, 'style': style})
+            self._write_manifest(family, faces)
+        except Exception as e:
+            return False, f"Failed to import {family}: {e}"
+
+        with self._lock:
+            self._failed.discard(family)
+        return True, f"Imported {len(faces)} font files for {family}"
+
+    def download_family(self, family: str) -> tuple[bool, str]:
+        """
+        Downloads a family from Google Fonts into the cache.
+
+        Returns:
+            Tuple of (success, message)
+        """
+        if self.offline:
+            return False, "Offline mode is enabled"
+
+        stylesheet = None
+        for axes in FAMILY_AXES:
+            spec = f"{family}:{axes}" if axes else family
+            url = f"{GOOGLE_FONTS_CSS_URL}?{urllib.parse.urlencode({'family': spec, 'display': 'swap'})}"
+            try:
+                stylesheet = self._fetch(url).decode('utf-8')
+                break
+            except urllib.error.HTTPError as e:
+                if e.code != 400:
+                    return False, f"Failed to download {family}: HTTP {e.code}"
+            except Exception as e:
+                return False, f"Failed to download {family}: {e}"
+
+        if stylesheet is None:
+            return False, f"Font family not found on Google Fonts: {family}"
+
+        blocks = [(subset, body) for subset, body in _FACE_RE.findall(stylesheet)]
+        if any(subset for subset, _ in blocks):
+            blocks = [(subset, body) for subset, body in blocks if subset in FONT_SUBSETS]
+
+        family_dir = self._family_dir(family)
+        try:
+            family_dir.mkdir(parents=True, exist_ok=True)
+            faces = []
+            for subset, body in blocks:
+                props = self._parse_declarations(body)
+                match = _URL_RE.search(props.get('src', ''))
+                if not match:
+                    continue
+                font_url = match.group(1).strip('\'"')
+                extension = Path(urllib.parse.urlparse(font_url).path).suffix or '.woff2'
+                weight = props.get('font-weight', '400')
+                style = props.get('font-style', 'normal')
+                filename = f"{family_slug(family)}-{weight}-{style}-{subset or len(faces)}{extension}"
+                (family_dir / filename).write_bytes(self._fetch(font_url))
+                face = {'file': filename, 'weight': weight, 'style': style}
+                if props.get('unicode-range'):
+                    face['unicode_range'] = props['unicode-range']
+                faces.append(face)
+
+            if not faces:
+                return False, f"No font files found for {family}"
+            self._write_manifest(family, faces)
+        except Exception as e:
+            return False, f"Failed to download {family}: {e}"
+
+        return True, f"Downloaded {len(faces)} font files for {family}"
+
+    def _fetch(self, url: str) -> bytes:
+        request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+        with urllib.request.urlopen(request, timeout=DOWNLOAD_TIMEOUT) as response:
+            return response.read()
+
+    def _parse_declarations(self, body: str) -> dict:
+        props = {}
+        for declaration in body.split(';'):
+            if ':' in declaration:
+                name, value = declaration.split(':', 1)
+                props[name.strip().lower()] = value.strip()
+        return props
+
+    def add_download_listener(self, callback):
+        """
+        Registers callback(family, ok), called when a family's download has finished.
+
+        Background downloads call it on the download thread; Qt receivers should
+        forward it through a signal.
+        """
+        self._download_listeners.append(callback)
+
+    def ensure_families(self, families: list, wait: bool = False):
+        """
+        Makes sure the families are cached, downloading missing ones.
+
+        Downloads run on a background thread unless wait is True; families that
+        failed to download are not retried during the session. Download
+        listeners are told about every finished download, so renders made with
+        the fallback fonts meanwhile can be redone. Does nothing in offline mode.
+        """
+        if self.offline:
+            return
+
+        missing = []
+        with self._lock:
+            for family in dict.fromkeys(f for f in families if f):
+                if family in self._downloading or family in self._failed:
+                    continue
+                if self.has_family(family):
+                    continue
+                self._downloading.add(family)
+                missing.append(family)
+
+        if not missing:
+            return
+
+        def run():
+            for family in missing:
+                ok, message = self.download_family(family)
+                print(message)
+                with self._lock:
+                    self._downloading.discard(family)
+                    if not ok:
+                        self._failed.add(family)
+                for callback in list(self._download_listeners):
+                    callback(family, ok)
+
+        if wait:
+            run()
+        else:
+            threading.Thread(target=run, name="font-download", daemon=True).start()
+
+    def font_face_css(self, families: list) -> str:
+        """
+        Returns @font-face rules for the locally cached families.
+
+        Families that are not cached are left to the fallbacks in the layout's
+        font stacks.
+        """
+        families = tuple(dict.fromkeys(f for f in families if f))
+        signature = []
+        for family in families:
+            manifest = self._family_dir(family) / "manifest.json"
+            try:
+                signature.append(manifest.stat().st_mtime_ns)
+            except OSError:
+                signature.append(None)
+        key = (families, tuple(signature))
+
+        css = self._css_cache.get(key)
+        if css is not None:
+            return css
+
+        rules = []
+        for family in families:
+            family_dir = self._family_dir(family)
+            for face in self._load_manifest(family) or []:
+                lines = [
+                    "@font-face {",
+                    f"  font-family: '{_css_string(family)}';",
+                    f"  font-style: {face.get('style', 'normal')};",
+                    f"  font-weight: {face.get('weight', 400)};",
+                    f"  src: url('{(family_dir / face['file']).as_uri()}');",
+                ]
+                if face.get('unicode_range'):
+                    lines.append(f"  unicode-range: {face['unicode_range']};")
+                lines.append("}")
+                rules.append("\n".join(lines))
+
+        css = "\n".join(rules)
+        self._css_cache[key] = css
+        return css
+
+
+font_cache = FontCache()
@@ -0,0 +1,464 @@
+"""
+Pooled HTTP client for the LLM providers.
+
+urllib.request opens a new connection, including a full TLS handshake, for
+every request. HTTPClient keeps finished connections open per host and reuses
+them for the next request, and retries rate-limited (429) and server error
+(5xx) responses and refused or reset connections with exponential backoff and
+jitter. It is safe to use from several threads: each request checks out its
+own connection.
+
+AsyncHTTPClient offers the same for asyncio code, on asyncio streams: requests
+running concurrently in one event loop each use their own connection, and
+finished connections are reused by later requests.
+"""
+
+import asyncio
+import http.client
+import random
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 60.0
+DEFAULT_MAX_RETRIES = 3
+
+# Backoff before retry n (0-based) is a random fraction of min(BACKOFF_MAX, backoff_base * 2**n)
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Idle connections kept per host, and how long (seconds) before they are dropped;
+# providers close idle keep-alive connections after about a minute
+MAX_IDLE_PER_HOST = 4
+IDLE_TIMEOUT = 50.0
+
+# Errors of a reused connection that the server had already closed
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                 ConnectionResetError, BrokenPipeError)
+
+
+def retry_delay(attempt: int, backoff_base: float, retry_after: str = None) -> float:
+    """Returns the seconds to wait before retry attempt (0-based), with full jitter."""
+    delay = random.uniform(0, min(BACKOFF_MAX, backoff_base * 2 ** attempt))
+    if retry_after and retry_after.strip().isdigit():
+        delay = max(delay, min(BACKOFF_MAX, float(retry_after)))
+    return delay
+
+
+class PooledResponse:
+    """
+    Response of HTTPClient.request.
+
+    The connection goes back to the pool once the body has been read to the end
+    and the server allows keep-alive; a response closed early closes it instead.
+    """
+
+    def __init__(self, client, key: tuple, conn: http.client.HTTPConnection,
+                 response: http.client.HTTPResponse):
+        self._client = client
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+
+    def read(self) -> bytes:
+        """Reads the whole body."""
+        try:
+            return self._response.read()
+        finally:
+            self._release()
+
+    def __iter__(self):
+        """Yields the body line by line (as bytes), e.g. for server-sent events."""
+        try:
+            while True:
+                line = self._response.readline()
+                if not line:
+                    break
+                yield line
+        finally:
+            self._release()
+
+    def close(self):
+        self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _release(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        if self._response.isclosed() and not self._response.will_close:
+            self._client._put_idle(self._key, conn)
+        else:
+            self._response.close()
+            conn.close()
+
+
+class HTTPClient:
+    """
+    Keep-alive connection pool with retries.
+
+    Args:
+        connect_timeout: Seconds allowed to open a connection
+        read_timeout: Seconds allowed between bytes received once connected
+        max_retries: Retries after a 429/5xx response or a refused/reset connection
+        ssl_context: Context for HTTPS connections (default: system defaults)
+        backoff_base: Upper bound in seconds of the first retry's delay
+    """
+
+    def __init__(self, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 max_retries: int = DEFAULT_MAX_RETRIES, ssl_context=None,
+                 backoff_base: float = BACKOFF_BASE):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.ssl_context = ssl_context
+        self.backoff_base = backoff_base
+        self._idle = {}  # (scheme, host, port) -> [(connection, released_at)]
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def request(self, method: str, url: str, body: bytes = None, headers: dict = None) -> PooledResponse:
+        """
+        Sends a request, retrying 429/5xx responses and connection failures.
+
+        Args:
+            method: HTTP method
+            url: Absolute http(s) URL
+            body: Request body
+            headers: Request headers
+
+        Returns:
+            The response; after the last retry it may still have an error status
+
+        Raises:
+            OSError: If no connection could be made, or the request timed out
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        attempt = 0
+        while True:
+            try:
+                response = self._send(key, method, path, body, headers or {})
+            except ConnectionError:
+                # Refused or reset; a timeout is not retried, the request may have been processed
+                if attempt >= self.max_retries:
+                    raise
+                self._sleep(attempt)
+                attempt += 1
+                continue
+
+            if response.status in RETRY_STATUSES and attempt < self.max_retries:
+                retry_after = response.headers.get('Retry-After')
+                response.read()
+                self._sleep(attempt, retry_after)
+                attempt += 1
+                continue
+            return response
+
+    def _send(self, key: tuple, method: str, path: str, body, headers: dict) -> PooledResponse:
+        conn = self._take_idle(key)
+        if conn is not None:
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                return PooledResponse(self, key, conn, conn.getresponse())
+            except _STALE_ERRORS:
+                # Closed by the server while idle; retried at once on a new connection
+                conn.close()
+
+        conn = self._connect(key)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            return PooledResponse(self, key, conn, conn.getresponse())
+        except BaseException:
+            conn.close()
+            raise
+
+    def _connect(self, key: tuple) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(host, port, timeout=self.connect_timeout,
+                                               context=self.ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(self.read_timeout)
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections_opened += 1
+        return conn
+
+    def _take_idle(self, key: tuple):
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, released_at = idle.pop()
+                if now - released_at < IDLE_TIMEOUT:
+                    return conn
+                conn.close()
+        return None
+
+    def _put_idle(self, key: tuple, conn: http.client.HTTPConnection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < MAX_IDLE_PER_HOST:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def _sleep(self, attempt: int, retry_after: str = None):
+        time.sleep(retry_delay(attempt, self.backoff_base, retry_after))
+
+    def close(self):
+        """Closes all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn, _ in connections:
+                conn.close()
+
+
+class AsyncResponse:
+    """
+    Response of AsyncHTTPClient.request.
+
+    Like PooledResponse, the connection is reused once the body has been read
+    to the end and the server allows keep-alive.
+    """
+
+    def __init__(self, client, key: tuple, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter, status: int, reason: str, headers: dict):
+        self._client = client
+        self._key = key
+        self._reader = reader
+        self._writer = writer
+        self.status = status
+        self.reason = reason
+        self.headers = headers  # Lower-case names
+        self._finished = False
+
+        self._chunked = 'chunked' in headers.get('transfer-encoding', '').lower()
+        length = headers.get('content-length')
+        self._remaining = int(length) if length is not None and not self._chunked else None
+        self._keep_alive = (headers.get('connection', '').lower() != 'close'
+                            and (self._chunked or self._remaining is not None))
+
+    async def _readline(self) -> bytes:
+        return await asyncio.wait_for(self._reader.readline(), self._client.read_timeout)
+
+    async def _read_some(self, size: int) -> bytes:
+        return await asyncio.wait_for(self._reader.read(size), self._client.read_timeout)
+
+    async def _readexactly(self, size: int) -> bytes:
+        return await asyncio.wait_for(self._reader.readexactly(size), self._client.read_timeout)
+
+    async def _body_parts(self):
+        """Yields the body as it arrives, decoding chunked transfer encoding."""
+        try:
+            if self._chunked:
+                while True:
+                    size = int((await self._readline()).split(b';')[0].strip() or b'0', 16)
+                    if size == 0:
+                        # Trailers end with an empty line
+                        while (await self._readline()).strip():
+                            pass
+                        break
+                    yield await self._readexactly(size)
+                    await self._readline()
+            elif self._remaining is not None:
+                while self._remaining > 0:
+                    part = await self._read_some(min(self._remaining, 65536))
+                    if not part:
+                        raise ConnectionResetError("Connection closed before the response was complete")
+                    self._remaining -= len(part)
+                    yield part
+            else:
+                while part := await self._read_some(65536):
+                    yield part
+            self._finished = True
+        finally:
+            await self.close()
+
+    async def read(self) -> bytes:
+        """Reads the whole body."""
+        return b''.join([part async for part in self._body_parts()])
+
+    async def iter_lines(self):
+        """Yields the body line by line (as bytes, including the line break)."""
+        pending = b''
+        async for part in self._body_parts():
+            pending += part
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                yield line + b'\n'
+        if pending:
+            yield pending
+
+    async def close(self):
+        if self._writer is None:
+            return
+        writer, self._writer = self._writer, None
+        if self._finished and self._keep_alive:
+            self._client._put_idle(self._key, self._reader, writer)
+        else:
+            writer.close()
+
+
+class AsyncHTTPClient:
+    """
+    Keep-alive connection pool with retries for asyncio.
+
+    Takes the same arguments as HTTPClient. An instance belongs to the event
+    loop it is first used in; close it before the loop ends.
+    """
+
+    def __init__(self, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 max_retries: int = DEFAULT_MAX_RETRIES, ssl_context=None,
+                 backoff_base: float = BACKOFF_BASE):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.ssl_context = ssl_context
+        self.backoff_base = backoff_base
+        self._idle = {}  # (scheme, host, port) -> [(reader, writer, released_at)]
+        self.connections_opened = 0
+
+    async def request(self, method: str, url: str, body: bytes = None, headers: dict = None) -> AsyncResponse:
+        """
+        Sends a request, retrying 429/5xx responses and connection failures.
+
+        Returns:
+            The response; after the last retry it may still have an error status
+
+        Raises:
+            OSError: If no connection could be made, or the request timed out
+        """
+        parts = urlsplit(url)
+        default_port = 443 if parts.scheme == 'https' else 80
+        key = (parts.scheme, parts.hostname, parts.port or default_port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        host = parts.hostname if key[2] == default_port else f"{parts.hostname}:{key[2]}"
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host}", f"Content-Length: {len(body or b'')}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()
+                  if name.lower() not in ('host', 'content-length')]
+        message = ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + (body or b'')
+
+        attempt = 0
+        while True:
+            try:
+                response = await self._send(key, message)
+            except ConnectionError:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(retry_delay(attempt, self.backoff_base))
+                attempt += 1
+                continue
+
+            if response.status in RETRY_STATUSES and attempt < self.max_retries:
+                retry_after = response.headers.get('retry-after')
+                await response.read()
+                await asyncio.sleep(retry_delay(attempt, self.backoff_base, retry_after))
+                attempt += 1
+                continue
+            return response
+
+    async def _send(self, key: tuple, message: bytes) -> AsyncResponse:
+        idle = self._take_idle(key)
+        if idle is not None:
+            reader, writer = idle
+            try:
+                return await self._exchange(key, reader, writer, message)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Closed by the server while idle; retried at once on a new connection
+                writer.close()
+
+        reader, writer = await self._connect(key)
+        try:
+            return await self._exchange(key, reader, writer, message)
+        except BaseException:
+            writer.close()
+            raise
+
+    async def _connect(self, key: tuple):
+        scheme, host, port = key
+        ssl_context = (self.ssl_context or True) if scheme == 'https' else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ssl_context), self.connect_timeout
+        )
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections_opened += 1
+        return reader, writer
+
+    async def _exchange(self, key: tuple, reader, writer, message: bytes) -> AsyncResponse:
+        writer.write(message)
+        await writer.drain()
+
+        status_line = await asyncio.wait_for(reader.readline(), self.read_timeout)
+        if not status_line:
+            raise http.client.RemoteDisconnected("Remote end closed connection without response")
+        try:
+            _, status, *reason = status_line.decode('latin-1').split(None, 2)
+            status = int(status)
+        except ValueError:
+            raise http.client.BadStatusLine(status_line.decode('latin-1', errors='replace'))
+
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), self.read_timeout)
+            if not line.strip():
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        return AsyncResponse(self, key, reader, writer, status,
+                             reason[0].strip() if reason else '', headers)
+
+    def _take_idle(self, key: tuple):
+        now = time.monotonic()
+        idle = self._idle.get(key, [])
+        while idle:
+            reader, writer, released_at = idle.pop()
+            if now - released_at < IDLE_TIMEOUT and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return None
+
+    def _put_idle(self, key: tuple, reader, writer):
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < MAX_IDLE_PER_HOST:
+            idle.append((reader, writer, time.monotonic()))
+        else:
+            writer.close()
+
+    async def close(self):
+        """Closes all idle connections."""
+        idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for _, writer, _ in connections:
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except OSError:
+                    pass
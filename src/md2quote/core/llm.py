@@ -5,18 +5,23 @@ Provides integration with OpenRouter and OpenAI APIs for generating
 and editing quotation content.
 """
 
+import functools
 import json
-import ssl
-import urllib.request
-import urllib.error
+import re
 from typing import Optional
 from dataclasses import dataclass
 
-try:
-    import certifi
-    SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
-except ImportError:
-    SSL_CONTEXT = ssl.create_default_context()
+
+# ssl, http.client and asyncio take tens of milliseconds to import, so they are
+# only loaded with the first request instead of at application startup.
+@functools.lru_cache(maxsize=None)
+def _ssl_context():
+    import ssl
+    try:
+        import certifi
+        return ssl.create_default_context(cafile=certifi.where())
+    except ImportError:
+        return ssl.create_default_context()
 
 
 OPENROUTER_MODELS = {
@@ -39,6 +44,14 @@ OPENAI_MODELS = {
 OPENROUTER_API_URL = 'https://openrouter.ai/api/v1/chat/completions'
 OPENAI_API_URL = 'https://api.openai.com/v1/chat/completions'
 
+# Seconds; the read timeout applies between received bytes, not to the whole response
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_MAX_RETRIES = 3
+
+# Section requests in flight at once when generating per section
+DEFAULT_MAX_CONCURRENCY = 4
+
 DEFAULT_SYSTEM_PROMPT = """You are an assistant that generates proposal content in Markdown for MD2Quote.
 
 Follow these rules:
@@ -51,6 +64,43 @@ Follow these rules:
 - Use clear, professional language with concise sections and bullet points; include scope, deliverables, and timelines when relevant."""
 
 
+SECTION_INSTRUCTION = """{instruction}
+
+The document above is one section of a longer proposal; the other sections are handled separately. Apply the instruction to this section only and return the complete rewritten section, starting with its "## " heading."""
+
+_FENCE_RE = re.compile(r'^\s*(```|~~~)')
+
+
+def split_sections(text: str) -> list[str]:
+    """
+    Splits a document before each level-2 heading ("## ").
+    
+    Returns [preamble, section, ...], where the preamble is everything before the
+    first heading (frontmatter, title; possibly empty) and every section starts
+    with its heading. Joining the parts gives back text. Headings inside the
+    frontmatter or fenced code blocks do not split.
+    """
+    lines = text.splitlines(keepends=True)
+    parts = [[]]
+    in_frontmatter = bool(lines) and lines[0].strip() == '---'
+    fence = None
+    
+    for i, line in enumerate(lines):
+        if in_frontmatter:
+            if i > 0 and line.strip() in ('---', '...'):
+                in_frontmatter = False
+        elif fence:
+            if line.strip().startswith(fence):
+                fence = None
+        elif _FENCE_RE.match(line):
+            fence = _FENCE_RE.match(line).group(1)
+        elif line.startswith('## '):
+            parts.append([])
+        parts[-1].append(line)
+    
+    return [''.join(part) for part in parts]
+
+
 @dataclass
 class LLMConfig:
     """Configuration for LLM service."""
@@ -58,6 +108,14 @@ class LLMConfig:
     api_key: str = ''
     model: str = 'anthropic/claude-sonnet-4'
     system_prompt: str = DEFAULT_SYSTEM_PROMPT
+    api_url: str = ''  # Overrides the provider's endpoint, e.g. for a compatible proxy
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT
+    timeout: float = DEFAULT_TIMEOUT
+    max_retries: int = DEFAULT_MAX_RETRIES
+    cache: bool = False  # Replay identical requests from the on-disk response cache
+    cache_ttl_hours: float = 24
+    cache_max_mb: float = 20
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
 
 
 class LLMError(Exception):
@@ -69,7 +127,8 @@ class LLMService:
     """
     Service for interacting with LLM APIs.
     
-    Supports OpenRouter and OpenAI as providers.
+    Supports OpenRouter and OpenAI as providers. Requests share a pooled HTTP
+    client, so consecutive requests reuse the provider connection.
     """
     
     def __init__(self, config_loader):
@@ -80,6 +139,8 @@ class LLMService:
             config_loader: The application's ConfigLoader instance
         """
         self.config_loader = config_loader
+        self._http = None
+        self._cache = None
     
     def get_config(self) -> LLMConfig:
         """Get current LLM configuration from the config loader."""
@@ -88,9 +149,56 @@ class LLMService:
             provider=llm_config.get('provider', 'openrouter'),
             api_key=llm_config.get('api_key', ''),
             model=llm_config.get('model', 'anthropic/claude-sonnet-4'),
-            system_prompt=llm_config.get('system_prompt', DEFAULT_SYSTEM_PROMPT)
+            system_prompt=llm_config.get('system_prompt', DEFAULT_SYSTEM_PROMPT),
+            api_url=llm_config.get('api_url', ''),
+            connect_timeout=float(llm_config.get('connect_timeout', DEFAULT_CONNECT_TIMEOUT)),
+            timeout=float(llm_config.get('timeout', DEFAULT_TIMEOUT)),
+            max_retries=int(llm_config.get('max_retries', DEFAULT_MAX_RETRIES)),
+            cache=bool(llm_config.get('cache', False)),
+            cache_ttl_hours=float(llm_config.get('cache_ttl_hours', 24)),
+            cache_max_mb=float(llm_config.get('cache_max_mb', 20)),
+            max_concurrency=max(1, int(llm_config.get('max_concurrency', DEFAULT_MAX_CONCURRENCY)))
         )
     
+    def http_client(self, config: LLMConfig):
+        """Returns the shared HTTP client, set up with the configured timeouts and retries."""
+        from .http_client import HTTPClient
+        
+        if self._http is None:
+            self._http = HTTPClient(ssl_context=_ssl_context())
+        self._http.connect_timeout = config.connect_timeout
+        self._http.read_timeout = config.timeout
+        self._http.max_retries = config.max_retries
+        return self._http
+    
+    def async_http_client(self, config: LLMConfig):
+        """Returns a new asyncio HTTP client with the configured timeouts and retries."""
+        from .http_client import AsyncHTTPClient
+        
+        return AsyncHTTPClient(connect_timeout=config.connect_timeout, read_timeout=config.timeout,
+                               max_retries=config.max_retries, ssl_context=_ssl_context())
+    
+    def response_cache(self, config: LLMConfig):
+        """Returns the response cache if enabled in the configuration, else None."""
+        if not config.cache:
+            return None
+        from .llm_cache import LLMResponseCache
+        
+        if self._cache is None:
+            try:
+                self._cache = LLMResponseCache(self.config_loader.config_dir / "cache" / "llm")
+            except OSError as e:
+                print(f"Warning: LLM response cache disabled: {e}")
+                return None
+        self._cache.ttl = config.cache_ttl_hours * 3600
+        self._cache.max_bytes = int(config.cache_max_mb * 1024 * 1024)
+        return self._cache
+    
+    def _cache_key(self, config: LLMConfig, user_prompt: str, context: str) -> str:
+        from .llm_cache import LLMResponseCache
+        return LLMResponseCache.key(config.provider, config.model, config.system_prompt,
+                                    context or '', user_prompt)
+    
     def is_configured(self) -> bool:
         """Check if the LLM service is properly configured with an API key."""
         config = self.get_config()
@@ -132,16 +240,69 @@ class LLMService:
         
         if not config.api_key:
             raise LLMError("API key not configured. Please set your API key in Settings → LLM.")
+        
+        cache = self.response_cache(config)
+        if cache is not None:
+            key = self._cache_key(config, user_prompt, context)
+            chunks = cache.get(key)
+            if chunks is not None:
+                return ''.join(chunks)
             
-        return self._make_request(config, messages, stream=False)
+        content = self._make_request(config, messages, stream=False)
+        if cache is not None:
+            cache.put(key, [content])
+        return content
 
-    def generate_stream(self, user_prompt: str, context: str = ''):
+    def generate_stream(self, user_prompt: str, context: str = '', edit: bool = False):
         """
         Generate content using the configured LLM with streaming.
         
         Args:
             user_prompt: The user's instruction/request
             context: Current editor content
+            edit: Ask for search/replace blocks against context instead of a
+                whole document, see core/llm_edits.py
+            
+        Yields:
+            Chunks of generated text; with the response cache enabled, a cached
+            response is replayed chunk by chunk
+        """
+        config = self.get_config()
+        if edit:
+            from .llm_edits import EDIT_FORMAT_PROMPT
+            config.system_prompt += EDIT_FORMAT_PROMPT
+        messages = self._prepare_messages(user_prompt, context, config)
+        
+        if not config.api_key:
+            raise LLMError("API key not configured. Please set your API key in Settings → LLM.")
+        
+        cache = self.response_cache(config)
+        if cache is None:
+            yield from self._make_request(config, messages, stream=True)
+            return
+        
+        key = self._cache_key(config, user_prompt, context)
+        chunks = cache.get(key)
+        if chunks is not None:
+            yield from chunks
+            return
+        
+        chunks = []
+        for chunk in self._make_request(config, messages, stream=True):
+            chunks.append(chunk)
+            yield chunk
+        # Only complete responses are cached
+        cache.put(key, chunks)
+
+    async def generate_stream_async(self, user_prompt: str, context: str = '', client=None):
+        """
+        Asyncio counterpart of generate_stream.
+        
+        Args:
+            user_prompt: The user's instruction/request
+            context: Current editor content
+            client: AsyncHTTPClient to send the request with, so concurrent
+                requests share its connections; a temporary one if None
             
         Yields:
             Chunks of generated text
@@ -151,12 +312,93 @@ class LLMService:
         
         if not config.api_key:
             raise LLMError("API key not configured. Please set your API key in Settings → LLM.")
+        
+        cache = self.response_cache(config)
+        if cache is not None:
+            key = self._cache_key(config, user_prompt, context)
+            cached = cache.get(key)
+            if cached is not None:
+                for chunk in cached:
+                    yield chunk
+                return
+        
+        own_client = client is None
+        if own_client:
+            client = self.async_http_client(config)
+        url, headers, data = self._build_request(config, messages, stream=True)
+        chunks = []
+        
+        try:
+            response = await client.request('POST', url, body=data, headers=headers)
+            if response.status >= 400:
+                self._raise_http_error(response.status, await response.read())
             
-        yield from self._make_request(config, messages, stream=True)
+            done = False
+            # Read to the end even after [DONE] so the connection can be reused
+            async for line in response.iter_lines():
+                if done:
+                    continue
+                content, done = self._parse_stream_line(line.decode('utf-8'))
+                if content:
+                    chunks.append(content)
+                    yield content
+                    
+        except LLMError:
+            raise
+        except TimeoutError:
+            raise LLMError(f"The request timed out after {config.timeout:g} seconds without a response.")
+        except OSError as e:
+            raise LLMError(f"Network error: {e}. Please check your internet connection.")
+        except Exception as e:
+            raise LLMError(f"Streaming error: {e}")
+        finally:
+            if own_client:
+                await client.close()
+        
+        if cache is not None:
+            cache.put(key, chunks)
 
-    def _prepare_messages(self, user_prompt: str, context: str) -> list:
-        """Helper to prepare message list."""
+    async def generate_sections(self, instruction: str, sections: list, on_chunk=None,
+                                max_concurrency: int = None) -> list:
+        """
+        Applies an instruction to each section of a document, concurrently.
+        
+        Args:
+            instruction: The user's instruction, applied to every section
+            sections: Section texts, e.g. from split_sections()
+            on_chunk: Called with (section index, chunk) as text arrives
+            max_concurrency: Requests in flight at once (default: llm.max_concurrency)
+            
+        Returns:
+            For each section, its rewritten text or the LLMError it failed with
+        """
+        import asyncio
+        
         config = self.get_config()
+        slots = asyncio.Semaphore(max_concurrency or config.max_concurrency)
+        client = self.async_http_client(config)
+        prompt = SECTION_INSTRUCTION.format(instruction=instruction)
+        
+        async def rewrite(index: int, section: str) -> str:
+            async with slots:
+                parts = []
+                async for chunk in self.generate_stream_async(prompt, section, client):
+                    parts.append(chunk)
+                    if on_chunk is not None:
+                        on_chunk(index, chunk)
+                return ''.join(parts)
+        
+        try:
+            return await asyncio.gather(
+                *(rewrite(index, section) for index, section in enumerate(sections)),
+                return_exceptions=True
+            )
+        finally:
+            await client.close()
+
+    def _prepare_messages(self, user_prompt: str, context: str, config: LLMConfig = None) -> list:
+        """Helper to prepare message list."""
+        config = config or self.get_config()
         messages = [
             {"role": "system", "content": config.system_prompt}
         ]
@@ -193,6 +435,44 @@ class LLMService:
         Raises:
             LLMError: If the request fails
         """
+        url, headers, data = self._build_request(config, messages, stream)
+        
+        try:
+            response = self.http_client(config).request('POST', url, body=data, headers=headers)
+            
+            if response.status >= 400:
+                self._raise_http_error(response.status, response.read())
+            
+            if stream:
+                return self._handle_streaming_response(response)
+            
+            result = json.loads(response.read().decode('utf-8'))
+                
+            if 'choices' in result and len(result['choices']) > 0:
+                choice = result['choices'][0]
+                if 'message' in choice and 'content' in choice['message']:
+                    return choice['message']['content']
+                elif 'text' in choice:
+                    return choice['text']
+            
+            raise LLMError("Unexpected API response format")
+                
+        except TimeoutError:
+            raise LLMError(f"The request timed out after {config.timeout:g} seconds without a response.")
+            
+        except OSError as e:
+            raise LLMError(f"Network error: {e}. Please check your internet connection.")
+            
+        except json.JSONDecodeError as e:
+            raise LLMError(f"Failed to parse API response: {e}")
+            
+        except Exception as e:
+            if isinstance(e, LLMError):
+                raise e
+            raise LLMError(f"Unexpected error: {e}")
+
+    def _build_request(self, config: LLMConfig, messages: list, stream: bool) -> tuple[str, dict, bytes]:
+        """Returns the URL, headers and JSON body of a chat completion request."""
         if config.provider == 'openai':
             url = OPENAI_API_URL
             headers = {
@@ -207,6 +487,7 @@ class LLMService:
                 'HTTP-Referer': 'https://github.com/md2quote',
                 'X-Title': 'MD2Quote'
             }
+        url = config.api_url or url
         
         body = {
             'model': config.model,
@@ -215,81 +496,58 @@ class LLMService:
             'max_tokens': 4096,
             'stream': stream
         }
+        return url, headers, json.dumps(body).encode('utf-8')
+
+    @staticmethod
+    def _raise_http_error(status: int, error_body: bytes):
+        """Raises an LLMError describing an error response."""
+        error_body = error_body.decode('utf-8', errors='replace')
+        try:
+            error_data = json.loads(error_body)
+            error_message = error_data.get('error', {}).get('message', error_body)
+        except (json.JSONDecodeError, AttributeError):
+            error_message = error_body or f"HTTP {status}"
         
+        if status == 401:
+            raise LLMError(f"Authentication failed. Please check your API key.\n{error_message}")
+        elif status == 429:
+            raise LLMError(f"Rate limit exceeded. Please try again later.\n{error_message}")
+        elif status == 400:
+            raise LLMError(f"Invalid request: {error_message}")
+        else:
+            raise LLMError(f"API error ({status}): {error_message}")
+
+    @staticmethod
+    def _parse_stream_line(line: str) -> tuple[str, bool]:
+        """Returns the content of one server-sent event line, and whether it ends the stream."""
+        line = line.strip()
+        if not line.startswith('data: '):
+            return '', False
+        data_str = line[6:]
+        if data_str == '[DONE]':
+            return '', True
         try:
-            data = json.dumps(body).encode('utf-8')
-            request = urllib.request.Request(url, data=data, headers=headers, method='POST')
-            
-            if stream:
-                return self._handle_streaming_response(request)
-            
-            with urllib.request.urlopen(request, timeout=60, context=SSL_CONTEXT) as response:
-                result = json.loads(response.read().decode('utf-8'))
-                
-            if 'choices' in result and len(result['choices']) > 0:
-                choice = result['choices'][0]
-                if 'message' in choice and 'content' in choice['message']:
-                    return choice['message']['content']
-                elif 'text' in choice:
-                    return choice['text']
-            
-            raise LLMError("Unexpected API response format")
-            
-        except urllib.error.HTTPError as e:
-            error_body = e.read().decode('utf-8') if e.fp else ''
-            try:
-                error_data = json.loads(error_body)
-                error_message = error_data.get('error', {}).get('message', str(e))
-            except json.JSONDecodeError:
-                error_message = error_body or str(e)
-            
-            if e.code == 401:
-                raise LLMError(f"Authentication failed. Please check your API key.\n{error_message}")
-            elif e.code == 429:
-                raise LLMError(f"Rate limit exceeded. Please try again later.\n{error_message}")
-            elif e.code == 400:
-                raise LLMError(f"Invalid request: {error_message}")
-            else:
-                raise LLMError(f"API error ({e.code}): {error_message}")
-                
-        except urllib.error.URLError as e:
-            raise LLMError(f"Network error: {e.reason}. Please check your internet connection.")
-            
-        except json.JSONDecodeError as e:
-            raise LLMError(f"Failed to parse API response: {e}")
-            
-        except Exception as e:
-            if isinstance(e, LLMError):
-                raise e
-            raise LLMError(f"Unexpected error: {e}")
+            data = json.loads(data_str)
+        except json.JSONDecodeError:
+            return '', False
+        if 'choices' in data and len(data['choices']) > 0:
+            delta = data['choices'][0].get('delta', {})
+            return delta.get('content', '') or '', False
+        return '', False
 
-    def _handle_streaming_response(self, request):
+    def _handle_streaming_response(self, response):
         """Helper to yield chunks from a streaming response."""
         try:
-            with urllib.request.urlopen(request, timeout=60, context=SSL_CONTEXT) as response:
-                for line in response:
-                    line = line.decode('utf-8').strip()
-                    if not line:
-                        continue
-                        
-                    if line.startswith('data: '):
-                        data_str = line[6:]
-                        if data_str == '[DONE]':
-                            break
-                        
-                        try:
-                            data = json.loads(data_str)
-                            if 'choices' in data and len(data['choices']) > 0:
-                                delta = data['choices'][0].get('delta', {})
-                                content = delta.get('content', '')
-                                if content:
-                                    yield content
-                        except json.JSONDecodeError:
-                            continue
+            done = False
+            # Read to the end even after [DONE] so the connection can be reused
+            for line in response:
+                if done:
+                    continue
+                content, done = self._parse_stream_line(line.decode('utf-8'))
+                if content:
+                    yield content
                             
         except Exception as e:
-            if isinstance(e, urllib.error.HTTPError):
-                error_body = e.read().decode('utf-8') if e.fp else ''
-                raise LLMError(f"Streaming API error ({e.code}): {error_body or str(e)}")
             raise LLMError(f"Streaming error: {e}")
-
+        finally:
+            response.close()
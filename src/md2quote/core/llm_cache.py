@@ -0,0 +1,122 @@
+"""
+On-disk cache of LLM responses.
+
+Re-running the same instruction on the same document with the same model is
+answered from the cache instead of the provider. Entries are keyed by a hash
+of the provider, model, system prompt, context and instruction, and store the
+streamed chunks so a hit replays like a live response. The cache is off unless
+enabled in config.yaml:
+
+    llm:
+      cache: true
+      cache_ttl_hours: 24
+      cache_max_mb: 20
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from .tracing import tracer
+
+DEFAULT_TTL_HOURS = 24
+DEFAULT_MAX_MB = 20
+
+
+class LLMResponseCache:
+    """
+    Directory of cached responses with expiry and a size limit.
+
+    Args:
+        cache_dir: Directory holding one JSON file per response
+        ttl: Seconds after which an entry is discarded
+        max_bytes: Total size above which the least recently used entries are removed
+    """
+
+    def __init__(self, cache_dir: Path, ttl: float = DEFAULT_TTL_HOURS * 3600,
+                 max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(provider: str, model: str, system_prompt: str, context: str, instruction: str) -> str:
+        """Returns the cache key of a request."""
+        payload = json.dumps([provider, model, system_prompt, context, instruction], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> list[str] | None:
+        """Returns the cached chunks for key, or None if missing or expired."""
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            tracer.count("llm_cache.miss")
+            return None
+
+        if time.time() - entry.get('created', 0) > self.ttl:
+            self._remove(path)
+            tracer.count("llm_cache.miss")
+            return None
+
+        try:
+            os.utime(path)  # Marks it recently used for eviction
+        except OSError:
+            pass
+        tracer.count("llm_cache.hit")
+        return entry.get('chunks', [])
+
+    def put(self, key: str, chunks: list[str]):
+        """Stores the chunks of a completed response."""
+        if not ''.join(chunks).strip():
+            return
+        path = self._path(key)
+        tmp_path = path.with_suffix('.tmp')
+        entry = {'created': time.time(), 'chunks': chunks}
+        try:
+            tmp_path.write_text(json.dumps(entry, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp_path, path)
+            self.prune()
+        except OSError as e:
+            print(f"Warning: Could not write LLM cache entry: {e}")
+
+    def prune(self):
+        """Removes expired entries, then the least recently used ones beyond max_bytes."""
+        now = time.time()
+        entries = []
+        for path in self.cache_dir.glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            # mtime is the last use, so an entry unused for ttl was also created before that
+            if now - stat.st_mtime > self.ttl:
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        """Removes all entries."""
+        for path in self.cache_dir.glob('*.json'):
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+        except OSError:
+            pass
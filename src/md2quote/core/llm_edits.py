@@ -0,0 +1,141 @@
+"""
+Search/replace edits returned by the LLM.
+
+In edit mode the model does not return the whole document but only the
+changes, as blocks of the form
+
+    <<<<<<< SEARCH
+    exact lines from the current document
+    =======
+    the lines replacing them
+    >>>>>>> REPLACE
+
+so output tokens and latency scale with the size of the change. The blocks are
+validated against the document and applied all at once, or not at all.
+"""
+
+import re
+from dataclasses import dataclass
+
+from .llm import LLMError
+
+EDIT_FORMAT_PROMPT = """
+
+You are editing an existing document. Do NOT return the whole document. Return only the changes, as one or more blocks in exactly this format:
+
+<<<<<<< SEARCH
+lines copied exactly from the current document, including their whitespace
+=======
+the lines that replace them
+>>>>>>> REPLACE
+
+Rules for the blocks:
+- The SEARCH part must match the current document exactly and appear in it only once; include a few unchanged neighbouring lines if needed to make it unique.
+- Keep blocks small: only the lines that change plus the context needed to locate them.
+- To delete lines, leave the part after ======= empty. To add content at the end of the document, leave the SEARCH part empty.
+- Blocks are applied in order, each to the result of the previous ones.
+- Output nothing but the blocks."""
+
+_BLOCK_RE = re.compile(
+    r'^<{5,9} ?SEARCH[ \t]*\n(.*?)^={5,9}[ \t]*\n(.*?)^>{5,9} ?REPLACE[ \t]*$',
+    re.MULTILINE | re.DOTALL
+)
+
+
+class EditError(LLMError):
+    """The LLM's edits are malformed or do not match the document."""
+    pass
+
+
+@dataclass
+class EditBlock:
+    """One search/replace edit."""
+    search: str
+    replace: str
+
+
+def parse_edit_blocks(response: str) -> list[EditBlock]:
+    """
+    Extracts the search/replace blocks from an LLM response.
+
+    Text around the blocks (e.g. code fences) is ignored.
+
+    Raises:
+        EditError: If the response contains no complete block
+    """
+    response = response.replace('\r\n', '\n')
+    blocks = [EditBlock(search, replace) for search, replace in _BLOCK_RE.findall(response)]
+    if not blocks:
+        if 'SEARCH' in response:
+            raise EditError("The LLM returned incomplete edit blocks.")
+        raise EditError("The LLM returned no edits.")
+    return blocks
+
+
+def _find_unique(document: str, search: str) -> tuple[int, int] | None:
+    """
+    Returns the (start, end) of the only occurrence of search in document.
+
+    Falls back to comparing lines without trailing whitespace, which models
+    often drop. Returns None if search does not occur.
+
+    Raises:
+        EditError: If search occurs more than once
+    """
+    count = document.count(search)
+    if count == 1:
+        start = document.index(search)
+        return start, start + len(search)
+    if count > 1:
+        raise EditError(f"The text to replace occurs {count} times in the document:\n\n{search.strip()}")
+
+    search_lines = [line.rstrip() for line in search.rstrip('\n').split('\n')]
+    doc_lines = document.split('\n')
+    offsets = [0]
+    for line in doc_lines:
+        offsets.append(offsets[-1] + len(line) + 1)
+
+    matches = [
+        i for i in range(len(doc_lines) - len(search_lines) + 1)
+        if all(doc_lines[i + j].rstrip() == search_lines[j] for j in range(len(search_lines)))
+    ]
+    if len(matches) > 1:
+        raise EditError(
+            f"The text to replace occurs {len(matches)} times in the document:\n\n{search.strip()}"
+        )
+    if not matches:
+        return None
+
+    first = matches[0]
+    end = offsets[first + len(search_lines)] - 1  # End of the last matched line
+    if search.endswith('\n') and end < len(document):
+        end += 1
+    return offsets[first], end
+
+
+def apply_edit_blocks(document: str, blocks: list[EditBlock]) -> str:
+    """
+    Applies edits in order and returns the new document.
+
+    Either every block applies or an EditError is raised; the caller's
+    document is never partially edited.
+
+    Raises:
+        EditError: If a block's search text is missing from or ambiguous in the document
+    """
+    result = document
+    for number, block in enumerate(blocks, 1):
+        if not block.search.strip():
+            # Appends to the document
+            separator = '' if not result or result.endswith('\n\n') else ('\n' if result.endswith('\n') else '\n\n')
+            result += separator + block.replace
+            continue
+
+        span = _find_unique(result, block.search)
+        if span is None:
+            raise EditError(
+                f"Edit {number} of {len(blocks)} does not match the document:\n\n{block.search.strip()}"
+            )
+        start, end = span
+        result = result[:start] + block.replace + result[end:]
+    return result
@@ -0,0 +1,184 @@
+"""
+Quotation number allocation shared by all running MD2Quote processes.
+
+The counter of each template used to live only in config.yaml, so two app
+instances (or a batch run next to the GUI) could read the same value and hand
+out the same quotation number. Counters are now allocated from an SQLite
+database in the config directory: each reservation runs in an exclusive write
+transaction, so concurrent processes always receive distinct numbers.
+config.yaml keeps a copy of the latest counter for display.
+"""
+
+import sqlite3
+from pathlib import Path
+
+# Seconds a process waits for another one's reservation to finish
+LOCK_TIMEOUT = 10.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    preset_key TEXT PRIMARY KEY,
+    counter INTEGER NOT NULL DEFAULT 0,
+    last_reset_year INTEGER,
+    last_reset_month INTEGER
+);
+"""
+
+
+def needs_reset(format_str: str, last_year, last_month, year: int, month: int) -> bool:
+    """
+    Returns True if the counter starts over for the given date.
+
+    Formats containing {YYYY} or {YY} restart every year, formats containing
+    {MM} every month; other formats never restart.
+    """
+    if '{YYYY}' in format_str or '{YY}' in format_str:
+        if last_year != year:
+            return True
+    if '{MM}' in format_str:
+        if last_year != year or last_month != month:
+            return True
+    return False
+
+
+class QuotationCounter:
+    """
+    Atomic, cross-process counter per template.
+
+    Args:
+        path: SQLite database file
+        timeout: Seconds to wait for a concurrent reservation
+    """
+
+    def __init__(self, path: Path, timeout: float = LOCK_TIMEOUT):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per call: cheap, and safe to use from any thread or process
+        conn = sqlite3.connect(str(self.path), timeout=self.timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def reserve(self, preset_key: str, format_str: str, year: int, month: int,
+                count: int = 1, seed: tuple = None) -> int:
+        """
+        Reserves count consecutive counter values.
+
+        Args:
+            preset_key: Template the numbers belong to
+            format_str: Number format, which decides when the counter restarts
+            year: Current year
+            month: Current month
+            count: Size of the block to reserve
+            seed: (counter, last_reset_year, last_reset_month) to start from if
+                the template has no counter yet, e.g. the values in config.yaml
+
+        Returns:
+            The first reserved value; the block is first .. first + count - 1
+        """
+        if count < 1:
+            raise ValueError("count must be at least 1")
+
+        conn = self._connect()
+        try:
+            # Takes the database write lock before reading the counter
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT counter, last_reset_year, last_reset_month FROM counters WHERE preset_key = ?",
+                    (preset_key,)
+                ).fetchone()
+                counter, last_year, last_month = row or seed or (0, None, None)
+                counter = counter or 0
+
+                if needs_reset(format_str, last_year, last_month, year, month):
+                    counter = 0
+
+                conn.execute(
+                    "INSERT INTO counters (preset_key, counter, last_reset_year, last_reset_month) "
+                    "VALUES (?, ?, ?, ?) ON CONFLICT(preset_key) DO UPDATE SET counter = excluded.counter, "
+                    "last_reset_year = excluded.last_reset_year, last_reset_month = excluded.last_reset_month",
+                    (preset_key, counter + count, year, month)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+        return counter + 1
+
+    def peek(self, preset_key: str) -> tuple | None:
+        """Returns (counter, last_reset_year, last_reset_month), or None if never used."""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT counter, last_reset_year, last_reset_month FROM counters WHERE preset_key = ?",
+                (preset_key,)
+            ).fetchone()
+        finally:
+            conn.close()
+
+    def set(self, preset_key: str, counter: int, format_str: str, year: int, month: int):
+        """
+        Continues the template's numbering after counter; the next value is counter + 1.
+
+        The counter never moves back within its period, since numbers below the
+        stored value may already be in use; only reset() starts it over.
+
+        Args:
+            preset_key: Template the numbers belong to
+            counter: Last value considered used
+            format_str: Number format, which decides when the counter restarts
+            year: Current year
+            month: Current month
+
+        Raises:
+            ValueError: If counter is below the stored counter of the current period
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT counter, last_reset_year, last_reset_month FROM counters WHERE preset_key = ?",
+                    (preset_key,)
+                ).fetchone()
+                if row is not None and not needs_reset(format_str, row[1], row[2], year, month):
+                    if counter < (row[0] or 0):
+                        raise ValueError(f"Counter {counter} is below the current value {row[0]}")
+
+                # Stamped with the current period, so the next reserve() does not restart it
+                conn.execute(
+                    "INSERT INTO counters (preset_key, counter, last_reset_year, last_reset_month) "
+                    "VALUES (?, ?, ?, ?) ON CONFLICT(preset_key) DO UPDATE SET counter = excluded.counter, "
+                    "last_reset_year = excluded.last_reset_year, last_reset_month = excluded.last_reset_month",
+                    (preset_key, counter, year, month)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def reset(self, preset_key: str):
+        """Starts the template's counter over at 0."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO counters (preset_key, counter, last_reset_year, last_reset_month) "
+                "VALUES (?, 0, NULL, NULL) ON CONFLICT(preset_key) DO UPDATE SET counter = 0, "
+                "last_reset_year = NULL, last_reset_month = NULL",
+                (preset_key,)
+            )
+        finally:
+            conn.close()
@@ -1,14 +1,42 @@
 import yaml
 import mistune
 import re
-from typing import Dict, Any, Tuple
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple
+
+from .tracing import traced
+from ..utils import yaml_load
+
+
+PAGE_BREAK_RE = re.compile(r'<p>\s*\+\+\+\s*</p>')
+
+# Block-splitting helpers for incremental parsing
+FENCE_OPEN_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+LIST_ITEM_RE = re.compile(r'^ {0,3}(?:[-+*]|\d{1,9}[.)])(?:[ \t]|$)')
+
+# Constructs whose rendering depends on other blocks (reference links, block quotes
+# interrupted by another block) or whose extent the block splitter cannot track
+# (raw HTML blocks); documents containing them are parsed in full.
+NON_LOCAL_RE = re.compile(
+    r'^ {0,3}(?:\[[^\]]+\]:|<[A-Za-z/!?]|>.*\n(?! {0,3}>)\s*\S)',
+    re.MULTILINE
+)
+
 
 class MarkdownParser:
-    def __init__(self):
+    def __init__(self, incremental: bool = False):
+        """
+        Args:
+            incremental: If True, parse_text only re-renders the top-level blocks
+                that changed since the previous call. The output is identical to a
+                full parse.
+        """
         self.markdown = mistune.create_markdown(
             plugins=['table', 'url', 'strikethrough'],
             escape=False
         )
+        self.incremental = incremental
+        self._block_cache: Dict[str, str] = {}
 
     def parse_file(self, file_path: str) -> Tuple[Dict[str, Any], str]:
         """
@@ -20,21 +48,123 @@ class MarkdownParser:
         
         return self.parse_text(content)
 
+    def read_metadata(self, file_path: str) -> Dict[str, Any]:
+        """Returns only the YAML frontmatter of a markdown file."""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        
+        return self._extract_frontmatter(content)[0]
+
+    @traced("MarkdownParser.parse_text")
     def parse_text(self, content: str) -> Tuple[Dict[str, Any], str]:
         """
         Parses markdown text with YAML frontmatter.
         """
         metadata, markdown_body = self._extract_frontmatter(content)
-        html_content = self.markdown(markdown_body)
-        
-        html_content = re.sub(
-            r'<p>\s*\+\+\+\s*</p>', 
-            '<div class="page-break"></div>', 
-            html_content
-        )
-        
+
+        if self.incremental:
+            html_content = self._render_incremental(markdown_body)
+        else:
+            html_content = self._render_block(markdown_body)
+
         return metadata, html_content
 
+    def _render_block(self, markdown_text: str) -> str:
+        """Renders markdown to HTML and rewrites +++ markers into page breaks."""
+        html_content = self.markdown(markdown_text)
+
+        return PAGE_BREAK_RE.sub('<div class="page-break"></div>', html_content)
+
+    def _render_incremental(self, markdown_body: str) -> str:
+        """
+        Renders the body block by block, reusing cached HTML for blocks whose
+        content hash is unchanged since the previous call.
+        """
+        text = markdown_body.replace('\r\n', '\n').replace('\r', '\n')
+        if not text.endswith('\n'):
+            text += '\n'
+
+        blocks = None if NON_LOCAL_RE.search(text) else self._split_blocks(text)
+        if blocks is None:
+            self._block_cache = {}
+            return self._render_block(text)
+
+        cache = {}
+        parts = []
+        for block in blocks:
+            key = hashlib.sha1(block.encode('utf-8')).hexdigest()
+            html = cache.get(key)
+            if html is None:
+                html = self._block_cache.get(key)
+            if html is None:
+                html = self._render_block(block)
+            cache[key] = html
+            parts.append(html)
+
+        # Only blocks of the current document are kept, which bounds the cache
+        self._block_cache = cache
+        return ''.join(parts)
+
+    def _split_blocks(self, text: str) -> Optional[List[str]]:
+        """
+        Splits normalized markdown into independently renderable top-level blocks.
+
+        A new block starts after a blank line unless the next line continues the
+        current block: indented content, another item of a list, or anything
+        inside a fenced code block. Joining the blocks yields the input text.
+
+        Returns None if the block boundaries cannot be determined reliably.
+        """
+        blocks = []
+        current = []
+        fence = None
+        after_blank = False
+        is_list = False
+
+        for line in text.splitlines(keepends=True):
+            if fence:
+                current.append(line)
+                stripped = line.strip()
+                if (len(line) - len(line.lstrip(' ')) <= 3
+                        and stripped.startswith(fence)
+                        and not stripped.strip(fence[0])):
+                    fence = None
+                continue
+
+            if not line.strip():
+                current.append(line)
+                after_blank = True
+                continue
+
+            if after_blank:
+                continues = line[0] in ' \t' or (is_list and LIST_ITEM_RE.match(line))
+                if current and not continues:
+                    blocks.append(''.join(current))
+                    current = []
+                    is_list = False
+                after_blank = False
+
+            if LIST_ITEM_RE.match(line):
+                is_list = True
+
+            current.append(line)
+
+            match = FENCE_OPEN_RE.match(line)
+            if match:
+                marker = match.group(1)
+                info = line[match.end():]
+                if not (marker[0] == '`' and '`' in info):
+                    if is_list and line[0] == ' ':
+                        # A fence nested in a list item ends with the item,
+                        # which cannot be determined line by line.
+                        return None
+                    fence = marker
+
+        if current:
+            blocks.append(''.join(current))
+
+        return blocks
+
     def _extract_frontmatter(self, content: str) -> Tuple[Dict[str, Any], str]:
         """
         Extracts YAML frontmatter from the beginning of the file.
@@ -45,7 +175,7 @@ class MarkdownParser:
         if match:
             yaml_content = match.group(1)
             try:
-                metadata = yaml.safe_load(yaml_content) or {}
+                metadata = yaml_load(yaml_content) or {}
                 return metadata, content[match.end():]
             except yaml.YAMLError as e:
                 print(f"Error parsing YAML frontmatter: {e}")
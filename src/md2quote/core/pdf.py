@@ -1,20 +1,53 @@
+import time
+from collections import deque
 from pathlib import Path
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWebEngineCore import QWebEnginePage
-from PyQt6.QtCore import QEventLoop, QUrl, QMarginsF
+from PyQt6.QtCore import QEventLoop, QUrl, QMarginsF, QObject, QTimer, pyqtSignal
 from PyQt6.QtGui import QPageLayout, QPageSize
 from ..core.config import config
+from .pdf_cache import PDFCache
+from .style_patch import style_patch_script
+from .tracing import tracer, traced
 
 
 DEFAULT_PAGE_MARGINS = (20, 20, 20, 20)
 
+# Printed once per worker at launch so Chromium and its profile start before the first preview
+WARM_UP_HTML = "<!DOCTYPE html><html><body><p>&nbsp;</p></body></html>"
+
+# How long a style-patched page may wait for newly referenced fonts before printing
+FONT_POLL_MS = 20
+FONT_POLL_ATTEMPTS = 50
+
+# A job that has not printed after this long fails and its page is replaced,
+# e.g. when the render process crashed and no callback will ever arrive
+JOB_TIMEOUT_MS = 30000
+
+
+def page_layout(margins: tuple) -> QPageLayout:
+    """Returns A4 page layout with the given margins in mm as (top, right, bottom, left)."""
+    top, right, bottom, left = margins
+    return QPageLayout(
+        QPageSize(QPageSize.PageSizeId.A4),
+        QPageLayout.Orientation.Portrait,
+        QMarginsF(left, top, right, bottom),
+        QPageLayout.Unit.Millimeter
+    )
+
+
+def base_url() -> QUrl:
+    """Base URL for resolving relative resources in rendered HTML."""
+    return QUrl.fromLocalFile(str(config.config_dir) + "/")
+
 
 class PDFGenerator:
     """Generates PDFs from HTML using Qt's WebEngine."""
     
-    def __init__(self):
+    def __init__(self, cache: PDFCache = None):
         self._view = None
         self._margins = DEFAULT_PAGE_MARGINS
+        self.cache = cache
     
     def set_margins(self, margins: tuple):
         """Set page margins in mm as (top, right, bottom, left)."""
@@ -28,28 +61,35 @@ class PDFGenerator:
     
     def _get_page_layout(self):
         """Returns A4 page layout with configured margins."""
-        top, right, bottom, left = self._margins
-        return QPageLayout(
-            QPageSize(QPageSize.PageSizeId.A4),
-            QPageLayout.Orientation.Portrait,
-            QMarginsF(left, top, right, bottom),
-            QPageLayout.Unit.Millimeter
-        )
+        return page_layout(self._margins)
     
     def generate(self, html_content: str, output_path: str):
         """Generates a PDF from HTML content and saves to file."""
         pdf_bytes = self.generate_bytes(html_content)
         Path(output_path).write_bytes(pdf_bytes)
     
+    @traced("PDFGenerator.generate_bytes")
     def generate_bytes(self, html_content: str) -> bytes:
-        """Generates a PDF and returns bytes."""
-        self._ensure_view()
+        """Generates a PDF and returns bytes. Identical documents are served from the cache."""
+        key = None
+        if self.cache is not None:
+            key = PDFCache.key(html_content, self._margins, config.config_dir)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
         
-        base_url = QUrl.fromLocalFile(str(config.config_dir) + "/")
+        pdf_bytes = self._render_bytes(html_content)
+        if key is not None:
+            self.cache.put(key, pdf_bytes)
+        return pdf_bytes
+    
+    def _render_bytes(self, html_content: str) -> bytes:
+        """Renders HTML to PDF bytes, blocking on a local event loop."""
+        self._ensure_view()
         
         loop = QEventLoop()
         self._view.loadFinished.connect(loop.quit)
-        self._view.setHtml(html_content, base_url)
+        self._view.setHtml(html_content, base_url())
         loop.exec()
         
         pdf_data = []
@@ -62,3 +102,317 @@ class PDFGenerator:
         loop.exec()
         
         return pdf_data[0] if pdf_data else b""
+
+
+class PDFRenderJob:
+    """A queued HTML to PDF conversion."""
+    
+    def __init__(self, job_id: int, html_content: str, margins: tuple, coalesce: bool,
+                 warm_up: bool = False):
+        self.job_id = job_id
+        self.html_content = html_content
+        self.margins = margins
+        self.coalesce = coalesce
+        self.warm_up = warm_up
+        self.cache_key = None
+        self.patched = False  # Applied to the loaded page instead of reloading it
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+
+
+class PDFRenderWorker(QObject):
+    """
+    Persistent off-screen page that converts one job at a time.
+    
+    Loading and printing are driven by signals and callbacks instead of nested
+    event loops, so the GUI stays responsive while Chromium renders.
+    
+    If a job's HTML differs from the loaded document only in its styles, the
+    new styles are applied to the loaded page with JavaScript and the page is
+    printed again without a reload (see core/style_patch.py).
+    
+    A watchdog fails a job that is not done within JOB_TIMEOUT_MS and replaces
+    the page, so a hung render never keeps the worker busy.
+    """
+    
+    finished = pyqtSignal(object, bytes)  # Emits (job, pdf_bytes)
+    failed = pyqtSignal(object, str)      # Emits (job, error message)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.page = None
+        self._new_page()
+        self.job = None
+        self.loaded_html = None  # Document the page currently shows
+        self._watchdog = QTimer(self)
+        self._watchdog.setSingleShot(True)
+        self._watchdog.setInterval(JOB_TIMEOUT_MS)
+        self._watchdog.timeout.connect(self._on_timeout)
+    
+    def _new_page(self):
+        """Replaces the page; callbacks still pending on the old one are ignored."""
+        if self.page is not None:
+            self.page.loadFinished.disconnect(self._on_load_finished)
+            self.page.deleteLater()
+        self.page = QWebEnginePage(self)
+        self.page.loadFinished.connect(self._on_load_finished)
+    
+    @property
+    def busy(self) -> bool:
+        return self.job is not None
+    
+    def start(self, job: PDFRenderJob):
+        """Loads or style-patches the job's HTML; printing starts once the page is ready."""
+        self.job = job
+        job.started_at = time.perf_counter()
+        self._watchdog.start()
+        script = None
+        if self.loaded_html is not None and not job.warm_up:
+            script = style_patch_script(self.loaded_html, job.html_content)
+        if script is None:
+            self._load(job)
+            return
+        self.page.runJavaScript(script, lambda ok: self._on_patched(job, ok))
+    
+    def _load(self, job: PDFRenderJob):
+        self.loaded_html = None
+        self.page.setHtml(job.html_content, base_url())
+    
+    def _on_patched(self, job: PDFRenderJob, ok):
+        if job is not self.job:
+            return
+        if ok is not True:
+            # The page does not match the document it was loaded with
+            tracer.count("pdf_render.patch_failed")
+            self._load(job)
+            return
+        tracer.count("pdf_render.patched")
+        job.patched = True
+        self.loaded_html = job.html_content
+        self._print_when_fonts_loaded(job, FONT_POLL_ATTEMPTS)
+    
+    def _print_when_fonts_loaded(self, job: PDFRenderJob, attempts: int):
+        """Prints once fonts referenced by the new styles have loaded, or after attempts polls."""
+        def on_status(status):
+            if job is not self.job:
+                return
+            if status == 'loading' and attempts > 0:
+                QTimer.singleShot(FONT_POLL_MS, lambda: self._print_when_fonts_loaded(job, attempts - 1))
+            else:
+                self._print(job)
+        self.page.runJavaScript("document.fonts.status", on_status)
+    
+    def _on_load_finished(self, ok: bool):
+        job = self.job
+        if job is None:
+            return
+        if not ok:
+            self._finish_failed(job, "Failed to load HTML")
+            return
+        self.loaded_html = job.html_content
+        self._print(job)
+    
+    def _print(self, job: PDFRenderJob):
+        self.page.printToPdf(lambda data: self._on_pdf_ready(job, data), page_layout(job.margins))
+    
+    def _on_pdf_ready(self, job: PDFRenderJob, data):
+        if job is not self.job:
+            return
+        pdf_bytes = bytes(data)
+        if not pdf_bytes:
+            self._finish_failed(job, "PDF printing returned no data")
+            return
+        self.job = None
+        self._watchdog.stop()
+        self.finished.emit(job, pdf_bytes)
+    
+    def _on_timeout(self):
+        job = self.job
+        if job is None:
+            return
+        tracer.count("pdf_render.timed_out")
+        self._new_page()
+        self._finish_failed(job, f"Rendering did not finish within {JOB_TIMEOUT_MS / 1000:g} s")
+    
+    def _finish_failed(self, job: PDFRenderJob, message: str):
+        self.job = None
+        self.loaded_html = None
+        self._watchdog.stop()
+        self.failed.emit(job, message)
+
+
+class PDFRenderService(QObject):
+    """
+    Asynchronous HTML to PDF rendering with a pool of persistent workers.
+    
+    Jobs are queued and dispatched to idle workers; results are delivered through
+    signals. Coalescing jobs (e.g. live previews) replace any coalescing job that is
+    still waiting, so only the latest pending preview is rendered; jobDropped
+    reports the ids of the replaced jobs, which get no other signal.
+    
+    warm_up() prints a tiny document on every worker, so the Chromium process
+    start and profile initialisation are paid before the first real job.
+    """
+    
+    pdfReady = pyqtSignal(int, bytes)   # Emits (job_id, pdf_bytes)
+    renderFailed = pyqtSignal(int, str)  # Emits (job_id, error message)
+    jobDropped = pyqtSignal(int)         # Emits the id of a queued job replaced by a newer one
+    warmedUp = pyqtSignal(float)         # Emits the warm-up time in ms
+    
+    def __init__(self, worker_count: int = 1, cache: PDFCache = None, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self._worker_count = max(1, worker_count)
+        self._workers = []
+        self._queue = deque()
+        self._next_job_id = 1
+        self._latencies = deque(maxlen=50)
+        self.completed_count = 0
+        self.dropped_count = 0
+        self.failed_count = 0
+        self.patched_count = 0
+        self.warm_up_ms = None
+        self._warm_up_started = None
+        self._warm_up_pending = 0
+    
+    def _ensure_workers(self):
+        """Lazily create the worker pages on first use."""
+        while len(self._workers) < self._worker_count:
+            worker = PDFRenderWorker(self)
+            worker.finished.connect(self._on_worker_finished)
+            worker.failed.connect(self._on_worker_failed)
+            self._workers.append(worker)
+    
+    def warm_up(self):
+        """
+        Creates the worker pages and has each one load and print a tiny document.
+        
+        Jobs submitted meanwhile wait for a warmed-up worker. warmedUp is emitted
+        once every worker has finished, also if some warm-ups failed.
+        """
+        if self._warm_up_started is not None:
+            return
+        self._warm_up_started = time.perf_counter()
+        self._warm_up_pending = self._worker_count
+        for _ in range(self._worker_count):
+            job = PDFRenderJob(self._next_job_id, WARM_UP_HTML, DEFAULT_PAGE_MARGINS,
+                               coalesce=False, warm_up=True)
+            self._next_job_id += 1
+            # Ahead of anything already queued
+            self._queue.appendleft(job)
+        self._dispatch()
+    
+    def _on_warm_up_done(self, job: PDFRenderJob):
+        if tracer.enabled:
+            tracer.complete("PDFRenderService.warm_up", job.submitted_at,
+                            time.perf_counter() - job.submitted_at, job_id=job.job_id)
+        self._warm_up_pending -= 1
+        if self._warm_up_pending == 0:
+            self.warm_up_ms = round((time.perf_counter() - self._warm_up_started) * 1000, 1)
+            self.warmedUp.emit(self.warm_up_ms)
+        self._dispatch()
+    
+    def submit(self, html_content: str, margins: tuple = DEFAULT_PAGE_MARGINS, coalesce: bool = True) -> int:
+        """
+        Queues an HTML document for PDF conversion.
+        
+        Args:
+            html_content: The full HTML document
+            margins: Page margins in mm as (top, right, bottom, left)
+            coalesce: If True, drops any other pending coalescing job
+            
+        Returns:
+            The job id reported by pdfReady/renderFailed
+        """
+        job = PDFRenderJob(self._next_job_id, html_content, tuple(margins), coalesce)
+        self._next_job_id += 1
+        
+        if self.cache is not None:
+            job.cache_key = PDFCache.key(html_content, job.margins, config.config_dir)
+            cached = self.cache.get(job.cache_key)
+            if cached is not None:
+                # Delivered asynchronously like any other result
+                QTimer.singleShot(0, lambda: self._on_worker_finished(job, cached, dispatch=False))
+                return job.job_id
+        
+        if coalesce:
+            dropped = [pending for pending in self._queue if pending.coalesce]
+            if dropped:
+                self._queue = deque(pending for pending in self._queue if not pending.coalesce)
+                self.dropped_count += len(dropped)
+                tracer.count("pdf_render.dropped", len(dropped))
+                for pending in dropped:
+                    self.jobDropped.emit(pending.job_id)
+        
+        self._queue.append(job)
+        self._dispatch()
+        return job.job_id
+    
+    def _dispatch(self):
+        """Hands pending jobs to idle workers."""
+        self._ensure_workers()
+        for worker in self._workers:
+            if not self._queue:
+                break
+            if not worker.busy:
+                worker.start(self._queue.popleft())
+    
+    def _on_worker_finished(self, job: PDFRenderJob, pdf_bytes: bytes, dispatch: bool = True):
+        if job.warm_up:
+            self._on_warm_up_done(job)
+            return
+        latency = time.perf_counter() - job.submitted_at
+        self._latencies.append(latency)
+        if tracer.enabled:
+            queued = (job.started_at or job.submitted_at) - job.submitted_at
+            tracer.complete("PDFRenderService.job", job.submitted_at, latency,
+                            job_id=job.job_id, queued_ms=round(queued * 1000, 3),
+                            cached=job.started_at is None, patched=job.patched)
+        self.completed_count += 1
+        if job.patched:
+            self.patched_count += 1
+        if self.cache is not None and job.cache_key:
+            self.cache.put(job.cache_key, pdf_bytes)
+        self.pdfReady.emit(job.job_id, pdf_bytes)
+        if dispatch:
+            self._dispatch()
+    
+    def _on_worker_failed(self, job: PDFRenderJob, message: str):
+        if job.warm_up:
+            print(f"Warning: PDF renderer warm-up failed: {message}")
+            self._on_warm_up_done(job)
+            return
+        self.failed_count += 1
+        tracer.count("pdf_render.failed")
+        self.renderFailed.emit(job.job_id, message)
+        self._dispatch()
+    
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return len(self._queue)
+    
+    def in_flight(self) -> int:
+        """Number of jobs currently being rendered."""
+        return sum(1 for worker in self._workers if worker.busy)
+    
+    def last_latency(self) -> float:
+        """Seconds from submission to result for the most recent job, or 0.0."""
+        return self._latencies[-1] if self._latencies else 0.0
+    
+    def average_latency(self) -> float:
+        """Mean submission-to-result time in seconds over recent jobs, or 0.0."""
+        return sum(self._latencies) / len(self._latencies) if self._latencies else 0.0
+    
+    def stats(self) -> dict:
+        """Returns a snapshot of queue and latency figures."""
+        return {
+            'queue_depth': self.queue_depth(),
+            'in_flight': self.in_flight(),
+            'completed': self.completed_count,
+            'dropped': self.dropped_count,
+            'failed': self.failed_count,
+            'patched': self.patched_count,
+            'last_latency_ms': round(self.last_latency() * 1000, 1),
+            'average_latency_ms': round(self.average_latency() * 1000, 1),
+            'warm_up_ms': self.warm_up_ms,
+        }
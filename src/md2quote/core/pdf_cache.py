@@ -0,0 +1,164 @@
+"""
+Content-addressed cache of rendered PDFs.
+
+The key covers the HTML, the page size, the margins and the local files the
+document references (logos, font files, images), by modification time and size.
+Replacing a logo at the same path therefore changes the key, so neither the
+memory nor the disk tier can return a PDF rendered with the old file.
+"""
+
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+from urllib.request import url2pathname
+
+from .tracing import tracer
+
+# src="..."/href="..." attributes and CSS url(...) references
+_RESOURCE_RE = re.compile(r'''(?:\b(?:src|href)\s*=\s*["']|url\(\s*["']?)([^"')]+)''', re.IGNORECASE)
+_SCHEME_RE = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*:')
+
+
+def local_resources(html_content: str, base_dir: Path = None) -> list[Path]:
+    """
+    Returns the local files an HTML document references, in order of first use.
+
+    Args:
+        html_content: The document
+        base_dir: Directory relative references are resolved against, or None to ignore them
+    """
+    paths = {}
+    for ref in _RESOURCE_RE.findall(html_content):
+        ref = ref.strip()
+        if ref.lower().startswith('file:'):
+            path = Path(url2pathname(urlparse(ref).path))
+        elif _SCHEME_RE.match(ref) or ref.startswith(('#', '//')) or not ref or base_dir is None:
+            continue
+        else:
+            path = Path(base_dir) / unquote(ref.split('#')[0].split('?')[0])
+        paths.setdefault(path, None)
+    return list(paths)
+
+
+class PDFCache:
+    """
+    Content-addressed cache of rendered PDFs.
+
+    Entries are keyed by key(), kept in a bounded in-memory LRU and optionally
+    mirrored to a bounded directory on disk, so they survive restarts.
+
+    Args:
+        max_entries: PDFs kept in memory
+        disk_dir: Directory of the disk tier, or None to keep PDFs in memory only
+        max_disk_entries: PDFs kept on disk; the least recently used are removed
+    """
+
+    def __init__(self, max_entries: int = 16, disk_dir: Path = None, max_disk_entries: int = 64):
+        self._entries = OrderedDict()
+        self.max_entries = max_entries
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            try:
+                self.disk_dir.mkdir(parents=True, exist_ok=True)
+            except Exception as e:
+                print(f"Warning: PDF disk cache disabled: {e}")
+                self.disk_dir = None
+
+    @staticmethod
+    def key(html_content: str, margins: tuple, base_dir: Path = None) -> str:
+        """
+        Returns the cache key for an HTML document rendered with the given margins.
+
+        Args:
+            html_content: The document
+            margins: Page margins in mm
+            base_dir: Directory the document's relative references resolve against
+        """
+        digest = hashlib.sha256()
+        digest.update(f"A4-portrait-{tuple(float(m) for m in margins)}\n".encode('utf-8'))
+        digest.update(html_content.encode('utf-8'))
+        for path in local_resources(html_content, base_dir):
+            try:
+                stat = path.stat()
+                stamp = f"{stat.st_mtime_ns}:{stat.st_size}"
+            except OSError:
+                stamp = "missing"
+            digest.update(f"\n{path}\t{stamp}".encode('utf-8', errors='surrogateescape'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        """Returns the cached PDF for key, or None."""
+        pdf_bytes = self._entries.get(key)
+        if pdf_bytes is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            tracer.count("pdf_cache.hit")
+            return pdf_bytes
+
+        if self.disk_dir:
+            path = self.disk_dir / f"{key}.pdf"
+            try:
+                pdf_bytes = path.read_bytes()
+                os.utime(path)
+            except OSError:
+                pdf_bytes = None
+            if pdf_bytes:
+                self._remember(key, pdf_bytes)
+                self.hits += 1
+                tracer.count("pdf_cache.hit")
+                return pdf_bytes
+
+        self.misses += 1
+        tracer.count("pdf_cache.miss")
+        return None
+
+    def put(self, key: str, pdf_bytes: bytes):
+        """Stores a rendered PDF."""
+        if not pdf_bytes:
+            return
+        self._remember(key, pdf_bytes)
+
+        if self.disk_dir:
+            path = self.disk_dir / f"{key}.pdf"
+            tmp_path = path.with_suffix('.tmp')
+            try:
+                tmp_path.write_bytes(pdf_bytes)
+                os.replace(tmp_path, path)
+                self._prune_disk()
+            except OSError as e:
+                print(f"Warning: Could not write PDF cache entry: {e}")
+
+    def _remember(self, key: str, pdf_bytes: bytes):
+        self._entries[key] = pdf_bytes
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _prune_disk(self):
+        """Removes the least recently used files beyond max_disk_entries."""
+        files = list(self.disk_dir.glob('*.pdf'))
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=lambda f: f.stat().st_mtime_ns)
+        for f in files[:len(files) - self.max_disk_entries]:
+            try:
+                f.unlink()
+            except OSError:
+                pass
+
+    def clear(self):
+        """Removes all entries from memory and disk."""
+        self._entries.clear()
+        if self.disk_dir:
+            for f in self.disk_dir.glob('*.pdf'):
+                try:
+                    f.unlink()
+                except OSError:
+                    pass
@@ -0,0 +1,308 @@
+"""
+Per-page fingerprints of a PDF document.
+
+Used by the preview to find out which pages changed between two renders, so only
+those pages are rasterised again. A page's fingerprint is a hash over its page
+dictionary, content streams and everything they reference (images, graphics
+states, resources), with object numbers replaced by the hashes of the objects they
+point to, so renumbered but otherwise identical objects hash the same.
+
+Embedded font subsets are shared by all pages and change whenever any page uses a
+new glyph. Instead of the font program, a page therefore hashes the font's name
+and the Unicode mapping of the character codes the page actually shows.
+
+Only classic (uncompressed cross-reference) PDFs as written by Qt WebEngine and
+QPdfWriter are understood; for anything else page_fingerprints returns None and
+callers treat every page as changed.
+"""
+
+import hashlib
+import re
+import zlib
+
+_OBJ_RE = re.compile(rb'(\d+)\s+(\d+)\s+obj\b')
+_STREAM_RE = re.compile(rb'\bstream\r?\n')
+_ENDOBJ_RE = re.compile(rb'\bendobj\b')
+_REF_RE = re.compile(rb'(\d+)\s+(\d+)\s+R\b')
+_LENGTH_RE = re.compile(rb'/Length\s+(\d+)(?!\s+\d+\s+R)')
+_TYPE_RE = re.compile(rb'/Type\s*/(\w+)')
+_SUBTYPE_RE = re.compile(rb'/Subtype\s*/(\w+)')
+_PARENT_RE = re.compile(rb'/Parent\s+\d+\s+\d+\s+R')
+_KIDS_RE = re.compile(rb'/Kids\s*\[([^\]]*)\]')
+_ROOT_RE = re.compile(rb'/Root\s+(\d+)\s+(\d+)\s+R')
+_PAGES_RE = re.compile(rb'/Pages\s+(\d+)\s+(\d+)\s+R')
+_CONTENTS_RE = re.compile(rb'/Contents\s*(\[[^\]]*\]|\d+\s+\d+\s+R)')
+_BASEFONT_RE = re.compile(rb'/BaseFont\s*/([^\s/<>\[\]()]+)')
+_ENCODING_RE = re.compile(rb'/Encoding\s*/([^\s/<>\[\]()]+)')
+_TOUNICODE_RE = re.compile(rb'/ToUnicode\s+(\d+)\s+\d+\s+R')
+_SUBSET_TAG_RE = re.compile(rb'^[A-Z]{6}\+')
+
+# String operands in content streams: hex strings and literal strings
+_HEX_STRING_RE = re.compile(rb'<([0-9A-Fa-f\s]*)>')
+_LITERAL_STRING_RE = re.compile(rb'\(((?:\\.|[^\\()])*)\)', re.S)
+
+# ToUnicode CMap entries
+_BFCHAR_RE = re.compile(rb'beginbfchar(.*?)endbfchar', re.S)
+_BFRANGE_RE = re.compile(rb'beginbfrange(.*?)endbfrange', re.S)
+_HEX_RE = re.compile(rb'<([0-9A-Fa-f]*)>')
+_RANGE_RE = re.compile(rb'<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]+)>\s*(<[0-9A-Fa-f]*>|\[[^\]]*\])')
+
+# Font types whose glyphs come from an embedded font program
+_OUTLINE_FONT_TYPES = (b'Type0', b'TrueType', b'Type1', b'MMType1')
+
+# Page trees deeper than this are treated as malformed
+MAX_TREE_DEPTH = 32
+
+
+def _hex_bytes(hex_string: bytes) -> bytes:
+    """Decodes a PDF hex string body; an odd final digit is padded with 0."""
+    digits = re.sub(rb'\s', b'', hex_string).decode('ascii')
+    if len(digits) % 2:
+        digits += '0'
+    return bytes.fromhex(digits)
+
+
+class _PDFObjects:
+    """Index of the indirect objects of a PDF: number -> (dictionary/body, stream data)."""
+
+    def __init__(self, data: bytes):
+        self.objects = {}
+        pos = 0
+        while True:
+            match = _OBJ_RE.search(data, pos)
+            if not match:
+                break
+            number = int(match.group(1))
+            body_start = match.end()
+            end = _ENDOBJ_RE.search(data, body_start)
+            if not end:
+                break
+
+            stream = _STREAM_RE.search(data, body_start, end.start())
+            if stream:
+                body = data[body_start:stream.start()]
+                length = _LENGTH_RE.search(body)
+                data_end = None
+                if length:
+                    candidate = stream.end() + int(length.group(1))
+                    if data[candidate:candidate + 12].lstrip().startswith(b'endstream'):
+                        data_end = candidate
+                if data_end is None:
+                    data_end = data.find(b'endstream', stream.end())
+                    if data_end < 0:
+                        break
+                stream_data = data[stream.end():data_end]
+                end = _ENDOBJ_RE.search(data, data_end)
+                if not end:
+                    break
+            else:
+                body = data[body_start:end.start()]
+                stream_data = None
+
+            self.objects[number] = (body, stream_data)
+            pos = end.end()
+
+        self._trailer = data[data.rfind(b'trailer'):] if b'trailer' in data else b''
+        self._hashes = {}
+        self._cmaps = {}
+
+    def _type(self, number: int, pattern=_TYPE_RE) -> bytes | None:
+        if number not in self.objects:
+            return None
+        match = pattern.search(self.objects[number][0])
+        return match.group(1) if match else None
+
+    def uses_object_streams(self) -> bool:
+        return any(self._type(number) in (b'ObjStm', b'XRef') for number in self.objects)
+
+    def root(self) -> int | None:
+        match = _ROOT_RE.search(self._trailer)
+        if match:
+            return int(match.group(1))
+        for number in self.objects:
+            if self._type(number) == b'Catalog':
+                return number
+        return None
+
+    def pages(self) -> list[int] | None:
+        """Returns page object numbers in document order, or None if the tree is unreadable."""
+        root = self.root()
+        if root not in self.objects:
+            return None
+        match = _PAGES_RE.search(self.objects[root][0])
+        if not match:
+            return None
+
+        result = []
+
+        def walk(number: int, depth: int) -> bool:
+            if depth > MAX_TREE_DEPTH or number not in self.objects:
+                return False
+            kids = _KIDS_RE.search(self.objects[number][0])
+            if self._type(number) == b'Page' and not kids:
+                result.append(number)
+                return True
+            if not kids:
+                return False
+            return all(walk(int(ref.group(1)), depth + 1) for ref in _REF_RE.finditer(kids.group(1)))
+
+        if not walk(int(match.group(1)), 0):
+            return None
+        return result
+
+    def stream(self, number: int) -> bytes:
+        """Returns the decoded data of a stream object (raw data if it cannot be decoded)."""
+        body, data = self.objects.get(number, (b'', None))
+        if data is None:
+            return b''
+        if b'/FlateDecode' in body:
+            try:
+                return zlib.decompress(data)
+            except zlib.error:
+                return data
+        return data
+
+    def is_outline_font(self, number: int) -> bool:
+        return self._type(number) == b'Font' and self._type(number, _SUBTYPE_RE) in _OUTLINE_FONT_TYPES
+
+    def font_identity(self, number: int) -> bytes:
+        """Identifies a font by name and encoding, ignoring which glyphs its subset contains."""
+        body = self.objects[number][0]
+        base = _BASEFONT_RE.search(body)
+        encoding = _ENCODING_RE.search(body)
+        return b'font:' + b'/'.join([
+            self._type(number, _SUBTYPE_RE) or b'',
+            _SUBSET_TAG_RE.sub(b'', base.group(1)) if base else b'',
+            encoding.group(1) if encoding else b'',
+        ])
+
+    def to_unicode(self, number: int) -> tuple[dict, list]:
+        """Returns (code -> unicode hex, [(low, high, start or list)]) of a font's ToUnicode CMap."""
+        cached = self._cmaps.get(number)
+        if cached is not None:
+            return cached
+
+        chars, ranges = {}, []
+        match = _TOUNICODE_RE.search(self.objects[number][0])
+        if match:
+            cmap = self.stream(int(match.group(1)))
+            for section in _BFCHAR_RE.findall(cmap):
+                values = _HEX_RE.findall(section)
+                for src, dst in zip(values[0::2], values[1::2]):
+                    chars[int(src or b'0', 16)] = dst
+            for section in _BFRANGE_RE.findall(cmap):
+                for low, high, dst in _RANGE_RE.findall(section):
+                    if dst.startswith(b'['):
+                        ranges.append((int(low, 16), int(high, 16), _HEX_RE.findall(dst)))
+                    else:
+                        ranges.append((int(low, 16), int(high, 16), int(dst[1:-1] or b'0', 16)))
+
+        self._cmaps[number] = (chars, ranges)
+        return chars, ranges
+
+    def map_code(self, font: int, code: int) -> bytes:
+        chars, ranges = self.to_unicode(font)
+        if code in chars:
+            return chars[code]
+        for low, high, dst in ranges:
+            if low <= code <= high:
+                if isinstance(dst, list):
+                    return dst[code - low] if code - low < len(dst) else b'?'
+                return b'%x' % (dst + code - low)
+        return b'?'
+
+    def deep_hash(self, number: int, active: set = None) -> bytes:
+        """
+        Hashes an object and, recursively, every object it references. Outline
+        fonts contribute only their identity (see font_identity).
+        """
+        cached = self._hashes.get(number)
+        if cached is not None:
+            return cached
+        if number not in self.objects:
+            return b'missing'
+
+        active = active if active is not None else set()
+        if number in active:
+            return b'cycle'
+        active.add(number)
+
+        if self.is_outline_font(number):
+            result = hashlib.sha1(self.font_identity(number)).digest()
+        else:
+            body, stream_data = self.objects[number]
+            body = _PARENT_RE.sub(b'', body)
+
+            def resolve(ref):
+                return b'<' + self.deep_hash(int(ref.group(1)), active).hex().encode('ascii') + b'>'
+
+            digest = hashlib.sha1(_REF_RE.sub(resolve, body))
+            if stream_data is not None:
+                digest.update(b'stream')
+                digest.update(stream_data)
+            result = digest.digest()
+
+        active.discard(number)
+        self._hashes[number] = result
+        return result
+
+    def referenced_fonts(self, number: int, seen: set = None) -> set:
+        """Returns the outline fonts reachable from an object, not following /Parent."""
+        seen = seen if seen is not None else set()
+        fonts = set()
+        if number in seen or number not in self.objects:
+            return fonts
+        seen.add(number)
+        if self.is_outline_font(number):
+            fonts.add(number)
+            return fonts
+        body = _PARENT_RE.sub(b'', self.objects[number][0])
+        for ref in _REF_RE.finditer(body):
+            fonts |= self.referenced_fonts(int(ref.group(1)), seen)
+        return fonts
+
+    def page_fingerprint(self, number: int) -> str:
+        digest = hashlib.sha1(self.deep_hash(number))
+
+        fonts = self.referenced_fonts(number)
+        if fonts:
+            # The character codes shown on the page, with their meaning in each font
+            contents = _CONTENTS_RE.search(self.objects[number][0])
+            text = b''
+            if contents:
+                for ref in _REF_RE.finditer(contents.group(1)):
+                    text += self.stream(int(ref.group(1))) + b'\n'
+
+            strings = {_hex_bytes(h) for h in _HEX_STRING_RE.findall(text)}
+            strings.update(_LITERAL_STRING_RE.findall(text))
+
+            for font in sorted(fonts, key=self.font_identity):
+                width = 2 if self._type(font, _SUBTYPE_RE) == b'Type0' else 1
+                codes = set()
+                for s in strings:
+                    for i in range(0, len(s) - width + 1, width):
+                        codes.add(int.from_bytes(s[i:i + width], 'big'))
+                digest.update(self.font_identity(font))
+                for code in sorted(codes):
+                    digest.update(b'%x=%s;' % (code, self.map_code(font, code)))
+
+        return digest.hexdigest()
+
+
+def page_fingerprints(pdf_bytes: bytes) -> list[str] | None:
+    """
+    Returns one fingerprint per page, in page order.
+
+    Pages with equal fingerprints render identically. Returns None if the
+    document's structure is not supported.
+    """
+    try:
+        objects = _PDFObjects(pdf_bytes)
+        if not objects.objects or objects.uses_object_streams():
+            return None
+        pages = objects.pages()
+        if not pages:
+            return None
+        return [objects.page_fingerprint(number) for number in pages]
+    except (ValueError, RecursionError):
+        return None
@@ -1,14 +1,205 @@
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, select_autoescape
+from jinja2.loaders import split_template_path
+from markupsafe import Markup
 from pathlib import Path
+import copy
+import hashlib
+import os
+import posixpath
+import re
 import sys
+import time
 from .config import config
+from .fonts import FontCache, font_cache, google_fonts_families
+from .tracing import traced
 from ..utils import get_templates_path
 
-class TemplateRenderer:
+
+# Number of compiled templates (layouts and their included CSS) kept in memory
+TEMPLATE_CACHE_SIZE = 50
+
+# Files modified this recently when loaded are also compared by content, because
+# a second edit within the filesystem's timestamp resolution keeps mtime and size.
+RACY_MTIME_WINDOW = 2.0
+
+# Stylesheet links of layouts written before fonts were cached locally
+GOOGLE_FONTS_LINK_RE = re.compile(r'<link[^>]+fonts\.googleapis\.com[^>]*>\s*', re.IGNORECASE)
+GOOGLE_FONTS_URL_RE = re.compile(r'https?://fonts\.googleapis\.com/[^"\'\s>]+', re.IGNORECASE)
+
+
+class TemplateOverlays:
+    """
+    Unsaved template and CSS buffers, served instead of their files.
+    
+    The template and CSS editor dialogs put the text being edited here for the
+    live preview and only write the file on Save, so editing neither touches the
+    disk nor waits for the loader to notice a changed file. Use the module-level
+    `template_overlays` instance.
+    """
+    
     def __init__(self):
+        self._buffers = {}  # template name (e.g. "preset_1.css") -> source
+    
+    def get(self, name: str) -> str | None:
+        """Returns the unsaved source of a template, or None."""
+        return self._buffers.get(name)
+    
+    def set(self, name: str, source: str):
+        """Serves source for the template until it is discarded."""
+        self._buffers[name] = source
+    
+    def discard(self, name: str) -> bool:
+        """Serves the template from its file again; returns whether it had a buffer."""
+        return self._buffers.pop(name, None) is not None
+
+
+template_overlays = TemplateOverlays()
+
+
+class ChangeTrackingLoader(FileSystemLoader):
+    """
+    FileSystemLoader with a stricter up-to-date check for cached templates.
+    
+    A cached template is stale when its file's mtime or size changed, when its
+    content changed within the timestamp resolution, or when a file with the same
+    name appeared in a search path with higher priority.
+    
+    Templates with an unsaved buffer in `template_overlays` are served from
+    memory and are not written to the bytecode cache.
+    """
+    
+    def load(self, environment, name, globals=None):
+        if template_overlays.get(name) is None:
+            return super().load(environment, name, globals)
+        source, filename, uptodate = self.get_source(environment, name)
+        code = environment.compile(source, name, filename)
+        return environment.template_class.from_code(environment, code, globals or {}, uptodate)
+    
+    def get_source(self, environment, template):
+        overlay = template_overlays.get(template)
+        if overlay is not None:
+            return overlay, None, lambda: template_overlays.get(template) is overlay
+        
+        contents, filename, _ = super().get_source(environment, template)
+        
+        pieces = split_template_path(template)
+        shadowing = []
+        for searchpath in self.searchpath:
+            candidate = os.path.normpath(posixpath.join(searchpath, *pieces))
+            if candidate == filename:
+                break
+            shadowing.append(candidate)
+        
+        stat = os.stat(filename)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        digest = hashlib.sha1(contents.encode(self.encoding)).digest()
+        racy = [time.time() - stat.st_mtime < RACY_MTIME_WINDOW]
+        
+        def uptodate() -> bool:
+            try:
+                current = os.stat(filename)
+            except OSError:
+                return False
+            if (current.st_mtime_ns, current.st_size) != signature:
+                return False
+            if template_overlays.get(template) is not None:
+                return False
+            if any(os.path.isfile(path) for path in shadowing):
+                return False
+            if racy[0]:
+                with open(filename, 'rb') as f:
+                    if hashlib.sha1(f.read()).digest() != digest:
+                        return False
+                racy[0] = time.time() - current.st_mtime < RACY_MTIME_WINDOW
+            return True
+        
+        return contents, filename, uptodate
+
+
+def build_context(metadata: dict, html_body: str, preset_config: dict) -> dict:
+    """
+    Builds the full template context from parsed metadata and a preset.
+    Ensures context has all required fields with defaults to prevent template errors.
+    
+    Args:
+        metadata: Parsed metadata from the markdown
+        html_body: Rendered HTML content
+        preset_config: Preset values (copied, never modified)
+    """
+    preset_config = copy.deepcopy(preset_config)
+    
+    # Get valid_days from template defaults, fallback to 30
+    profile_valid_days = preset_config.get('defaults', {}).get('valid_days', 30)
+    
+    defaults = {
+        "quotation": {
+            "number": "DRAFT",
+            "date": "YYYY-MM-DD",
+            "valid_days": profile_valid_days
+        },
+        "client": {
+            "contact": "",
+            "institution": "",
+            "name": "",  # Backward compatibility alias
+            "address": "",
+            "email": ""
+        }
+    }
+
+    context = defaults.copy()
+    
+    for key in defaults:
+        if key in metadata and isinstance(metadata[key], dict):
+            context[key] = {**defaults[key], **metadata[key]}
+        elif key in metadata:
+            context[key] = metadata[key]
+    
+    for key, value in metadata.items():
+        if key not in defaults:
+            context[key] = value
+
+    context["content"] = html_body
+    
+    if 'company' in metadata and isinstance(metadata['company'], dict):
+        if 'company' not in preset_config:
+            preset_config['company'] = {}
+        preset_config['company'].update(metadata['company'])
+    
+    if 'company' in preset_config and preset_config['company'].get('logo'):
+        logo_str = preset_config['company']['logo']
+        if not logo_str.startswith('file://'):
+            logo_path = config.resolve_path(logo_str)
+            if logo_path and logo_path.exists():
+                preset_config['company']['logo'] = logo_path.as_uri()
+            else:
+                preset_config['company']['logo'] = ''
+        
+    context.update(preset_config)
+    
+    return context
+
+
+def page_margins(context: dict, default: tuple) -> tuple:
+    """Returns the page margins (top, right, bottom, left) configured in a context."""
+    margins = context.get('layout', {}).get('page_margins')
+    if margins and len(margins) == 4:
+        return tuple(margins)
+    return default
+
+class TemplateRenderer:
+    def __init__(self, use_bytecode_cache: bool = True, fonts: FontCache = None):
         """
         Initialize the template renderer with appropriate template directory priority.
+        
+        Compiled templates are kept in an LRU cache and reloaded when their files
+        change on disk.
+        
+        Args:
+            use_bytecode_cache: Also persist compiled bytecode under the config directory
+            fonts: Font cache providing the @font-face rules (defaults to the shared one)
         """
+        self.fonts = fonts if fonts is not None else font_cache
+
         is_bundled = getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS')
         
         if is_bundled:
@@ -23,16 +214,30 @@ class TemplateRenderer:
             ]
         
         self.env = Environment(
-            loader=FileSystemLoader(template_dirs),
+            loader=ChangeTrackingLoader(template_dirs),
             autoescape=select_autoescape(['html', 'xml']),
-            cache_size=0,
-            auto_reload=True
+            cache_size=TEMPLATE_CACHE_SIZE,
+            auto_reload=True,
+            bytecode_cache=self._create_bytecode_cache() if use_bytecode_cache else None
         )
         
-        self._clear_cache_on_render = True
-        
         self.env.filters['currency'] = self._format_currency
 
+    def _create_bytecode_cache(self):
+        """Returns an on-disk Jinja2 bytecode cache in the config directory, or None."""
+        cache_dir = config.config_dir / "cache" / "jinja"
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            return FileSystemBytecodeCache(str(cache_dir))
+        except Exception as e:
+            print(f"Warning: Jinja2 bytecode cache disabled: {e}")
+            return None
+
+    def clear_cache(self):
+        """Drops all compiled templates, forcing a reload on the next render."""
+        self.env.cache.clear()
+
+    @traced("TemplateRenderer.render")
     def render(self, template_name: str, context: dict, preset_config: dict = None) -> str:
         """
         Renders a template with the given context.
@@ -53,15 +258,6 @@ class TemplateRenderer:
         if template_name in legacy_map:
              template_name = legacy_map[template_name]
 
-        if self._clear_cache_on_render:
-            try:
-                if self.env.cache is not None:
-                    self.env.cache.clear()
-                if hasattr(self.env, 'bytecode_cache') and self.env.bytecode_cache:
-                    self.env.bytecode_cache.clear()
-            except Exception as e:
-                print(f"Warning: Failed to clear Jinja2 cache: {e}")
-        
         base_config = {}
         if preset_config:
              base_config = preset_config
@@ -101,8 +297,39 @@ class TemplateRenderer:
                 'signature_block': True,
                 'custom_footer': ''
             }
+        
+        full_context['font_faces'] = self._font_faces(full_context.get('typography', {}))
             
-        return template.render(**full_context)
+        html = template.render(**full_context)
+        
+        return self._strip_font_links(html)
+
+    def _strip_font_links(self, html: str) -> str:
+        """
+        Removes the Google Fonts links of older layouts once they are not needed.
+
+        The links are always removed offline, and online as soon as every family
+        they request is cached, since @font-face then serves the same fonts
+        without waiting on the network. Missing families are downloaded.
+        """
+        links = GOOGLE_FONTS_LINK_RE.findall(html)
+        if not links:
+            return html
+        if not self.fonts.offline:
+            families = [family for link in links for url in GOOGLE_FONTS_URL_RE.findall(link)
+                        for family in google_fonts_families(url)]
+            missing = [family for family in families if not self.fonts.has_family(family)]
+            if missing:
+                self.fonts.ensure_families(missing)
+                return html
+        return GOOGLE_FONTS_LINK_RE.sub('', html)
+
+    def _font_faces(self, typography: dict) -> Markup:
+        """Returns @font-face rules for the typography families, pointing at local files."""
+        families = [typography.get(role) for role in ('heading', 'body', 'mono')]
+        families = [f for f in families if isinstance(f, str)]
+        self.fonts.ensure_families(families)
+        return Markup(self.fonts.font_face_css(families))
 
     def _format_currency(self, value, currency="EUR"):
         """Format number as currency string."""
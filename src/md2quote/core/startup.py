@@ -0,0 +1,45 @@
+"""
+Startup timing.
+
+Records when the stages of application startup complete, in milliseconds since
+md2quote.main started importing: 'imports' (Qt and the window modules loaded),
+'window' (main window constructed), 'first_paint' (window painted for the first
+time), 'ready' (preview pipeline loaded after the first paint) and 'warm_up'
+(PDF renderer started and warmed up).
+
+The marks are recorded as tracer spans and printed by
+
+    python3 main.py --measure-startup
+
+which exits once startup is complete; benchmark.py --startup tracks them over time.
+"""
+
+import json
+import time
+
+from .tracing import tracer
+
+
+class StartupTimer:
+    """Collects startup marks. Use the module-level `startup` instance."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.marks = {}  # name -> ms since started_at
+        self._last = self.started_at
+
+    def mark(self, name: str):
+        """Records the completion of a startup stage; later marks of the same stage are ignored."""
+        if name in self.marks:
+            return
+        now = time.perf_counter()
+        self.marks[name] = round((now - self.started_at) * 1000, 1)
+        tracer.complete(f"startup.{name}", self._last, now - self._last)
+        self._last = now
+
+    def report(self) -> str:
+        """Returns the marks as a single JSON line."""
+        return json.dumps(self.marks)
+
+
+startup = StartupTimer()
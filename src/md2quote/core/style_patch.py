@@ -0,0 +1,83 @@
+"""
+Style-only updates of a loaded HTML document.
+
+Most changes made in the Templates dialog (colors, fonts, sizes, the logo width)
+only change the contents of <style> elements or style="" attributes, not the
+document structure. For those, style_patch_script returns JavaScript that updates
+the page that already shows the old document, which is much faster than loading
+the new document with setHtml. Any other difference returns None and the page is
+reloaded.
+
+The script checks that the page has as many <style> elements and styled elements
+as the HTML source, since elements are addressed by their position; it evaluates
+to false if they differ, and the caller falls back to a reload.
+"""
+
+import html
+import json
+import re
+
+_STYLE_ELEMENT_RE = re.compile(r'(<style\b[^>]*>)(.*?)(</style\s*>)', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<[a-zA-Z][^<>]*>')
+_STYLE_ATTR_RE = re.compile(r'(\sstyle\s*=\s*)("[^"]*"|\'[^\']*\')', re.IGNORECASE)
+
+
+def split_styles(html_content: str) -> tuple[str, list[str], list[str]]:
+    """
+    Separates a document's styles from its structure.
+
+    Returns:
+        The document with style contents removed, the contents of its <style>
+        elements and the (unescaped) values of its style attributes, in document order
+    """
+    sheets = []
+    attributes = []
+
+    def mask_sheet(match):
+        sheets.append(match.group(2))
+        return match.group(1) + match.group(3)
+
+    def mask_attribute(match):
+        attributes.append(html.unescape(match.group(2)[1:-1]))
+        return match.group(1) + '""'
+
+    def mask_tag(match):
+        return _STYLE_ATTR_RE.sub(mask_attribute, match.group(0))
+
+    skeleton = _STYLE_ELEMENT_RE.sub(mask_sheet, html_content)
+    skeleton = _TAG_RE.sub(mask_tag, skeleton)
+    return skeleton, sheets, attributes
+
+
+def style_patch_script(old_html: str, new_html: str) -> str | None:
+    """
+    Returns JavaScript that turns a page showing old_html into new_html.
+
+    Args:
+        old_html: The document the page has loaded
+        new_html: The document to show
+
+    Returns:
+        A script evaluating to true once applied (false if the page does not
+        match old_html), or None if more than styles differ
+    """
+    old_skeleton, old_sheets, old_attributes = split_styles(old_html)
+    new_skeleton, new_sheets, new_attributes = split_styles(new_html)
+    if new_skeleton != old_skeleton:
+        return None
+
+    sheets = {i: text for i, (old, text) in enumerate(zip(old_sheets, new_sheets)) if old != text}
+    attributes = {i: value for i, (old, value) in enumerate(zip(old_attributes, new_attributes)) if old != value}
+
+    return (
+        "(function() {"
+        "var sheets = document.querySelectorAll('style');"
+        "var styled = document.querySelectorAll('[style]');"
+        f"if (sheets.length !== {len(new_sheets)} || styled.length !== {len(new_attributes)}) return false;"
+        f"var sheetText = {json.dumps(sheets)};"
+        "for (var i in sheetText) sheets[i].textContent = sheetText[i];"
+        f"var styleValues = {json.dumps(attributes)};"
+        "for (var j in styleValues) styled[j].setAttribute('style', styleValues[j]);"
+        "return true;"
+        "})()"
+    )
@@ -0,0 +1,265 @@
+"""
+Opt-in tracing for the preview and export pipeline.
+
+Records spans (stage timings), counters and duration histograms, and exports them
+as a Chrome trace (open in chrome://tracing or https://ui.perfetto.dev) or as
+JSON Lines. Tracing is off unless enabled:
+
+    MD2QUOTE_TRACE=trace.json python3 main.py
+    python3 main.py --trace trace.jsonl
+    python3 main.py batch quotes/ --trace trace.json
+
+When disabled, an instrumented call costs one attribute check.
+"""
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+TRACE_ENV_VAR = "MD2QUOTE_TRACE"
+
+# Upper bounds (ms) of the histogram buckets; larger values go to the last bucket
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Oldest events are dropped beyond this many to bound memory
+MAX_EVENTS = 200_000
+
+
+class Histogram:
+    """Bucketed distribution of durations in milliseconds."""
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value_ms: float):
+        for i, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if value_ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total += value_ms
+        self.min = value_ms if self.min is None else min(self.min, value_ms)
+        self.max = value_ms if self.max is None else max(self.max, value_ms)
+
+    def percentile(self, fraction: float) -> float | None:
+        """Returns the upper bound of the bucket containing the given percentile."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return HISTOGRAM_BUCKETS_MS[i] if i < len(HISTOGRAM_BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count, 3) if self.count else None,
+            'min_ms': round(self.min, 3) if self.min is not None else None,
+            'max_ms': round(self.max, 3) if self.max is not None else None,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'buckets_ms': dict(zip([str(b) for b in HISTOGRAM_BUCKETS_MS] + ['inf'], self.counts)),
+        }
+
+
+class _NullSpan:
+    """Span returned while tracing is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer, name: str, args: dict):
+        self._tracer = tracer
+        self._name = name
+        self._args = args
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._tracer.complete(self._name, self._start, time.perf_counter() - self._start, **self._args)
+        return False
+
+
+class Tracer:
+    """Collects trace events. Use the module-level `tracer` instance."""
+
+    def __init__(self):
+        self.enabled = False
+        self.output_path = None
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=MAX_EVENTS)
+        self._counters = {}
+        self._histograms = {}
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._exit_hook = False
+
+    def start(self, output_path: str = None):
+        """Enables tracing; the trace is written to output_path at exit, if given."""
+        self.enabled = True
+        if output_path:
+            self.output_path = Path(os.path.expanduser(output_path))
+            if not self._exit_hook:
+                atexit.register(self._export_at_exit)
+                self._exit_hook = True
+
+    def stop(self):
+        """Disables tracing. Recorded data is kept until reset()."""
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._events.clear()
+            self._counters.clear()
+            self._histograms.clear()
+            self._origin = time.perf_counter()
+
+    def span(self, name: str, **args):
+        """Returns a context manager recording the duration of its block."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def complete(self, name: str, start: float, duration: float, **args):
+        """
+        Records a finished span.
+
+        Args:
+            name: Stage name
+            start: Start time from time.perf_counter()
+            duration: Duration in seconds
+            args: Extra values shown with the event
+        """
+        if not self.enabled:
+            return
+        event = {
+            'name': name,
+            'ph': 'X',
+            'ts': round((start - self._origin) * 1e6, 1),
+            'dur': round(duration * 1e6, 1),
+            'pid': self._pid,
+            'tid': threading.get_ident(),
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            self._events.append(event)
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(duration * 1000)
+
+    def count(self, name: str, value: int = 1):
+        """Increments a counter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            total = self._counters.get(name, 0) + value
+            self._counters[name] = total
+            self._events.append({
+                'name': name,
+                'ph': 'C',
+                'ts': round((time.perf_counter() - self._origin) * 1e6, 1),
+                'pid': self._pid,
+                'tid': threading.get_ident(),
+                'args': {name: total},
+            })
+
+    def observe(self, name: str, value_ms: float):
+        """Adds a value (in milliseconds) to a histogram without recording a span."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(value_ms)
+
+    def summary(self) -> dict:
+        """Returns counters and histogram statistics."""
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'histograms': {name: h.to_dict() for name, h in self._histograms.items()},
+            }
+
+    def export(self, path) -> Path:
+        """
+        Writes the trace to path. A '.jsonl' suffix writes one event per line
+        followed by a summary line; anything else writes Chrome trace JSON.
+        """
+        path = Path(path)
+        summary = self.summary()
+        with self._lock:
+            events = list(self._events)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            if path.suffix == '.jsonl':
+                for event in events:
+                    f.write(json.dumps(event) + "\n")
+                f.write(json.dumps({'name': 'summary', 'ph': 'summary', 'args': summary}) + "\n")
+            else:
+                json.dump({
+                    'traceEvents': events,
+                    'displayTimeUnit': 'ms',
+                    'otherData': summary,
+                }, f)
+        return path
+
+    def _export_at_exit(self):
+        if self.output_path is None:
+            return
+        try:
+            path = self.export(self.output_path)
+            print(f"Trace written to {path}")
+        except Exception as e:
+            print(f"Error writing trace: {e}")
+
+
+tracer = Tracer()
+
+if os.environ.get(TRACE_ENV_VAR):
+    tracer.start(os.environ[TRACE_ENV_VAR])
+
+
+def traced(name: str = None):
+    """Decorator recording a span for each call of the function while tracing is enabled."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                tracer.complete(span_name, start, time.perf_counter() - start)
+        return wrapper
+    return decorator
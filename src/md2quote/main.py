@@ -1,21 +1,52 @@
 import sys
 import os
+from .core.startup import startup
 from PyQt6.QtWidgets import QApplication
-from .ui.main_window import MainWindow
+from PyQt6.QtCore import Qt, QCoreApplication
+from .core.tracing import tracer
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from .batch import main as batch_main
+        sys.exit(batch_main(sys.argv[2:]))
+
+    # --trace PATH records stage timings and writes them to PATH on exit
+    if "--trace" in sys.argv:
+        index = sys.argv.index("--trace")
+        if index + 1 < len(sys.argv):
+            tracer.start(sys.argv[index + 1])
+            del sys.argv[index:index + 2]
+
+    # --measure-startup prints the startup marks and exits once startup is complete
+    measure_startup = "--measure-startup" in sys.argv
+    if measure_startup:
+        sys.argv.remove("--measure-startup")
+
     if sys.platform == "darwin":
         arg = "--disable-features=UseSkiaGraphite"
         if arg not in sys.argv:
             sys.argv.append(arg)
 
+    # QtWebEngine is imported after the window is shown, which requires shared
+    # OpenGL contexts to be enabled before the QApplication exists
+    QCoreApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
+
     app = QApplication(sys.argv)
     app.setApplicationName("MD2Quote")
-            
+
+    from .ui.main_window import MainWindow
+    startup.mark("imports")
+
     window = MainWindow()
+    startup.mark("window")
+    if measure_startup:
+        def report():
+            print(startup.report(), flush=True)
+            app.quit()
+        window.startupFinished.connect(report)
     window.show()
-    
+
     sys.exit(app.exec())
 
 if __name__ == "__main__":
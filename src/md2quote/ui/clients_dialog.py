@@ -4,30 +4,104 @@ Clients Manager Dialog for MD2Quote.
 A dialog for managing saved client information (CRUD operations).
 """
 
+import os
+
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QWidget,
-    QLabel, QLineEdit, QPushButton, QListWidget,
-    QListWidgetItem, QMessageBox, QSplitter, QFrame,
-    QGridLayout, QTextEdit, QSizePolicy
+    QLabel, QLineEdit, QPushButton, QListView,
+    QMessageBox, QSplitter, QFrame,
+    QGridLayout, QTextEdit, QSizePolicy, QFileDialog, QProgressDialog
 )
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, QTimer, QThread, QObject, QModelIndex, QItemSelectionModel, pyqtSignal
 from PyQt6.QtGui import QFont
 
 from .styles import COLORS, SPACING
 from .icons import icon
+from .clients_model import ClientListModel, SEARCH_DELAY_MS
+
+CLIENT_FILE_FILTER = "Client files (*.csv *.vcf *.vcard);;CSV (*.csv);;vCard (*.vcf *.vcard)"
+
+
+class ClientTransferWorker(QObject):
+    """Imports clients from or exports them to a CSV/vCard file in a background thread."""
+    
+    progress = pyqtSignal(int)                 # Emits progress in per mille
+    finished = pyqtSignal(int, int, int)       # Emits (added, updated, skipped); for exports (written, 0, 0)
+    cancelled = pyqtSignal()
+    error = pyqtSignal(str)                    # Emits error message
+    
+    def __init__(self, config_loader, path: str, export: bool = False):
+        super().__init__()
+        self.config = config_loader
+        self.path = path
+        self.export = export
+        self._cancelled = False
+    
+    def cancel(self):
+        """Stops the transfer at the next batch; an import then leaves the clients unchanged."""
+        self._cancelled = True
+    
+    def run(self):
+        from ..core.clients_io import ClientFileReader, write_clients
+        from ..core.clients_store import IMPORT_BATCH_SIZE
+        try:
+            if self.export:
+                total = max(self.config.count_clients(), 1)
+                
+                def clients():
+                    for count, client in enumerate(self.config.iter_clients(), 1):
+                        if count % IMPORT_BATCH_SIZE == 0:
+                            self._check_cancelled()
+                            self.progress.emit(count * 1000 // total)
+                        yield client
+                
+                try:
+                    written = write_clients(self.path, clients())
+                except InterruptedError:
+                    os.remove(self.path)
+                    raise
+                self.finished.emit(written, 0, 0)
+            else:
+                reader = ClientFileReader(self.path)
+                
+                def on_progress(count: int):
+                    self._check_cancelled()
+                    self.progress.emit(reader.bytes_read * 1000 // max(reader.size, 1))
+                
+                self.finished.emit(*self.config.import_clients(reader, on_progress))
+        except InterruptedError:
+            self.cancelled.emit()
+        except (OSError, ValueError, UnicodeError) as e:
+            self.error.emit(str(e))
+        except Exception as e:
+            self.error.emit(f"Unexpected error: {e}")
+    
+    def _check_cancelled(self):
+        if self._cancelled:
+            raise InterruptedError()
 
 
 class ClientsManagerDialog(QDialog):
     """Dialog for managing saved clients."""
     
     clientSelected = pyqtSignal(dict)  # Emits selected client data
-    clientsChanged = pyqtSignal()  # Emits when clients list is modified
+    clientChanged = pyqtSignal(str)  # Emits the key of a client that was added, updated or deleted
+    clientsChanged = pyqtSignal()  # Emits when many clients changed at once (import)
     
     def __init__(self, config_loader, parent=None):
         super().__init__(parent)
         self.config = config_loader
         self._current_client_key = None
         self._is_modified = False
+        self.clients_model = ClientListModel(config_loader, self)
+        self._transfer_thread = None
+        self._transfer_worker = None
+        self._transfer_progress = None
+        
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DELAY_MS)
+        self._search_timer.timeout.connect(self._load_clients)
         
         self.setWindowTitle("Manage Clients")
         self.resize(900, 500)
@@ -67,30 +141,46 @@ class ClientsManagerDialog(QDialog):
         """)
         left_layout.addWidget(list_label)
         
-        self.clients_list = QListWidget()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search clients...")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(lambda: self._search_timer.start())
+        self._style_line_edit(self.search_edit)
+        left_layout.addWidget(self.search_edit)
+        
+        self.clients_list = QListView()
+        self.clients_list.setModel(self.clients_model)
+        self.clients_list.setUniformItemSizes(True)  # Row heights are not measured one by one
         self.clients_list.setStyleSheet(f"""
-            QListWidget {{
+            QListView {{
                 background-color: {COLORS['bg_dark']};
                 border: 1px solid {COLORS['border']};
                 color: {COLORS['text_primary']};
                 font-size: 13px;
             }}
-            QListWidget::item {{
+            QListView::item {{
                 padding: 8px;
                 border-bottom: 1px solid {COLORS['border']};
             }}
-            QListWidget::item:selected {{
+            QListView::item:selected {{
                 background-color: {COLORS['accent']};
                 color: {COLORS['bg_dark']};
             }}
-            QListWidget::item:hover:!selected {{
+            QListView::item:hover:!selected {{
                 background-color: {COLORS['bg_hover']};
             }}
         """)
-        self.clients_list.currentItemChanged.connect(self._on_client_selected)
-        self.clients_list.itemDoubleClicked.connect(self._on_client_double_clicked)
+        self.clients_list.selectionModel().currentChanged.connect(self._on_client_selected)
+        self.clients_list.doubleClicked.connect(self._on_client_double_clicked)
+        self.clients_model.rowsInserted.connect(self._update_count_label)
+        self.clients_model.rowsRemoved.connect(self._update_count_label)
+        self.clients_model.modelReset.connect(self._update_count_label)
         left_layout.addWidget(self.clients_list)
         
+        self.count_label = QLabel()
+        self.count_label.setStyleSheet(f"color: {COLORS['text_muted']}; font-size: 11px; border: none;")
+        left_layout.addWidget(self.count_label)
+        
         # List action buttons
         list_buttons = QHBoxLayout()
         list_buttons.setSpacing(SPACING['xs'])
@@ -108,6 +198,19 @@ class ClientsManagerDialog(QDialog):
         list_buttons.addWidget(self.delete_btn)
         
         list_buttons.addStretch()
+        
+        self.import_btn = QPushButton("Import")
+        self.import_btn.setToolTip("Import clients from a CSV or vCard file")
+        self.import_btn.clicked.connect(self._on_import_clients)
+        self._style_button(self.import_btn)
+        list_buttons.addWidget(self.import_btn)
+        
+        self.export_btn = QPushButton("Export")
+        self.export_btn.setToolTip("Export all clients to a CSV or vCard file")
+        self.export_btn.clicked.connect(self._on_export_clients)
+        self._style_button(self.export_btn)
+        list_buttons.addWidget(self.export_btn)
+        
         left_layout.addLayout(list_buttons)
         
         splitter.addWidget(left_panel)
@@ -307,13 +410,37 @@ class ClientsManagerDialog(QDialog):
         """)
     
     def _load_clients(self):
-        """Load clients from config into the list."""
-        self.clients_list.clear()
-        clients = self.config.get_clients_list()
-        for client_key, institution in clients:
-            item = QListWidgetItem(institution or "(No institution)")
-            item.setData(Qt.ItemDataRole.UserRole, client_key)
-            self.clients_list.addItem(item)
+        """Show the clients matching the search, starting with the first page."""
+        self._search_timer.stop()
+        self.clients_model.set_query(self.search_edit.text())
+        self._select_current_client()
+    
+    def _update_count_label(self):
+        total = self.clients_model.total
+        if self.clients_model.query:
+            self.count_label.setText(f"{total} matching clients")
+        else:
+            self.count_label.setText(f"{total} clients")
+    
+    def _set_current_row(self, row: int):
+        """Make a row current (-1 for none) without counting as the user leaving the current client."""
+        selection = self.clients_list.selectionModel()
+        selection.blockSignals(True)
+        if row >= 0:
+            selection.setCurrentIndex(self.clients_model.index(row),
+                                      QItemSelectionModel.SelectionFlag.ClearAndSelect)
+        else:
+            selection.clear()
+        selection.blockSignals(False)
+        self.clients_list.viewport().update()
+    
+    def _select_current_client(self):
+        """Select the current client in the list if it is among the loaded rows."""
+        if not self._current_client_key:
+            return
+        row = self.clients_model.row_of(self._current_client_key)
+        if row >= 0:
+            self._set_current_row(row)
     
     def _clear_form(self):
         """Clear all form fields."""
@@ -377,7 +504,7 @@ class ClientsManagerDialog(QDialog):
         self.save_btn.setEnabled(has_institution and self._is_modified)
         self.use_btn.setEnabled(has_selection or has_institution)
     
-    def _on_client_selected(self, current: QListWidgetItem, previous: QListWidgetItem):
+    def _on_client_selected(self, current: QModelIndex, previous: QModelIndex):
         """Handle client selection in list."""
         if self._is_modified:
             reply = QMessageBox.question(
@@ -387,20 +514,18 @@ class ClientsManagerDialog(QDialog):
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
             )
             if reply == QMessageBox.StandardButton.No:
-                self.clients_list.blockSignals(True)
-                self.clients_list.setCurrentItem(previous)
-                self.clients_list.blockSignals(False)
+                self._set_current_row(previous.row() if previous.isValid() else -1)
                 return
         
-        if current:
-            client_key = current.data(Qt.ItemDataRole.UserRole)
+        if current.isValid():
+            client_key = current.data(ClientListModel.KeyRole)
             self._load_client_to_form(client_key)
         else:
             self._clear_form()
         
         self._update_button_states()
     
-    def _on_client_double_clicked(self, item: QListWidgetItem):
+    def _on_client_double_clicked(self, index: QModelIndex):
         """Handle double-click on client (use client)."""
         self._on_use_client()
     
@@ -421,7 +546,7 @@ class ClientsManagerDialog(QDialog):
             if reply == QMessageBox.StandardButton.No:
                 return
         
-        self.clients_list.clearSelection()
+        self._set_current_row(-1)
         self._clear_form()
         self.institution_edit.setFocus()
         self._update_button_states()
@@ -454,17 +579,19 @@ class ClientsManagerDialog(QDialog):
             self._current_client_key = new_key
         
         self._is_modified = False
-        self._load_clients()
-        
-        # Re-select the current client
-        for i in range(self.clients_list.count()):
-            item = self.clients_list.item(i)
-            if item.data(Qt.ItemDataRole.UserRole) == self._current_client_key:
-                self.clients_list.setCurrentItem(item)
-                break
-        
+        self._apply_client_change(self._current_client_key)
         self._update_button_states()
-        self.clientsChanged.emit()
+    
+    def _apply_client_change(self, client_key: str):
+        """Update the client's row in the list in place and notify listeners."""
+        selection = self.clients_list.selectionModel()
+        selection.blockSignals(True)
+        self.clients_model.client_changed(client_key)
+        selection.blockSignals(False)
+        current_row = self.clients_model.row_of(self._current_client_key) if self._current_client_key else -1
+        self._set_current_row(current_row)
+        self._update_count_label()  # The total changes even if the row is not fetched yet
+        self.clientChanged.emit(client_key)
     
     def _on_delete_client(self):
         """Delete the selected client."""
@@ -485,10 +612,10 @@ class ClientsManagerDialog(QDialog):
             QMessageBox.critical(self, "Error", f"Failed to delete client: {error}")
             return
         
+        client_key = self._current_client_key
         self._clear_form()
-        self._load_clients()
+        self._apply_client_change(client_key)
         self._update_button_states()
-        self.clientsChanged.emit()
     
     def _on_use_client(self):
         """Use the current client data (emit and close)."""
@@ -517,4 +644,91 @@ class ClientsManagerDialog(QDialog):
         
         self.clientSelected.emit(data)
         self.accept()
-
+    
+    def _on_import_clients(self):
+        """Import clients from a CSV or vCard file chosen by the user."""
+        path, _ = QFileDialog.getOpenFileName(self, "Import Clients", "", CLIENT_FILE_FILTER)
+        if path:
+            self._start_transfer(path, export=False)
+    
+    def _on_export_clients(self):
+        """Export all clients to a CSV or vCard file chosen by the user."""
+        path, selected_filter = QFileDialog.getSaveFileName(self, "Export Clients", "clients.csv", CLIENT_FILE_FILTER)
+        if not path:
+            return
+        if not os.path.splitext(path)[1]:
+            path += ".vcf" if selected_filter.startswith("vCard") else ".csv"
+        self._start_transfer(path, export=True)
+    
+    def _start_transfer(self, path: str, export: bool):
+        """Runs an import or export in a background thread behind a progress dialog."""
+        if self._transfer_thread is not None:
+            return
+        
+        title = "Exporting clients..." if export else "Importing clients..."
+        self._transfer_progress = QProgressDialog(title, "Cancel", 0, 1000, self)
+        self._transfer_progress.setWindowTitle("Export Clients" if export else "Import Clients")
+        self._transfer_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self._transfer_progress.setMinimumDuration(0)
+        self._transfer_progress.setAutoClose(False)
+        self._transfer_progress.setAutoReset(False)
+        self._transfer_progress.setValue(0)
+        self._transfer_progress.show()  # Blocks the dialog from the start
+        
+        self._transfer_thread = QThread(self)
+        self._transfer_worker = ClientTransferWorker(self.config, path, export=export)
+        self._transfer_worker.moveToThread(self._transfer_thread)
+        
+        self._transfer_thread.started.connect(self._transfer_worker.run)
+        self._transfer_worker.progress.connect(self._transfer_progress.setValue)
+        self._transfer_worker.finished.connect(self._on_transfer_finished)
+        self._transfer_worker.cancelled.connect(self._on_transfer_cancelled)
+        self._transfer_worker.error.connect(self._on_transfer_error)
+        self._transfer_progress.canceled.connect(self._transfer_worker.cancel, Qt.ConnectionType.DirectConnection)
+        for signal in (self._transfer_worker.finished, self._transfer_worker.cancelled, self._transfer_worker.error):
+            signal.connect(self._transfer_thread.quit)
+        self._transfer_thread.finished.connect(self._cleanup_transfer_thread)
+        
+        self.import_btn.setEnabled(False)
+        self.export_btn.setEnabled(False)
+        self._transfer_thread.start()
+    
+    def _on_transfer_finished(self, first: int, updated: int, skipped: int):
+        """Reports a completed import or export."""
+        export = self._transfer_worker.export
+        self._transfer_progress.close()
+        if export:
+            QMessageBox.information(self, "Export Clients", f"Exported {first} clients.")
+            return
+        
+        message = f"Added {first} clients, updated {updated}."
+        if skipped:
+            message += f"\n{skipped} rows without institution or contact were skipped."
+        self._load_clients()
+        self.clientsChanged.emit()
+        QMessageBox.information(self, "Import Clients", message)
+    
+    def _on_transfer_cancelled(self):
+        self._transfer_progress.close()
+    
+    def _on_transfer_error(self, error_message: str):
+        export = self._transfer_worker.export
+        self._transfer_progress.close()
+        action = "export" if export else "import"
+        QMessageBox.critical(self, "Error", f"Failed to {action} clients: {error_message}")
+    
+    def done(self, result: int):
+        """Closes the dialog, unless an import or export is still running."""
+        if self._transfer_thread is not None:
+            return  # The worker must finish (or be cancelled) before the dialog goes away
+        super().done(result)
+    
+    def _cleanup_transfer_thread(self):
+        """Releases the finished transfer thread."""
+        self._transfer_thread.deleteLater()
+        self._transfer_worker.deleteLater()
+        self._transfer_thread = None
+        self._transfer_worker = None
+        self._transfer_progress = None
+        self.import_btn.setEnabled(True)
+        self.export_btn.setEnabled(True)
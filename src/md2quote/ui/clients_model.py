@@ -0,0 +1,150 @@
+"""
+List model of saved clients, shared by the clients dialog and the header combo box.
+"""
+
+from bisect import bisect_left
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, Qt
+
+from ..core.clients_store import client_matches, client_sort_key, search_words
+
+# Clients fetched per page; views fetch more as they are scrolled to the end
+CLIENT_PAGE_SIZE = 200
+
+# Delay between the last keystroke in a client search field and the search
+SEARCH_DELAY_MS = 150
+
+
+class ClientListModel(QAbstractListModel):
+    """
+    Saved clients matching a search, sorted by institution.
+
+    Rows are fetched a page at a time through canFetchMore/fetchMore as views
+    scroll, so only the clients that were looked at are held. set_query() starts
+    a new search; client_changed() inserts, moves, updates or removes the row of
+    a single client, so views keep their selection and scroll position.
+
+    Args:
+        config_loader: Provides search_clients, count_clients and get_client
+        named_only: If True, leave out clients without an institution
+    """
+
+    KeyRole = Qt.ItemDataRole.UserRole
+
+    def __init__(self, config_loader, parent=None, named_only: bool = False):
+        super().__init__(parent)
+        self.config = config_loader
+        self.named_only = named_only
+        self._query = ''
+        self._words = []
+        self._rows = []  # [(client_key, institution)], in client_sort_key order
+        self._total = 0  # Number of matching clients, fetched or not
+
+    @property
+    def query(self) -> str:
+        return self._query
+
+    @property
+    def total(self) -> int:
+        """Number of clients matching the query, including those not fetched yet."""
+        return self._total
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        client_key, institution = self._rows[index.row()]
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            # Editable combo boxes and completers read the EditRole
+            return institution or "(No institution)"
+        if role == self.KeyRole:
+            return client_key
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and len(self._rows) < self._total
+
+    def fetchMore(self, parent=QModelIndex()):
+        """Appends the next page of matching clients."""
+        if parent.isValid():
+            return
+        page = self.config.search_clients(self._query, len(self._rows), CLIENT_PAGE_SIZE, self.named_only)
+        if not page:
+            self._total = len(self._rows)
+            return
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(page) - 1)
+        self._rows.extend(page)
+        self.endInsertRows()
+
+    def set_query(self, query: str = ''):
+        """Shows the clients matching query (all clients if empty), starting with the first page."""
+        self.beginResetModel()
+        self._query = query.strip()
+        self._words = search_words(self._query)
+        self._rows = []
+        self._total = self.config.count_clients(self._query, self.named_only)
+        self.endResetModel()
+        if self.canFetchMore():
+            self.fetchMore()
+
+    def client_key(self, row: int) -> str | None:
+        """Returns the key of the client in a row, or None."""
+        return self._rows[row][0] if 0 <= row < len(self._rows) else None
+
+    def row_of(self, client_key: str) -> int:
+        """Returns the row of a client, or -1 if it is not among the fetched rows."""
+        for row, (key, _) in enumerate(self._rows):
+            if key == client_key:
+                return row
+        return -1
+
+    def client_changed(self, client_key: str):
+        """
+        Updates the list after a client was added, edited or deleted.
+
+        A client that sorts after every fetched row while more rows remain is
+        left to be fetched with its page.
+        """
+        row = self.row_of(client_key)
+        client = self.config.get_client(client_key)
+        self._total = self.config.count_clients(self._query, self.named_only)
+
+        if (client is None or not client_matches(client, self._words)
+                or (self.named_only and not client.get('institution'))):
+            if row >= 0:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._rows[row]
+                self.endRemoveRows()
+            return
+
+        entry = (client_key, client.get('institution', '') or '')
+        others = len(self._rows) - (1 if row >= 0 else 0)
+        target = bisect_left(self._rows, client_sort_key(*entry), key=lambda r: client_sort_key(*r))
+        if row >= 0 and target > row:
+            target -= 1  # Position among the other rows
+
+        if target == others and others + 1 < self._total:
+            if row >= 0:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._rows[row]
+                self.endRemoveRows()
+            return
+
+        if row < 0:
+            self.beginInsertRows(QModelIndex(), target, target)
+            self._rows.insert(target, entry)
+            self.endInsertRows()
+            return
+
+        if target != row:
+            # Destination is counted before the row is taken out
+            self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), target + 1 if target > row else target)
+            del self._rows[row]
+            self._rows.insert(target, entry)
+            self.endMoveRows()
+        else:
+            self._rows[row] = entry
+        index = self.index(target)
+        self.dataChanged.emit(index, index)
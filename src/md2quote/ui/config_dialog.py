@@ -5,9 +5,9 @@ A visually refined settings dialog with tabs for each configuration category.
 """
 
 import os
-import yaml
 import copy
 import shutil
+from datetime import datetime
 from pathlib import Path
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QTabWidget, QWidget,
@@ -23,10 +23,15 @@ from PyQt6.QtSvg import QSvgRenderer
 
 from .styles import COLORS, SPACING, RADIUS
 from .icons import icon, icon_font, icon_char
-from ..utils import get_templates_path
+from ..utils import get_templates_path, yaml_dump
 from ..core.config import config
+from ..core.renderer import template_overlays
 from ..core.llm import OPENROUTER_MODELS, OPENAI_MODELS, DEFAULT_SYSTEM_PROMPT
 
+# Debounce of live preset previews. Short, because a refresh only re-renders the
+# template and the main window coalesces refreshes while a PDF render is in flight.
+LIVE_PREVIEW_DELAY_MS = 100
+
 
 class TemplateEditorDialog(QDialog):
     """Dialog for editing raw HTML templates."""
@@ -38,7 +43,7 @@ class TemplateEditorDialog(QDialog):
         self.template_name = template_name
         self.config_loader = config_loader
         self.file_path = self._find_template_path()
-        self._original_content = None  # Store original to restore on cancel
+        self._overlay_name = f"{template_name}.html"  # Unsaved text is served to the preview under this name
         
         self.setWindowTitle(f"Edit Template: {template_name}.html")
         self.resize(900, 700)
@@ -128,7 +133,6 @@ class TemplateEditorDialog(QDialog):
             
         try:
             content = self.file_path.read_text(encoding='utf-8')
-            self._original_content = content  # Store for cancel restoration
             self.editor.blockSignals(True)  # Don't trigger preview on initial load
             self.editor.setPlainText(content)
             self.editor.blockSignals(False)
@@ -141,15 +145,11 @@ class TemplateEditorDialog(QDialog):
         self._preview_timer.start()
     
     def _emit_preview_update(self):
-        """Save content temporarily and emit preview signal."""
+        """Serve the unsaved content to the renderer and emit preview signal."""
         if not self.file_path:
             return
-        try:
-            content = self.editor.toPlainText()
-            self.file_path.write_text(content, encoding='utf-8')
-            self.previewRequested.emit()
-        except Exception:
-            pass  # Silently fail for preview updates
+        template_overlays.set(self._overlay_name, self.editor.toPlainText())
+        self.previewRequested.emit()
 
     def _save_changes(self):
         if not self.file_path:
@@ -158,21 +158,24 @@ class TemplateEditorDialog(QDialog):
         try:
             content = self.editor.toPlainText()
             self.file_path.write_text(content, encoding='utf-8')
-            self._original_content = content  # Update original since we're saving
+            self._preview_timer.stop()
+            template_overlays.discard(self._overlay_name)
+            self.previewRequested.emit()
             self.accept()
                 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Could not save template:\n{e}")
     
     def _cancel_changes(self):
-        """Restore original content and close dialog."""
-        if self._original_content is not None and self.file_path:
-            try:
-                self.file_path.write_text(self._original_content, encoding='utf-8')
-                self.previewRequested.emit()  # Refresh preview with restored content
-            except Exception:
-                pass
+        """Discard unsaved content and close dialog."""
         self.reject()
+    
+    def reject(self):
+        """Closes without saving; the preview shows the file again."""
+        self._preview_timer.stop()
+        if template_overlays.discard(self._overlay_name):
+            self.previewRequested.emit()  # Refresh preview with the saved content
+        super().reject()
 
 
 class CSSEditorDialog(QDialog):
@@ -185,7 +188,7 @@ class CSSEditorDialog(QDialog):
         self.template_name = template_name
         self.config_loader = config_loader
         self.file_path = self._find_css_path()
-        self._original_content = None  # Store original to restore on cancel
+        self._overlay_name = f"{template_name}.css"  # Unsaved text is served to the preview under this name
 
         self.setWindowTitle(f"Edit Template CSS: {template_name}.css")
         self.resize(900, 700)
@@ -272,7 +275,6 @@ class CSSEditorDialog(QDialog):
 
         try:
             content = self.file_path.read_text(encoding="utf-8")
-            self._original_content = content  # Store for cancel restoration
             self.editor.blockSignals(True)  # Don't trigger preview on initial load
             self.editor.setPlainText(content)
             self.editor.blockSignals(False)
@@ -285,15 +287,11 @@ class CSSEditorDialog(QDialog):
         self._preview_timer.start()
     
     def _emit_preview_update(self):
-        """Save content temporarily and emit preview signal."""
+        """Serve the unsaved content to the renderer and emit preview signal."""
         if not self.file_path:
             return
-        try:
-            content = self.editor.toPlainText()
-            self.file_path.write_text(content, encoding='utf-8')
-            self.previewRequested.emit()
-        except Exception:
-            pass  # Silently fail for preview updates
+        template_overlays.set(self._overlay_name, self.editor.toPlainText())
+        self.previewRequested.emit()
 
     def _save_changes(self):
         if not self.file_path:
@@ -302,20 +300,23 @@ class CSSEditorDialog(QDialog):
         try:
             content = self.editor.toPlainText()
             self.file_path.write_text(content, encoding="utf-8")
-            self._original_content = content  # Update original since we're saving
+            self._preview_timer.stop()
+            template_overlays.discard(self._overlay_name)
+            self.previewRequested.emit()
             self.accept()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Could not save CSS:\n{e}")
     
     def _cancel_changes(self):
-        """Restore original content and close dialog."""
-        if self._original_content is not None and self.file_path:
-            try:
-                self.file_path.write_text(self._original_content, encoding='utf-8')
-                self.previewRequested.emit()  # Refresh preview with restored content
-            except Exception:
-                pass
+        """Discard unsaved content and close dialog."""
         self.reject()
+    
+    def reject(self):
+        """Closes without saving; the preview shows the file again."""
+        self._preview_timer.stop()
+        if template_overlays.discard(self._overlay_name):
+            self.previewRequested.emit()  # Refresh preview with the saved content
+        super().reject()
 
 
 # Common font families for dropdowns
@@ -1376,7 +1377,7 @@ class ConfigDialog(QDialog):
         
         self._preview_timer = QTimer()
         self._preview_timer.setSingleShot(True)
-        self._preview_timer.setInterval(600)
+        self._preview_timer.setInterval(LIVE_PREVIEW_DELAY_MS)
         self._preview_timer.timeout.connect(self._emit_preview_update)
         
         self._setup_ui()
@@ -2226,6 +2227,12 @@ class ConfigDialog(QDialog):
         
         counter_row.addStretch()
         
+        set_counter_btn = QPushButton("Set Counter…")
+        set_counter_btn.setMinimumWidth(70)
+        set_counter_btn.setToolTip("Continue numbering after a given value, e.g. after numbers issued elsewhere")
+        set_counter_btn.clicked.connect(self._set_qn_counter)
+        counter_row.addWidget(set_counter_btn)
+        
         reset_counter_btn = QPushButton("Reset Counter")
         reset_counter_btn.setMinimumWidth(70)  # Reduced from 90
         reset_counter_btn.clicked.connect(self._reset_qn_counter)
@@ -2266,6 +2273,38 @@ class ConfigDialog(QDialog):
         if format_value:
             self.qn_format.setText(format_value)
     
+    def _set_qn_counter(self):
+        """Continue the current preset's numbering after a value entered by the user."""
+        qn = self.config.get('presets', {}).get(self.current_preset_key, {}).get('quotation_number', {})
+        stored = self.config_loader.quotation_counter.peek(self.current_preset_key)
+        current = stored[0] if stored else qn.get('counter', 0) or 0
+        value, ok = QInputDialog.getInt(
+            self, "Set Counter",
+            "Last quotation number already used.\nThe next quotation continues after it:",
+            current, 0, 999999
+        )
+        if not ok or value == current:
+            return
+        try:
+            # Applied to the shared counter right away, like a reset
+            self.config_loader.set_quotation_counter(self.current_preset_key, value)
+        except ValueError as e:
+            QMessageBox.warning(
+                self, "Set Counter",
+                f"{e}.\nNumbers up to the current value may already be in use; "
+                "use Reset Counter to start over."
+            )
+            return
+        
+        presets = self.config.setdefault('presets', {})
+        preset = presets.setdefault(self.current_preset_key, {})
+        qn = preset.setdefault('quotation_number', {})
+        now = datetime.now()
+        qn['counter'] = value
+        qn['last_reset_year'] = now.year
+        qn['last_reset_month'] = now.month
+        self.qn_counter_label.setText(f"Counter: {value}")
+
     def _reset_qn_counter(self):
         """Reset the counter for the current preset to 0."""
         reply = QMessageBox.question(
@@ -2277,6 +2316,9 @@ class ConfigDialog(QDialog):
             QMessageBox.StandardButton.No
         )
         if reply == QMessageBox.StandardButton.Yes:
+            # The shared counter is reset right away so other processes see it too
+            self.config_loader.reset_quotation_counter(self.current_preset_key)
+            
             presets = self.config.setdefault('presets', {})
             preset = presets.setdefault(self.current_preset_key, {})
             qn = preset.setdefault('quotation_number', {})
@@ -2783,10 +2825,7 @@ class ConfigDialog(QDialog):
         try:
             yaml_content = self._generate_yaml(self.config)
             
-            with open(self.config_loader.config_path, 'w', encoding='utf-8') as f:
-                f.write(yaml_content)
-            
-            self.config_loader.config = self.config
+            self.config_loader.replace_config(self.config, yaml_content)
             
             self.configSaved.emit()
             self.accept()
@@ -2821,7 +2860,7 @@ class ConfigDialog(QDialog):
 
         for key in ordered_keys:
             preset = presets[key]
-            dumped = yaml.dump({key: preset}, allow_unicode=True, sort_keys=False)
+            dumped = yaml_dump({key: preset}, allow_unicode=True, sort_keys=False)
             lines.append(self._indent_text(dumped, 2))
             lines.append("")
         
@@ -2830,9 +2869,15 @@ class ConfigDialog(QDialog):
         if llm_config:
             lines.append("# LLM Configuration")
             lines.append("llm:")
-            dumped = yaml.dump(llm_config, allow_unicode=True, sort_keys=False, default_flow_style=False)
+            dumped = yaml_dump(llm_config, allow_unicode=True, sort_keys=False, default_flow_style=False)
             lines.append(self._indent_text(dumped, 2))
             lines.append("")
+        
+        # Keep remaining top-level sections (clients, fonts, ...) unchanged
+        written = {'active_preset', 'preset_order', 'presets', 'llm'}
+        remaining = {k: v for k, v in config.items() if k not in written}
+        if remaining:
+            lines.append(yaml_dump(remaining, allow_unicode=True, sort_keys=False, default_flow_style=False))
             
         return "\n".join(lines)
 
@@ -2973,6 +3018,14 @@ class SettingsDialog(QDialog):
         
         content_grid.addWidget(api_key_container, 2, 1)
         
+        # Response cache row
+        self.llm_cache = QCheckBox("Reuse responses to identical requests")
+        self.llm_cache.setToolTip(
+            "Answers a repeated instruction on an unchanged document from a local cache "
+            "instead of calling the provider again"
+        )
+        content_grid.addWidget(self.llm_cache, 3, 1)
+        
         llm_card.addLayout(content_grid)
         layout.addWidget(llm_card)
         
@@ -3113,26 +3166,27 @@ class SettingsDialog(QDialog):
         self.llm_system_prompt.setPlainText(
             llm_config.get('system_prompt', DEFAULT_SYSTEM_PROMPT)
         )
+        
+        self.llm_cache.setChecked(bool(llm_config.get('cache', False)))
     
     def _save_config(self):
         """Save the LLM configuration to the YAML file."""
+        # Keeps settings without a field in this dialog, e.g. timeouts
         self.config['llm'] = {
+            **self.config.get('llm', {}),
             'provider': self.llm_provider.currentData() or 'openrouter',
             'api_key': self.llm_api_key.text(),
             'model': self.llm_model.currentData() or 'anthropic/claude-sonnet-4',
-            'system_prompt': self.llm_system_prompt.toPlainText() or DEFAULT_SYSTEM_PROMPT
+            'system_prompt': self.llm_system_prompt.toPlainText() or DEFAULT_SYSTEM_PROMPT,
+            'cache': self.llm_cache.isChecked()
         }
         
         try:
             # Generate YAML
             yaml_content = self._generate_yaml(self.config)
             
-            # Write to file
-            with open(self.config_loader.config_path, 'w', encoding='utf-8') as f:
-                f.write(yaml_content)
-            
-            # Update the config loader's config
-            self.config_loader.config = self.config
+            # Write to file and update the config loader's config
+            self.config_loader.replace_config(self.config, yaml_content)
             
             self.configSaved.emit()
             self.accept()
@@ -3167,7 +3221,7 @@ class SettingsDialog(QDialog):
 
         for key in ordered_keys:
             preset = presets[key]
-            dumped = yaml.dump({key: preset}, allow_unicode=True, sort_keys=False)
+            dumped = yaml_dump({key: preset}, allow_unicode=True, sort_keys=False)
             lines.append(self._indent_text(dumped, 2))
             lines.append("")
         
@@ -3175,9 +3229,15 @@ class SettingsDialog(QDialog):
         if llm_config:
             lines.append("# LLM Configuration")
             lines.append("llm:")
-            dumped = yaml.dump(llm_config, allow_unicode=True, sort_keys=False, default_flow_style=False)
+            dumped = yaml_dump(llm_config, allow_unicode=True, sort_keys=False, default_flow_style=False)
             lines.append(self._indent_text(dumped, 2))
             lines.append("")
+        
+        # Keep remaining top-level sections (clients, fonts, ...) unchanged
+        written = {'active_preset', 'preset_order', 'presets', 'llm'}
+        remaining = {k: v for k, v in config.items() if k not in written}
+        if remaining:
+            lines.append(yaml_dump(remaining, allow_unicode=True, sort_keys=False, default_flow_style=False))
             
         return "\n".join(lines)
     
@@ -1,3 +1,4 @@
+import os
 from PyQt6.QtWidgets import QPlainTextEdit, QWidget, QVBoxLayout, QLabel, QFrame, QTextEdit
 from PyQt6.QtGui import QFont, QSyntaxHighlighter, QTextCharFormat, QColor, QFontDatabase, QPainter, QTextFormat, QTextCursor, QKeySequence
 from PyQt6.QtCore import Qt, QRegularExpression, QRect, QSize
@@ -551,9 +552,33 @@ class EditorWidget(QWidget):
         self.editor.insertPlainText(text)
         self.editor.moveCursor(QTextCursor.MoveOperation.End)
 
+    def replace_range(self, start: int, end: int, text: str):
+        """Replaces the characters start..end of the document (Python string offsets) with text."""
+        current = self.editor.toPlainText()
+        # QTextCursor positions count UTF-16 code units
+        start_pos = len(current[:start].encode('utf-16-le')) // 2
+        end_pos = start_pos + len(current[start:end].encode('utf-16-le')) // 2
+        cursor = QTextCursor(self.editor.document())
+        cursor.setPosition(start_pos)
+        cursor.setPosition(end_pos, QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertText(text)
+
+    def replace_text(self, text: str):
+        """Replaces the document with text as one undo step, rewriting only the part that changed."""
+        current = self.editor.toPlainText()
+        prefix = len(os.path.commonprefix([current, text]))
+        suffix = 0
+        max_suffix = min(len(current), len(text)) - prefix
+        while suffix < max_suffix and current[-1 - suffix] == text[-1 - suffix]:
+            suffix += 1
+        self.replace_range(prefix, len(current) - suffix, text[prefix:len(text) - suffix])
+
     def get_text(self):
         return self.editor.toPlainText()
 
+    def set_read_only(self, read_only: bool):
+        self.editor.setReadOnly(read_only)
+
     @property
     def textChanged(self):
         return self.editor.textChanged
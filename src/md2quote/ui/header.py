@@ -1,11 +1,12 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, 
                              QTextEdit, QSizePolicy, QFrame, QLabel, QGridLayout,
                              QPushButton, QCalendarWidget, QMenu, QWidgetAction,
-                             QPlainTextEdit, QComboBox)
-from PyQt6.QtCore import QDate, pyqtSignal, Qt, QPoint
+                             QPlainTextEdit, QComboBox, QCompleter)
+from PyQt6.QtCore import QDate, pyqtSignal, Qt, QPoint, QTimer, QModelIndex
 from PyQt6.QtGui import QTextCharFormat, QColor, QKeyEvent
 from .styles import COLORS, SPACING
 from .icons import icon
+from .clients_model import ClientListModel, SEARCH_DELAY_MS
 
 
 class ModernDatePicker(QWidget):
@@ -399,6 +400,10 @@ class HeaderWidget(QWidget):
         self.setObjectName("header-widget")
         self._updating_client_combo = False  # Prevent recursion
         self._client_data = {}  # Store selected client data
+        self.client_model = None  # All clients, shown by the combo box popup
+        self.client_search_model = None  # Clients matching the text typed into the combo box
+        self._client_key = None  # Client shown in the combo box, whether its row is loaded or not
+        self._client_text = ''  # Combo box text restored when a search is abandoned
         self.init_ui()
 
     def init_ui(self):
@@ -468,7 +473,18 @@ class HeaderWidget(QWidget):
 
         self.client_combo = QComboBox()
         self.client_combo.setMinimumWidth(200)
+        self.client_combo.setEditable(True)
+        self.client_combo.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
+        self.client_combo.lineEdit().setPlaceholderText("Search clients...")
         self.client_combo.currentIndexChanged.connect(self._on_client_combo_changed)
+        
+        # Typing searches all clients; matches are offered in a completer popup
+        self._client_search_timer = QTimer(self)
+        self._client_search_timer.setSingleShot(True)
+        self._client_search_timer.setInterval(SEARCH_DELAY_MS)
+        self._client_search_timer.timeout.connect(self._run_client_search)
+        self.client_combo.lineEdit().textEdited.connect(lambda: self._client_search_timer.start())
+        self.client_combo.lineEdit().editingFinished.connect(self._on_client_search_finished)
         self.client_combo.setStyleSheet(f"""
             QComboBox {{
                 background-color: {COLORS['bg_elevated']};
@@ -584,12 +600,63 @@ class HeaderWidget(QWidget):
                 background-color: {COLORS['bg_hover']};
             }}
         """)
-        llm_input_layout.addWidget(self.llm_send_button, 0, Qt.AlignmentFlag.AlignBottom)
+        
+        self.llm_per_section_button = self._create_llm_toggle(
+            'view_agenda', "Generate per section: apply the instruction to each ## section in parallel"
+        )
+        self.llm_edit_button = self._create_llm_toggle(
+            'edit', "Edit mode: the LLM returns only the changes, applied once complete"
+        )
+        # The modes exclude each other
+        self.llm_per_section_button.toggled.connect(
+            lambda checked: checked and self.llm_edit_button.setChecked(False)
+        )
+        self.llm_edit_button.toggled.connect(
+            lambda checked: checked and self.llm_per_section_button.setChecked(False)
+        )
+        
+        llm_buttons_layout = QVBoxLayout()
+        llm_buttons_layout.setSpacing(SPACING['xs'])
+        llm_buttons_layout.addWidget(self.llm_per_section_button)
+        llm_buttons_layout.addWidget(self.llm_edit_button)
+        llm_buttons_layout.addStretch()
+        llm_buttons_layout.addWidget(self.llm_send_button)
+        llm_input_layout.addLayout(llm_buttons_layout)
 
         llm_layout.addWidget(llm_input_container)
         llm_card.content_layout.addLayout(llm_layout)
         main_layout.addWidget(llm_card, 3)
 
+    def _create_llm_toggle(self, icon_name: str, tooltip: str) -> QPushButton:
+        """Creates a checkable mode button for the LLM panel."""
+        button = QPushButton()
+        button.setCheckable(True)
+        button.setCursor(Qt.CursorShape.PointingHandCursor)
+        button.setToolTip(tooltip)
+        button.setIcon(icon(icon_name, 14, COLORS['text_secondary']))
+        button.setFixedSize(32, 24)
+        button.toggled.connect(
+            lambda checked: button.setIcon(
+                icon(icon_name, 14, COLORS['bg_dark'] if checked else COLORS['text_secondary'])
+            )
+        )
+        button.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {COLORS['bg_elevated']};
+                border: 1px solid {COLORS['border']};
+                border-radius: 4px;
+                padding: 0;
+            }}
+            QPushButton:hover {{
+                background-color: {COLORS['bg_hover']};
+            }}
+            QPushButton:checked {{
+                background-color: {COLORS['accent']};
+                border-color: {COLORS['accent']};
+            }}
+        """)
+        return button
+
     def _create_label(self, text: str) -> QLabel:
         """Creates a styled field label."""
         label = QLabel(text)
@@ -607,6 +674,8 @@ class HeaderWidget(QWidget):
 
     def _on_client_combo_changed(self, index: int):
         """Handle client selection from combo box."""
+        self._client_key = self.client_combo.itemData(index) if index >= 0 else None
+        self._client_text = self.client_combo.itemText(index) if index >= 0 else ''
         if self._updating_client_combo:
             return
         client_key = self.client_combo.currentData()
@@ -617,33 +686,105 @@ class HeaderWidget(QWidget):
         """Handle manage clients button click."""
         self.manageClientsRequested.emit()
 
-    def update_clients_combo(self, clients_list: list, select_last: bool = True):
+    def set_clients_source(self, config_loader, select_last: bool = True):
         """
-        Update the client combo box with saved clients.
+        Show the saved clients of config_loader in the client combo box.
+        
+        The combo box and its search popup are backed by ClientListModel, which
+        fetches clients a page at a time as the popups are scrolled.
         
         Args:
-            clients_list: List of (client_key, institution) tuples
-            select_last: If True, select the last client in the list
+            config_loader: Provides search_clients, count_clients and get_client
+            select_last: If True, select the last client
         """
         self._updating_client_combo = True
-        self.client_combo.clear()
-        for client_key, institution in clients_list:
-            if institution:
-                self.client_combo.addItem(institution, client_key)
+        if self.client_model is None:
+            self.client_model = ClientListModel(config_loader, self, named_only=True)
+            self.client_search_model = ClientListModel(config_loader, self, named_only=True)
+            self.client_combo.setModel(self.client_model)
+            self.client_combo.view().setUniformItemSizes(True)
+            
+            # Set on the line edit, not the combo box, which would map rows of
+            # the search model onto its own model
+            completer = QCompleter(self.client_search_model, self.client_combo)
+            completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+            completer.popup().setUniformItemSizes(True)
+            completer.activated[QModelIndex].connect(self._on_client_search_activated)
+            self.client_combo.lineEdit().setCompleter(completer)
+        self.client_model.set_query()
+        self._updating_client_combo = False
         
         # Select the last client by default
-        if select_last and self.client_combo.count() > 0:
-            self.client_combo.setCurrentIndex(self.client_combo.count() - 1)
-        
-        self._updating_client_combo = False
+        if select_last:
+            self.reset_client_combo()
 
-    def reset_client_combo(self):
-        """Reset the client combo to the last client."""
+    def client_changed(self, client_key: str):
+        """Update the client lists in place after a client was added, edited or deleted."""
+        if self.client_model is None:
+            return
         self._updating_client_combo = True
-        if self.client_combo.count() > 0:
-            self.client_combo.setCurrentIndex(self.client_combo.count() - 1)
+        self.client_model.client_changed(client_key)
+        self.client_search_model.client_changed(client_key)
         self._updating_client_combo = False
 
+    def select_client(self, client_key: str, institution: str = None) -> bool:
+        """
+        Show a client in the combo box without emitting clientSelected.
+        
+        A client whose row is not loaded yet is shown by its institution.
+        
+        Returns:
+            False if the client is not loaded and no institution was given
+        """
+        row = self.client_model.row_of(client_key) if self.client_model is not None else -1
+        if row >= 0:
+            self._updating_client_combo = True
+            self.client_combo.setCurrentIndex(row)
+            self._updating_client_combo = False
+            institution = self.client_combo.itemText(row)
+        elif not institution:
+            return False
+        self._client_key = client_key
+        self._client_text = institution
+        self.client_combo.setEditText(institution)
+        return True
+
+    def current_client_key(self) -> str | None:
+        """Returns the key of the client shown in the combo box."""
+        return self._client_key
+
+    def _run_client_search(self):
+        """Search the clients for the typed text and show the matches."""
+        if self.client_search_model is None:
+            return
+        self.client_search_model.set_query(self.client_combo.lineEdit().text())
+        self.client_combo.lineEdit().completer().complete()
+
+    def _on_client_search_activated(self, index: QModelIndex):
+        """Use a client picked from the search popup."""
+        client_key = index.data(ClientListModel.KeyRole)
+        if not client_key:
+            return
+        self._client_search_timer.stop()
+        self.select_client(client_key, index.data())
+        self.clientSelected.emit(client_key)
+
+    def _on_client_search_finished(self):
+        """Restore the selected client's name when the search is left without a pick."""
+        completer = self.client_combo.lineEdit().completer()
+        if completer is not None and completer.popup().isVisible():
+            return
+        self._client_search_timer.stop()
+        self.client_combo.setEditText(self._client_text)
+
+    def reset_client_combo(self):
+        """Reset the client combo to the last client (fetched directly, as it may not be loaded)."""
+        if self.client_model is None or not self.client_model.total:
+            return
+        last = self.client_model.config.search_clients('', self.client_model.total - 1, 1, named_only=True)
+        if last:
+            self.select_client(*last[0])
+
     def _on_generate_quotation_clicked(self):
         """Emit signal to request a new quotation number."""
         self.generateQuotationRequested.emit()
@@ -669,11 +810,23 @@ class HeaderWidget(QWidget):
         """Set the LLM panel to loading state."""
         if loading:
             self.llm_send_button.setEnabled(False)
+            self.llm_per_section_button.setEnabled(False)
+            self.llm_edit_button.setEnabled(False)
             self.llm_instruction.setEnabled(False)
         else:
             self.llm_send_button.setEnabled(True)
+            self.llm_per_section_button.setEnabled(True)
+            self.llm_edit_button.setEnabled(True)
             self.llm_instruction.setEnabled(True)
 
+    def is_llm_per_section(self) -> bool:
+        """Returns True if the instruction should be applied to each section separately."""
+        return self.llm_per_section_button.isChecked()
+
+    def is_llm_edit_mode(self) -> bool:
+        """Returns True if the LLM should return edits instead of a whole document."""
+        return self.llm_edit_button.isChecked()
+
     def clear_llm_instruction(self):
         """Clear the LLM instruction textarea."""
         self.llm_instruction.clear()
@@ -1,8 +1,7 @@
-import copy
 import json
 import os
 import re
-import yaml
+import time
 from PyQt6.QtWidgets import (QMainWindow, QSplitter, QFileDialog, QMessageBox, 
                              QToolBar, QStatusBar, QApplication, QComboBox, QLabel, QWidget, QInputDialog,
                              QVBoxLayout, QHBoxLayout, QToolButton, QSizePolicy)
@@ -10,18 +9,15 @@ from PyQt6.QtGui import QAction, QIcon, QKeySequence, QFont
 from PyQt6.QtCore import Qt, QTimer, QDir, QSettings, QThread, pyqtSignal, QObject
 
 from .editor import EditorWidget
-from .preview import PreviewWidget
+from .scheduler import PreviewScheduler
 from .header import HeaderWidget
-from .config_dialog import ConfigDialog, SettingsDialog
-from .clients_dialog import ClientsManagerDialog
 from .styles import get_stylesheet, COLORS
 from .icons import icon, icon_font, icon_char
-from ..core.parser import MarkdownParser
-from ..core.renderer import TemplateRenderer
-from ..core.pdf import PDFGenerator
 from ..core.config import config
-from ..core.llm import LLMService, LLMError
+from ..core.startup import startup
+from ..core.tracing import tracer, traced
 from .. import __version__
+from ..utils import yaml_load, yaml_dump
 
 
 class LLMWorker(QObject):
@@ -31,18 +27,20 @@ class LLMWorker(QObject):
     chunk_received = pyqtSignal(str) # Emits content chunks
     error = pyqtSignal(str)     # Emits error message
     
-    def __init__(self, llm_service: LLMService, instruction: str, context: str):
+    def __init__(self, llm_service, instruction: str, context: str, edit: bool = False):
         super().__init__()
         self.llm_service = llm_service
         self.instruction = instruction
         self.context = context
+        self.edit = edit
     
     def run(self):
         """Execute the LLM request."""
+        from ..core.llm import LLMError
         try:
             full_content = ""
             # Use streaming generation
-            for chunk in self.llm_service.generate_stream(self.instruction, self.context):
+            for chunk in self.llm_service.generate_stream(self.instruction, self.context, edit=self.edit):
                 self.chunk_received.emit(chunk)
                 full_content += chunk
             self.finished.emit(full_content)
@@ -52,7 +50,54 @@ class LLMWorker(QObject):
             self.error.emit(f"Unexpected error: {e}")
 
 
+class SectionLLMWorker(QObject):
+    """Worker applying an instruction to several sections concurrently, in a background thread."""
+    
+    section_chunk = pyqtSignal(int, str)     # Emits (section index, content chunk)
+    section_finished = pyqtSignal(int, str)  # Emits (section index, generated section)
+    section_failed = pyqtSignal(int, str)    # Emits (section index, error message)
+    finished = pyqtSignal()
+    error = pyqtSignal(str)                  # Emits error message
+    
+    def __init__(self, llm_service, instruction: str, sections: dict):
+        """
+        Args:
+            llm_service: The LLMService
+            instruction: The user's instruction
+            sections: {section index: section text} of the sections to rewrite
+        """
+        super().__init__()
+        self.llm_service = llm_service
+        self.instruction = instruction
+        self.sections = sections
+    
+    def run(self):
+        """Runs the requests on an asyncio event loop owned by this thread."""
+        import asyncio
+        
+        indexes = list(self.sections)
+        try:
+            results = asyncio.run(self.llm_service.generate_sections(
+                self.instruction,
+                [self.sections[index] for index in indexes],
+                on_chunk=lambda position, chunk: self.section_chunk.emit(indexes[position], chunk)
+            ))
+        except Exception as e:
+            self.error.emit(f"Unexpected error: {e}")
+            return
+        
+        for index, result in zip(indexes, results):
+            if isinstance(result, Exception):
+                self.section_failed.emit(index, str(result))
+            else:
+                self.section_finished.emit(index, result)
+        self.finished.emit()
+
+
 class MainWindow(QMainWindow):
+    startupFinished = pyqtSignal()  # Emitted once the preview pipeline is loaded after the first paint
+    fontDownloaded = pyqtSignal(str)  # Emitted from the font download thread, delivered queued
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle("MD2Quote")
@@ -62,14 +107,29 @@ class MainWindow(QMainWindow):
 
         self.settings = QSettings("MD2Quote", "MD2Quote")
 
-        self.parser = MarkdownParser()
-        self.renderer = TemplateRenderer()
-        self.pdf_generator = PDFGenerator()
-        self.llm_service = LLMService(config)
+        # The preview pipeline (mistune, Jinja2, QtPdf, QtWebEngine) is loaded
+        # after the first paint, so the window appears without waiting for it
+        self.parser = None
+        self.renderer = None
+        self.pdf_cache = None
+        self.pdf_generator = None
+        self.render_service = None
+        self.preview = None
+        self._first_paint_done = False
+        self._displayed_job_id = 0
+        self._preview_key = None  # Cache key of the latest requested preview
+        self._preview_job_id = None  # Render service job of the refresh in flight
+        self._preview_submitted_at = 0.0
+        self._pending_preset_override = None
+        self._parsed_document = None  # (editor text, header data) -> (metadata, html_body)
+        self.preview_scheduler = PreviewScheduler(self)
+        self.preview_scheduler.refreshRequested.connect(self._on_scheduled_refresh)
+        self._llm_service = None  # Created on first use, see llm_service
         
         self.llm_thread = None
         self.llm_worker = None
         self.is_llm_streaming_started = False
+        self._llm_edit_mode = False
         
         self.current_file = None
         self.is_modified = False
@@ -78,11 +138,6 @@ class MainWindow(QMainWindow):
         self._setup_ui()
         self._setup_toolbar()
         
-        self.preview_timer = QTimer()
-        self.preview_timer.setSingleShot(True)
-        self.preview_timer.setInterval(800)
-        self.preview_timer.timeout.connect(self.refresh_preview)
-        
         self.editor.textChanged.connect(self.on_text_changed)
 
         self.header.dataChanged.connect(self.on_header_changed)
@@ -98,10 +153,71 @@ class MainWindow(QMainWindow):
         preset_name = self.preset_combo.currentText() if self.preset_combo.count() > 0 else "None"
         self.statusbar.showMessage(f"Ready — Template: {preset_name}")
         
-        QTimer.singleShot(100, self.sync_preset_ui)
-        
         QTimer.singleShot(100, self._update_llm_button_state)
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._first_paint_done:
+            self._first_paint_done = True
+            startup.mark("first_paint")
+            # Let the first frame reach the screen before loading the heavy modules
+            QTimer.singleShot(0, self._finish_startup)
+
+    def _finish_startup(self):
+        """Loads the preview pipeline after the first paint and renders the preview."""
+        self._load_pipeline()
+        startup.mark("ready")
+        # Chromium starts while the first preview's HTML is being rendered
+        self.render_service.warmedUp.connect(self._on_renderer_warmed_up)
+        self.render_service.warm_up()
+        self.sync_preset_ui()
+
+    def _on_renderer_warmed_up(self, elapsed_ms: float):
+        startup.mark("warm_up")
+        self.startupFinished.emit()
+
+    def _load_pipeline(self):
+        """Creates the parser, renderer, PDF services and preview widget, once."""
+        if self.render_service is not None:
+            return
+        
+        from .preview import PreviewWidget
+        from ..core.parser import MarkdownParser
+        from ..core.renderer import TemplateRenderer
+        from ..core.pdf import PDFGenerator, PDFRenderService, PDFCache
+        from ..core.fonts import font_cache
+        
+        self.parser = MarkdownParser(incremental=True)
+        self.renderer = TemplateRenderer()
+        # The disk tier is opt-in: `pdf_cache: {disk: true, max_disk_entries: 64}`
+        cache_config = config.get('pdf_cache', {}) or {}
+        self.pdf_cache = PDFCache(
+            disk_dir=config.config_dir / "cache" / "pdf" if cache_config.get('disk', False) else None,
+            max_disk_entries=cache_config.get('max_disk_entries', 64)
+        )
+        self.pdf_generator = PDFGenerator(cache=self.pdf_cache)
+        self.render_service = PDFRenderService(cache=self.pdf_cache, parent=self)
+        self.render_service.pdfReady.connect(self._on_preview_pdf_ready)
+        self.render_service.renderFailed.connect(self._on_preview_render_failed)
+        self.render_service.jobDropped.connect(self._on_preview_job_dropped)
+
+        # Previews rendered with fallback fonts are redone once the web font is local
+        self.fontDownloaded.connect(self._on_font_downloaded)
+        font_cache.add_download_listener(self._on_font_download_finished)
+        
+        self.preview = PreviewWidget()
+        self.splitter.replaceWidget(1, self.preview)
+        self.preview_placeholder.deleteLater()
+        self.preview_placeholder = None
+
+    @property
+    def llm_service(self):
+        """The LLM service, imported and created on first use."""
+        if self._llm_service is None:
+            from ..core.llm import LLMService
+            self._llm_service = LLMService(config)
+        return self._llm_service
+
     def _setup_ui(self):
         main_widget = QWidget()
         self.setCentralWidget(main_widget)
@@ -126,8 +242,9 @@ class MainWindow(QMainWindow):
         self.editor = EditorWidget()
         self.splitter.addWidget(self.editor)
 
-        self.preview = PreviewWidget()
-        self.splitter.addWidget(self.preview)
+        # Replaced by the PreviewWidget in _load_pipeline
+        self.preview_placeholder = QWidget()
+        self.splitter.addWidget(self.preview_placeholder)
 
         self.splitter.setSizes([600, 700])
         
@@ -136,6 +253,10 @@ class MainWindow(QMainWindow):
         self.statusbar = QStatusBar()
         self.setStatusBar(self.statusbar)
         
+        self.render_time_label = QLabel("")
+        self.render_time_label.setStyleSheet(f"color: {COLORS['text_muted']}; font-size: 11px; padding-right: 8px;")
+        self.statusbar.addPermanentWidget(self.render_time_label)
+        
         version_label = QLabel(f"v{__version__}")
         version_label.setStyleSheet(f"color: {COLORS['text_muted']}; font-size: 11px; padding-right: 8px;")
         self.statusbar.addPermanentWidget(version_label)
@@ -299,13 +420,13 @@ class MainWindow(QMainWindow):
     def on_text_changed(self):
         self.is_modified = True
         self.statusbar.showMessage("Modified")
-        self.preview_timer.start()
+        self.preview_scheduler.request()
 
     def on_header_changed(self):
         self.is_modified = True
         self.statusbar.showMessage("Modified")
         self._persist_last_client_data()
-        self.preview_timer.start()
+        self.preview_scheduler.request()
 
     def on_llm_request(self, instruction: str):
         """Handle LLM request from the header panel."""
@@ -330,12 +451,28 @@ class MainWindow(QMainWindow):
         
         context = self.editor.get_text()
         
+        if self.header.is_llm_per_section():
+            from ..core.llm import split_sections
+            parts = split_sections(context)
+            if len(parts) > 1:
+                self._start_section_generation(instruction, parts)
+                return
+            self.statusbar.showMessage("No ## sections found, generating the whole document")
+        
+        # An empty document has nothing to edit
+        self._llm_edit_mode = self.header.is_llm_edit_mode() and bool(context.strip())
+        self._llm_edit_context = context
+        self._llm_received_chars = 0
+        if self._llm_edit_mode:
+            # Edits are applied to the text they were made for
+            self.editor.set_read_only(True)
+        
         self.header.set_llm_loading(True)
         self.statusbar.showMessage("Connecting to LLM...")
         self.is_llm_streaming_started = False
         
         self.llm_thread = QThread()
-        self.llm_worker = LLMWorker(self.llm_service, instruction, context)
+        self.llm_worker = LLMWorker(self.llm_service, instruction, context, edit=self._llm_edit_mode)
         self.llm_worker.moveToThread(self.llm_thread)
         
         self.llm_thread.started.connect(self.llm_worker.run)
@@ -348,8 +485,105 @@ class MainWindow(QMainWindow):
         
         self.llm_thread.start()
 
+    def _start_section_generation(self, instruction: str, parts: list):
+        """
+        Rewrites every ## section concurrently, streaming each into its place.
+        
+        Args:
+            instruction: The user's instruction
+            parts: split_sections() of the editor text; part 0 (the preamble)
+                is left as it is
+        """
+        self._llm_parts = list(parts)           # Current editor text of each part
+        self._llm_original_parts = list(parts)
+        self._llm_started_sections = set()
+        self._llm_section_errors = []
+        
+        # Offsets into the editor text must stay valid while sections stream in
+        self.editor.set_read_only(True)
+        self.header.set_llm_loading(True)
+        self.statusbar.showMessage(f"Generating {len(parts) - 1} sections...")
+        
+        self.llm_thread = QThread()
+        sections = {index: part for index, part in enumerate(parts) if index > 0}
+        self.llm_worker = SectionLLMWorker(self.llm_service, instruction, sections)
+        self.llm_worker.moveToThread(self.llm_thread)
+        
+        self.llm_thread.started.connect(self.llm_worker.run)
+        self.llm_worker.section_chunk.connect(self._on_section_chunk)
+        self.llm_worker.section_finished.connect(self._on_section_finished)
+        self.llm_worker.section_failed.connect(self._on_section_failed)
+        self.llm_worker.finished.connect(self._on_sections_done)
+        self.llm_worker.error.connect(self._on_sections_error)
+        self.llm_worker.finished.connect(self.llm_thread.quit)
+        self.llm_worker.error.connect(self.llm_thread.quit)
+        self.llm_thread.finished.connect(self._cleanup_llm_thread)
+        
+        self.llm_thread.start()
+
+    def _replace_part(self, index: int, text: str):
+        """Replaces the editor text of one part of a per-section generation."""
+        start = sum(len(part) for part in self._llm_parts[:index])
+        self.editor.replace_range(start, start + len(self._llm_parts[index]), text)
+        self._llm_parts[index] = text
+
+    def _on_section_chunk(self, index: int, chunk: str):
+        """Streams a chunk into its section; the first chunk replaces the old section."""
+        if index not in self._llm_started_sections:
+            self._llm_started_sections.add(index)
+            self._replace_part(index, chunk)
+        else:
+            self._replace_part(index, self._llm_parts[index] + chunk)
+
+    def _on_section_finished(self, index: int, content: str):
+        """Keeps the blank lines that separated the section from the next one."""
+        original = self._llm_original_parts[index]
+        if not content.strip():
+            self._on_section_failed(index, "The LLM returned an empty section")
+            return
+        separator = original[len(original.rstrip()):]
+        self._replace_part(index, content.strip('\n').rstrip() + separator)
+
+    def _on_section_failed(self, index: int, error_message: str):
+        """Restores the original text of a section that could not be generated."""
+        self._replace_part(index, self._llm_original_parts[index])
+        self._llm_section_errors.append(error_message)
+
+    def _on_sections_error(self, error_message: str):
+        """Restores every section after an unexpected failure of a per-section generation."""
+        for index in self._llm_started_sections:
+            self._replace_part(index, self._llm_original_parts[index])
+        self._on_llm_error(error_message)
+
+    def _on_sections_done(self):
+        """Handles the end of a per-section generation."""
+        self.editor.set_read_only(False)
+        self.header.set_llm_loading(False)
+        self.is_modified = True
+        self.preview_scheduler.request()
+        
+        total = len(self._llm_parts) - 1
+        if not self._llm_section_errors:
+            self.header.clear_llm_instruction()
+            self.statusbar.showMessage(f"{total} sections generated successfully")
+            return
+        
+        self.statusbar.showMessage(f"{len(self._llm_section_errors)} of {total} sections failed")
+        QMessageBox.warning(
+            self,
+            "LLM Error",
+            f"{len(self._llm_section_errors)} of {total} sections could not be generated "
+            f"and were left unchanged:\n\n{self._llm_section_errors[0]}"
+        )
+
     def _on_llm_chunk(self, chunk: str):
         """Handle incoming LLM content chunk."""
+        if self._llm_edit_mode:
+            # Edits are applied once complete
+            self._llm_received_chars += len(chunk)
+            self.statusbar.showMessage(f"Receiving edits... ({self._llm_received_chars} characters)")
+            return
+        
         if not self.is_llm_streaming_started:
             self.editor.set_text("")
             self.is_llm_streaming_started = True
@@ -359,15 +593,44 @@ class MainWindow(QMainWindow):
 
     def _on_llm_success(self, content: str):
         """Handle successful LLM response completion."""
+        if self._llm_edit_mode:
+            self._apply_llm_edits(content)
+            return
+        
         self.header.set_llm_loading(False)
         self.header.clear_llm_instruction()
         self.statusbar.showMessage("Content generated successfully")
         
         self.is_modified = True
-        self.preview_timer.start()
+        self.preview_scheduler.request()
+
+    def _apply_llm_edits(self, response: str):
+        """Validates the LLM's search/replace edits and applies all of them, or none."""
+        from ..core.llm_edits import EditError, parse_edit_blocks, apply_edit_blocks
+        
+        self.editor.set_read_only(False)
+        self.header.set_llm_loading(False)
+        try:
+            blocks = parse_edit_blocks(response)
+            new_text = apply_edit_blocks(self._llm_edit_context, blocks)
+        except EditError as e:
+            self.statusbar.showMessage("LLM edits could not be applied")
+            QMessageBox.warning(
+                self,
+                "LLM Edits Not Applied",
+                f"The document was left unchanged.\n\n{e}"
+            )
+            return
+        
+        self.editor.replace_text(new_text)
+        self.header.clear_llm_instruction()
+        self.statusbar.showMessage(f"Applied {len(blocks)} edit{'s' if len(blocks) != 1 else ''}")
+        self.is_modified = True
+        self.preview_scheduler.request()
 
     def _on_llm_error(self, error_message: str):
         """Handle LLM error."""
+        self.editor.set_read_only(False)
         self.header.set_llm_loading(False)
         self.statusbar.showMessage("LLM request failed")
         
@@ -388,15 +651,14 @@ class MainWindow(QMainWindow):
 
     def _update_llm_button_state(self):
         """Update LLM send button enabled state based on configuration."""
-        if self.llm_service.is_configured():
+        if config.is_llm_configured():
             self.header.set_llm_enabled(True, "Send instruction to LLM")
         else:
             self.header.set_llm_enabled(True, "Click to configure LLM (no API key set)")
 
     def _update_clients_combo(self, select_last: bool = True):
         """Update the clients dropdown in the header with saved clients."""
-        clients_list = config.get_clients_list()
-        self.header.update_clients_combo(clients_list, select_last=select_last)
+        self.header.set_clients_source(config, select_last=select_last)
 
     def _on_client_selected(self, client_key: str):
         """Handle client selection from the dropdown."""
@@ -405,42 +667,43 @@ class MainWindow(QMainWindow):
             self.header.set_client_data(client)
             self._persist_last_client_data(client)
             self.statusbar.showMessage(f"Client: {client.get('institution', 'Unknown')}")
-            self.preview_timer.start()
+            self.preview_scheduler.request()
 
     def _on_manage_clients(self):
         """Open the clients manager dialog."""
+        from .clients_dialog import ClientsManagerDialog
         dialog = ClientsManagerDialog(config, parent=self)
         dialog.clientSelected.connect(self._on_client_from_dialog)
+        dialog.clientChanged.connect(self.header.client_changed)
         dialog.clientsChanged.connect(self._on_clients_changed)
         dialog.exec()
 
     def _on_clients_changed(self):
-        """Handle clients list being modified in the dialog."""
+        """Reload the clients dropdown after many clients changed (e.g. an import)."""
         self._update_clients_combo(select_last=False)
         # Re-select the current client if it still exists
         current_client = self.header.get_data().get("client", {})
         if current_client.get("institution"):
             # Find the client in the updated list
-            clients = config.get_clients()
-            for key, data in clients.items():
-                if data.get("institution") == current_client.get("institution"):
-                    self.header._updating_client_combo = True
-                    index = self.header.client_combo.findData(key)
-                    if index >= 0:
-                        self.header.client_combo.setCurrentIndex(index)
-                    self.header._updating_client_combo = False
-                    return
+            key = config.find_client_key(current_client.get("institution"))
+            if key and self.header.select_client(key, current_client.get("institution")):
+                return
         # If current client was not found, select the last one
         self.header.reset_client_combo()
 
     def _on_client_from_dialog(self, client_data: dict):
         """Handle client selected from the manager dialog."""
         self.header.set_client_data(client_data)
-        self.header.reset_client_combo()
+        # Show the chosen client, which need not be among the loaded rows
+        institution = client_data.get('institution')
+        key = config.find_client_key(institution) if institution else None
+        if not key or not self.header.select_client(key, institution):
+            self.header.reset_client_combo()
         self._persist_last_client_data(client_data)
         self.statusbar.showMessage(f"Client: {client_data.get('institution', 'Unknown')}")
-        self.preview_timer.start()
+        self.preview_scheduler.request()
 
+    @traced("MainWindow._get_safe_context")
     def _get_safe_context(self, metadata, html_body, preset_override=None):
         """Ensures context has all required fields with defaults to prevent template errors.
         
@@ -451,59 +714,12 @@ class MainWindow(QMainWindow):
         """
         # Use preset_override for live preview, otherwise load from config
         if preset_override is not None:
-            preset_config = copy.deepcopy(preset_override)
+            preset_config = preset_override
         else:
-            preset_config = copy.deepcopy(config.get_preset(self.current_preset))
-        
-        # Get valid_days from template defaults, fallback to 30
-        profile_valid_days = preset_config.get('defaults', {}).get('valid_days', 30)
-        
-        defaults = {
-            "quotation": {
-                "number": "DRAFT",
-                "date": "YYYY-MM-DD",
-                "valid_days": profile_valid_days
-            },
-            "client": {
-                "contact": "",
-                "institution": "",
-                "name": "",  # Backward compatibility alias
-                "address": "",
-                "email": ""
-            }
-        }
-
-        context = defaults.copy()
-        
-        for key in defaults:
-            if key in metadata and isinstance(metadata[key], dict):
-                context[key] = {**defaults[key], **metadata[key]}
-            elif key in metadata:
-                context[key] = metadata[key]
-        
-        for key, value in metadata.items():
-            if key not in defaults:
-                context[key] = value
-
-        context["content"] = html_body
-        
-        if 'company' in metadata and isinstance(metadata['company'], dict):
-            if 'company' not in preset_config:
-                preset_config['company'] = {}
-            preset_config['company'].update(metadata['company'])
-        
-        if 'company' in preset_config and preset_config['company'].get('logo'):
-            logo_str = preset_config['company']['logo']
-            if not logo_str.startswith('file://'):
-                logo_path = config.resolve_path(logo_str)
-                if logo_path and logo_path.exists():
-                    preset_config['company']['logo'] = logo_path.as_uri()
-                else:
-                    preset_config['company']['logo'] = ''
-            
-        context.update(preset_config)
+            preset_config = config.get_preset(self.current_preset)
         
-        return context
+        from ..core.renderer import build_context
+        return build_context(metadata, html_body, preset_config)
 
     def _merge_header_data(self, metadata, header_data):
         """Merges header data into metadata, prioritizing header data."""
@@ -518,39 +734,124 @@ class MainWindow(QMainWindow):
                     if v:
                         metadata[section][k] = v
 
+    def _parse_document(self, content: str) -> tuple:
+        """Returns the metadata and HTML body of the editor text merged with the header fields.
+        
+        Live preview refreshes from the templates dialog change only the preset,
+        so the result for unchanged text and header fields is reused and only the
+        preset part of the context is rebuilt. build_context never modifies the
+        metadata, so sharing it between refreshes is safe.
+        """
+        header_data = self.header.get_data()
+        key = (content, json.dumps(header_data, sort_keys=True, default=str))
+        if self._parsed_document is not None and self._parsed_document[0] == key:
+            tracer.count("preview.parse_reused")
+            return self._parsed_document[1]
+        
+        metadata, html_body = self.parser.parse_text(content)
+        self._merge_header_data(metadata, header_data)
+        self._parsed_document = (key, (metadata, html_body))
+        return metadata, html_body
+
+    def _on_scheduled_refresh(self):
+        """Runs a refresh requested by the scheduler, keeping a deferred preset override."""
+        preset_override = self._pending_preset_override
+        self._pending_preset_override = None
+        self.refresh_preview(preset_override)
+
     def refresh_preview(self, preset_override=None):
-        """Generates PDF in memory and updates preview.
+        """Renders HTML and queues the PDF conversion for the preview.
+        
+        The PDF is produced asynchronously by the render service; the preview is
+        updated in _on_preview_pdf_ready, so the editor never blocks. While a
+        refresh is in flight, further refreshes are deferred until it finishes and
+        then run once with the newest editor text.
         
         Args:
             preset_override: Optional preset values to use instead of saved config (for live preview)
         """
+        if self.preview_scheduler.in_flight:
+            self._pending_preset_override = preset_override
+            self.preview_scheduler.defer()
+            return
+        
+        from ..core.renderer import page_margins
+        from ..core.pdf import PDFCache, DEFAULT_PAGE_MARGINS
+        self._load_pipeline()
+        
+        self.preview_scheduler.begin()
         content = self.editor.get_text()
         
         try:
-            metadata, html_body = self.parser.parse_text(content)
-            self._merge_header_data(metadata, self.header.get_data())
+            started = time.perf_counter()
+            metadata, html_body = self._parse_document(content)
+            parsed = time.perf_counter()
+            self.preview_scheduler.record('parse', parsed - started)
             
             context = self._get_safe_context(metadata, html_body, preset_override=preset_override)
             
             template_name = metadata.get("template", "base")
             
             full_html = self.renderer.render(template_name, context, preset_config=context)
+            self.preview_scheduler.record('render', time.perf_counter() - parsed)
             
-            if 'layout' in context and 'page_margins' in context['layout']:
-                margins = context['layout']['page_margins']
-                if len(margins) == 4:
-                    self.pdf_generator.set_margins(tuple(margins))
+            margins = page_margins(context, DEFAULT_PAGE_MARGINS)
             
-            pdf_bytes = self.pdf_generator.generate_bytes(full_html)
+            # Unchanged HTML needs neither a PDF render nor a preview reload
+            preview_key = PDFCache.key(full_html, margins, config.config_dir)
+            if preview_key == self._preview_key:
+                tracer.count("preview.unchanged")
+                self.preview_scheduler.finish()
+                return
+            self._preview_key = preview_key
             
-            self.preview.update_preview(pdf_bytes)
+            self._preview_submitted_at = time.perf_counter()
+            self._preview_job_id = self.render_service.submit(full_html, margins)
             
         except Exception as e:
+            self.preview_scheduler.finish()
             import traceback
             traceback.print_exc()
             self.statusbar.showMessage(f"Preview error: {str(e)}")
             print(f"Preview Error: {e}")
 
+    def _on_preview_pdf_ready(self, job_id: int, pdf_bytes: bytes):
+        """Shows a finished preview render unless a newer one is already displayed."""
+        if job_id == self._preview_job_id:
+            self._preview_job_id = None
+            self.preview_scheduler.record('pdf', time.perf_counter() - self._preview_submitted_at)
+            self.preview_scheduler.finish()
+            self.render_time_label.setText(f"Rendered in {self.preview_scheduler.last_duration * 1000:.0f} ms")
+        if job_id < self._displayed_job_id:
+            return
+        self._displayed_job_id = job_id
+        self.preview.update_preview(pdf_bytes)
+
+    def _on_preview_render_failed(self, job_id: int, error_message: str):
+        """Reports a failed preview render."""
+        if job_id == self._preview_job_id:
+            self._preview_job_id = None
+            self.preview_scheduler.finish()
+        self._preview_key = None
+        self.statusbar.showMessage(f"Preview error: {error_message}")
+        print(f"Preview Error: {error_message}")
+
+    def _on_preview_job_dropped(self, job_id: int):
+        """Ends the refresh whose render was replaced before it started."""
+        if job_id == self._preview_job_id:
+            self._preview_job_id = None
+            self.preview_scheduler.finish()
+
+    def _on_font_download_finished(self, family: str, ok: bool):
+        """Called on the download thread; hands successful downloads to the GUI thread."""
+        if ok:
+            self.fontDownloaded.emit(family)
+
+    def _on_font_downloaded(self, family: str):
+        """Re-renders the preview with a font that finished downloading."""
+        self._preview_key = None
+        self.preview_scheduler.request()
+
     def _get_last_folder(self) -> str:
         """Returns the last opened folder, or home directory if not set."""
         return self.settings.value("last_folder", QDir.homePath())
@@ -589,7 +890,7 @@ class MainWindow(QMainWindow):
             self.header.set_client_data(client_data)
         else:
             # Load the currently selected client from the combo
-            client_key = self.header.client_combo.currentData()
+            client_key = self.header.current_client_key()
             if client_key:
                 client = config.get_client(client_key)
                 if client:
@@ -612,6 +913,7 @@ class MainWindow(QMainWindow):
                 text = f.read()
             self.editor.set_text(text)
             
+            self._load_pipeline()
             metadata, _ = self.parser.parse_text(text)
             self.header.set_data(metadata)
             self._persist_last_client_data(metadata.get("client", {}))
@@ -632,7 +934,7 @@ class MainWindow(QMainWindow):
         if match:
             existing_yaml = match.group(1)
             try:
-                metadata = yaml.safe_load(existing_yaml) or {}
+                metadata = yaml_load(existing_yaml) or {}
             except:
                 metadata = {}
             body = text[match.end():]
@@ -642,7 +944,7 @@ class MainWindow(QMainWindow):
 
         self._merge_header_data(metadata, header_data)
         
-        new_yaml = yaml.dump(metadata, allow_unicode=True, sort_keys=False)
+        new_yaml = yaml_dump(metadata, allow_unicode=True, sort_keys=False)
         return f"---\n{new_yaml}---\n{body}"
 
     def save_file(self):
@@ -687,6 +989,7 @@ class MainWindow(QMainWindow):
                 content = self.editor.get_text()
                 header_data = self.header.get_data()
                 
+                self._load_pipeline()
                 metadata, html_body = self.parser.parse_text(content)
                 self._merge_header_data(metadata, header_data)
                 
@@ -735,18 +1038,24 @@ class MainWindow(QMainWindow):
 
     def open_profiles(self):
         """Opens the templates configuration dialog."""
+        from .config_dialog import ConfigDialog
         dialog = ConfigDialog(config, initial_preset_key=self.current_preset, parent=self)
         dialog.configSaved.connect(self.on_config_saved)
         dialog.presetPreviewRequested.connect(self._on_live_preview_requested)
         dialog.exec()
     
     def _on_live_preview_requested(self, preset_values: dict):
-        """Handle live preview request from the templates dialog."""
-        self.renderer = TemplateRenderer()
+        """Handle live preview request from the templates dialog.
+        
+        The long-lived renderer is reused: its compiled templates stay valid, and
+        files the dialog writes are picked up by ChangeTrackingLoader.
+        """
+        tracer.count("preview.live")
         self.refresh_preview(preset_override=preset_values)
 
     def open_settings(self):
         """Opens the settings dialog for LLM configuration."""
+        from .config_dialog import SettingsDialog
         dialog = SettingsDialog(config, parent=self)
         dialog.configSaved.connect(self.on_config_saved)
         dialog.exec()
@@ -756,8 +1065,6 @@ class MainWindow(QMainWindow):
         config._ensure_config_exists()
         config.config = config._load_config()
         
-        self.renderer = TemplateRenderer()
-        
         self.update_preset_selector()
         self.sync_preset_ui()
         
@@ -1,12 +1,167 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QStackedWidget
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QScrollArea
 from PyQt6.QtPdf import QPdfDocument
-from PyQt6.QtPdfWidgets import QPdfView
-from PyQt6.QtCore import QBuffer, QIODevice, QTimer
+from collections import OrderedDict
+from PyQt6.QtCore import Qt, QBuffer, QIODevice, QTimer, QSize
+from PyQt6.QtGui import QPixmap
 from .styles import COLORS, SPACING
+from ..core.pdf_pages import page_fingerprints
+from ..core.tracing import tracer, traced
+
+
+# Rasterised page images kept for reuse across preview updates
+PAGE_IMAGE_CACHE_SIZE = 48
+
+
+class PageImageView(QScrollArea):
+    """
+    Continuous page view that shows rasterised PDF pages fitted to its width.
+    
+    Page images are cached by page fingerprint (see core/pdf_pages.py), so when a
+    new version of the document arrives only pages whose content changed are
+    rasterised again, and only once they scroll into view.
+    """
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWidgetResizable(True)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setStyleSheet(f"""
+            QScrollArea {{
+                background-color: {COLORS['bg_dark']};
+                border: none;
+            }}
+        """)
+        
+        container = QWidget()
+        container.setStyleSheet(f"background-color: {COLORS['bg_dark']};")
+        self._layout = QVBoxLayout(container)
+        self._layout.setContentsMargins(SPACING['md'], SPACING['md'], SPACING['md'], SPACING['md'])
+        self._layout.setSpacing(SPACING['md'])
+        self._layout.setAlignment(Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignTop)
+        self.setWidget(container)
+        
+        self._document = None
+        self._labels = []
+        self._page_keys = []     # Fingerprint of each page of the current document
+        self._shown_keys = []    # Image cache key currently shown by each label
+        self._page_spans = []    # (top, bottom) of each page in the scrolled widget
+        self._image_cache = OrderedDict()  # (fingerprint, width_px) -> QPixmap
+        self._generation = 0
+        
+        self.rasterised_count = 0
+        self.reused_count = 0
+        
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(100)
+        self._resize_timer.timeout.connect(self._layout_pages)
+        
+        self.verticalScrollBar().valueChanged.connect(self._render_visible)
+    
+    def set_document(self, document: QPdfDocument, fingerprints: list = None):
+        """
+        Shows a loaded document.
+        
+        Args:
+            document: A QPdfDocument whose status is Ready; it must stay alive while shown
+            fingerprints: Per-page fingerprints, or None to treat every page as changed
+        """
+        self._generation += 1
+        count = document.pageCount()
+        if not fingerprints or len(fingerprints) != count:
+            fingerprints = [f"{self._generation}:{i}" for i in range(count)]
+        
+        self._document = document
+        self._page_keys = list(fingerprints)
+        
+        while len(self._labels) < count:
+            label = QLabel()
+            label.setStyleSheet("background-color: white;")
+            self._layout.addWidget(label)
+            self._labels.append(label)
+            self._shown_keys.append(None)
+        while len(self._labels) > count:
+            label = self._labels.pop()
+            self._shown_keys.pop()
+            self._layout.removeWidget(label)
+            label.deleteLater()
+        
+        self._layout_pages()
+    
+    def _page_width(self) -> int:
+        margins = self._layout.contentsMargins()
+        return max(100, self.viewport().width() - margins.left() - margins.right())
+    
+    def _layout_pages(self):
+        """Sizes the page labels for the current width and renders the visible ones."""
+        if self._document is None:
+            return
+        width = self._page_width()
+        top = self._layout.contentsMargins().top()
+        self._page_spans = []
+        for i, label in enumerate(self._labels):
+            size = self._document.pagePointSize(i)
+            height = round(width * size.height() / size.width()) if size.width() > 0 else width
+            label.setFixedSize(width, height)
+            self._page_spans.append((top, top + height))
+            top += height + self._layout.spacing()
+        # Sizes apply once the layout has run
+        QTimer.singleShot(0, self._render_visible)
+    
+    def _render_visible(self):
+        """Rasterises pages in or near the viewport whose image is missing or outdated."""
+        if self._document is None or self._document.status() != QPdfDocument.Status.Ready:
+            return
+        
+        top = self.verticalScrollBar().value()
+        height = self.viewport().height()
+        lower, upper = top - height, top + 2 * height
+        ratio = self.devicePixelRatioF()
+        width = self._page_width()
+        
+        for i, label in enumerate(self._labels):
+            if i >= len(self._page_spans):
+                break
+            key = (self._page_keys[i], width)
+            if self._shown_keys[i] == key:
+                continue
+            
+            pixmap = self._image_cache.get(key)
+            if pixmap is not None:
+                self._image_cache.move_to_end(key)
+                self.reused_count += 1
+                tracer.count("preview.pages_reused")
+            else:
+                page_top, page_bottom = self._page_spans[i]
+                if page_bottom < lower or page_top > upper:
+                    continue
+                target = QSize(round(label.width() * ratio), round(label.height() * ratio))
+                image = self._document.render(i, target)
+                if image.isNull():
+                    continue
+                pixmap = QPixmap.fromImage(image)
+                pixmap.setDevicePixelRatio(ratio)
+                self._image_cache[key] = pixmap
+                while len(self._image_cache) > PAGE_IMAGE_CACHE_SIZE:
+                    self._image_cache.popitem(last=False)
+                self.rasterised_count += 1
+                tracer.count("preview.pages_rasterised")
+            
+            label.setPixmap(pixmap)
+            self._shown_keys[i] = key
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._resize_timer.start()
 
 
 class PreviewWidget(QWidget):
-    """Container widget for the PDF preview with smooth double-buffered updates."""
+    """
+    Container widget for the PDF preview.
+    
+    New PDFs are loaded into an alternate QPdfDocument; once loaded, the page view
+    switches to it and re-rasterises only the pages whose content changed.
+    """
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setObjectName("preview-container")
@@ -29,101 +184,53 @@ class PreviewWidget(QWidget):
             border-bottom: 1px solid {COLORS['border']};
         """)
         layout.addWidget(header)
-
-        self._stack = QStackedWidget(self)
-        self._stack.setStyleSheet(f"background-color: {COLORS['bg_dark']};")
         
-        self._pdf_views = []
+        self._page_view = PageImageView(self)
+        layout.addWidget(self._page_view)
+        
         self._pdf_documents = []
         self._buffers = [None, None]
+        self._fingerprints = [None, None]
         
         for i in range(2):
-            pdf_view = QPdfView(self)
-            pdf_view.setObjectName(f"pdf-view-{i}")
             pdf_document = QPdfDocument(self)
-            pdf_view.setDocument(pdf_document)
-            
-            pdf_view.setPageMode(QPdfView.PageMode.MultiPage)
-            pdf_view.setZoomMode(QPdfView.ZoomMode.FitToWidth)
-            
-            pdf_view.setStyleSheet(f"""
-                QPdfView {{
-                    background-color: {COLORS['bg_dark']};
-                    border: none;
-                }}
-            """)
-            
-            self._pdf_views.append(pdf_view)
+            pdf_document.statusChanged.connect(lambda status, i=i: self._on_document_status(i, status))
             self._pdf_documents.append(pdf_document)
-            self._stack.addWidget(pdf_view)
         
         self._active_buffer = 0
-        
-        layout.addWidget(self._stack)
-        
-        self._pending_scroll_position = None
-        self._is_first_load = True
+        self._loading_buffer = None
 
     @property
     def pdf_view(self):
-        """Returns the currently active PDF view (for compatibility)."""
-        return self._pdf_views[self._active_buffer]
+        """Returns the page view."""
+        return self._page_view
     
     @property
     def pdf_document(self):
-        """Returns the currently active PDF document (for compatibility)."""
+        """Returns the currently displayed PDF document."""
         return self._pdf_documents[self._active_buffer]
 
+    @traced("PreviewWidget.update_preview")
     def update_preview(self, pdf_bytes: bytes):
-        """Updates the preview with new PDF content using double-buffering for smooth transitions."""
-        active_view = self._pdf_views[self._active_buffer]
-        scrollbar = active_view.verticalScrollBar()
-        saved_scroll_value = scrollbar.value()
-        saved_scroll_max = scrollbar.maximum()
-        
-        if saved_scroll_max > 0:
-            self._pending_scroll_position = saved_scroll_value / saved_scroll_max
-        else:
-            self._pending_scroll_position = 0.0
-        
+        """Loads new PDF content; the view switches to it once loading finishes."""
         next_buffer = 1 - self._active_buffer
-        next_view = self._pdf_views[next_buffer]
         next_document = self._pdf_documents[next_buffer]
         
+        self._fingerprints[next_buffer] = page_fingerprints(pdf_bytes)
+        self._loading_buffer = next_buffer
+        
         self._buffers[next_buffer] = QBuffer()
         self._buffers[next_buffer].setData(pdf_bytes)
         self._buffers[next_buffer].open(QIODevice.OpenModeFlag.ReadOnly)
         next_document.load(self._buffers[next_buffer])
         
-        QTimer.singleShot(30, lambda: self._swap_buffers(next_buffer))
-    
-    def _swap_buffers(self, next_buffer: int):
-        """Swaps to the newly loaded buffer and restores scroll position."""
-        next_view = self._pdf_views[next_buffer]
-        saved_position = self._pending_scroll_position
-        
-        if saved_position is not None:
-            scrollbar = next_view.verticalScrollBar()
-            new_max = scrollbar.maximum()
-            if new_max > 0:
-                scrollbar.setValue(int(saved_position * new_max))
-        
-        self._stack.setUpdatesEnabled(False)
-        
-        self._stack.setCurrentIndex(next_buffer)
-        self._active_buffer = next_buffer
-        
-        self._stack.setUpdatesEnabled(True)
-        
-        if saved_position is not None and not self._is_first_load:
-            QTimer.singleShot(10, lambda: self._fine_tune_scroll(saved_position))
-        
-        self._is_first_load = False
-        self._pending_scroll_position = None
+        if next_document.status() == QPdfDocument.Status.Ready:
+            self._on_document_status(next_buffer, QPdfDocument.Status.Ready)
     
-    def _fine_tune_scroll(self, position: float):
-        """Fine-tunes scroll position after the view is fully rendered."""
-        scrollbar = self._pdf_views[self._active_buffer].verticalScrollBar()
-        new_max = scrollbar.maximum()
-        if new_max > 0:
-            scrollbar.setValue(int(position * new_max))
+    def _on_document_status(self, buffer: int, status):
+        """Shows a document once it finished loading."""
+        if status != QPdfDocument.Status.Ready or buffer != self._loading_buffer:
+            return
+        self._loading_buffer = None
+        self._active_buffer = buffer
+        self._page_view.set_document(self._pdf_documents[buffer], self._fingerprints[buffer])
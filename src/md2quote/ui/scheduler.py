@@ -0,0 +1,102 @@
+"""
+Adaptive scheduling of preview refreshes.
+
+Kept apart from the preview widget so the main window can schedule refreshes
+before QtPdf and the render pipeline are loaded.
+"""
+
+import time
+from PyQt6.QtCore import QTimer, QObject, pyqtSignal
+from ..core.tracing import tracer
+
+
+# Bounds and scaling of the adaptive preview debounce
+MIN_DEBOUNCE_MS = 150
+MAX_DEBOUNCE_MS = 2000
+INITIAL_DEBOUNCE_MS = 400
+DEBOUNCE_FACTOR = 1.5
+
+# Weight of the newest sample in the render time averages
+EWMA_ALPHA = 0.3
+
+
+class PreviewScheduler(QObject):
+    """
+    Decides when the preview is refreshed.
+    
+    The debounce after the last edit follows an exponentially weighted moving
+    average of the measured parse, render and PDF times, so small documents
+    update quickly and large ones are not re-rendered on every pause. A refresh
+    is never started while one is in flight; requests arriving meanwhile are
+    collapsed into a single refresh that runs when the current one finishes.
+    """
+    
+    refreshRequested = pyqtSignal()
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._on_timeout)
+        
+        self._estimates = {}  # stage -> EWMA in seconds
+        self._in_flight = False
+        self._pending = False
+        self._started_at = None
+        self.last_duration = None  # Seconds, parse to PDF, of the last refresh
+    
+    @property
+    def in_flight(self) -> bool:
+        return self._in_flight
+    
+    def estimate(self) -> float | None:
+        """Returns the estimated duration of a full refresh in seconds."""
+        if not self._estimates:
+            return None
+        return sum(self._estimates.values())
+    
+    def debounce_ms(self) -> int:
+        """Returns the delay between the last edit and the next refresh."""
+        estimate = self.estimate()
+        if estimate is None:
+            return INITIAL_DEBOUNCE_MS
+        delay = int(estimate * 1000 * DEBOUNCE_FACTOR)
+        return max(MIN_DEBOUNCE_MS, min(MAX_DEBOUNCE_MS, delay))
+    
+    def request(self):
+        """Schedules a refresh after the adaptive debounce, restarting it if running."""
+        self._timer.start(self.debounce_ms())
+    
+    def _on_timeout(self):
+        if self._in_flight:
+            self._pending = True
+        else:
+            self.refreshRequested.emit()
+    
+    def defer(self):
+        """Remembers that a refresh is needed once the current one finishes."""
+        self._pending = True
+    
+    def begin(self):
+        """Marks the start of a refresh."""
+        self._in_flight = True
+        self._started_at = time.perf_counter()
+    
+    def record(self, stage: str, seconds: float):
+        """Adds a measured stage duration (e.g. 'parse', 'render', 'pdf') to its average."""
+        previous = self._estimates.get(stage)
+        if previous is None:
+            self._estimates[stage] = seconds
+        else:
+            self._estimates[stage] = EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * previous
+    
+    def finish(self):
+        """Marks the end of a refresh and starts the refresh deferred meanwhile, if any."""
+        if not self._in_flight:
+            return
+        self._in_flight = False
+        self.last_duration = time.perf_counter() - self._started_at
+        tracer.complete("preview.refresh", self._started_at, self.last_duration)
+        if self._pending:
+            self._pending = False
+            QTimer.singleShot(0, self.refreshRequested.emit)
@@ -3,6 +3,25 @@
 import sys
 from pathlib import Path
 
+import yaml
+
+# LibYAML's C implementation parses and emits several times faster than the
+# pure-Python one; PyYAML builds without it fall back transparently.
+try:
+    from yaml import CSafeLoader as YAMLLoader, CSafeDumper as YAMLDumper
+except ImportError:
+    from yaml import SafeLoader as YAMLLoader, SafeDumper as YAMLDumper
+
+
+def yaml_load(stream):
+    """Parses YAML like yaml.safe_load, using the C loader when available."""
+    return yaml.load(stream, Loader=YAMLLoader)
+
+
+def yaml_dump(data, stream=None, **kwargs):
+    """Serializes data like yaml.safe_dump, using the C dumper when available."""
+    return yaml.dump(data, stream, Dumper=YAMLDumper, **kwargs)
+
 
 def get_app_path() -> Path:
     """
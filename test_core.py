@@ -1,12 +1,43 @@
+import asyncio
+import atexit
+import json
+import multiprocessing
 import os
+import re
+import socket
+import subprocess
 import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from jinja2 import Environment
 
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from md2quote.core.parser import MarkdownParser
 from md2quote.core.renderer import TemplateRenderer
-from md2quote.core.config import config
+from md2quote.core.config import config, ConfigLoader
+from md2quote.core.fonts import FontCache
+from md2quote.core.renderer import ChangeTrackingLoader, build_context, template_overlays
+from md2quote.core.tracing import tracer
+from md2quote.core.startup import StartupTimer
+from md2quote.core.pdf_pages import page_fingerprints
+from md2quote.core.pdf_cache import PDFCache
+from md2quote.core.numbering import QuotationCounter
+from md2quote.utils import yaml_dump
+from md2quote.core.llm import LLMService, LLMError, split_sections
+from md2quote.core.llm_edits import EditBlock, EditError, parse_edit_blocks, apply_edit_blocks
+from md2quote.core.style_patch import style_patch_script
+from md2quote.core.clients_io import ClientFileReader, write_clients
+from md2quote.ui.clients_model import ClientListModel, CLIENT_PAGE_SIZE
+from md2quote.ui.scheduler import PreviewScheduler, INITIAL_DEBOUNCE_MS, MIN_DEBOUNCE_MS, MAX_DEBOUNCE_MS
+from md2quote import batch
+from md2quote.batch import BatchRun, collect_inputs
 
 def test_pipeline():
     parser = MarkdownParser()
@@ -38,5 +69,986 @@ def test_pipeline():
     final_html = renderer.render(metadata.get("template", "base"), context)
     print("HTML generated, length:", len(final_html))
 
+
+def test_incremental_parse_matches_full():
+    full_parser = MarkdownParser()
+    incremental_parser = MarkdownParser(incremental=True)
+
+    with open("examples/programming.md", 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    edits = [
+        text,
+        text + "\n+++\n\n## Appendix\n\n- one\n\n- two\n",
+        text.replace("##", "###", 1),
+        text + "\n```\ncode\n\n+++\n```\n",
+    ]
+    for edited in edits:
+        assert incremental_parser.parse_text(edited) == full_parser.parse_text(edited)
+
+
+def _render_without_network(fonts):
+    """Renders the programming example while any network access raises."""
+    def refuse(*args, **kwargs):
+        raise OSError("network access attempted")
+
+    original = (socket.socket.connect, socket.create_connection, socket.getaddrinfo)
+    socket.socket.connect = refuse
+    socket.create_connection = refuse
+    socket.getaddrinfo = refuse
+    try:
+        metadata, html_body = MarkdownParser().parse_file("examples/programming.md")
+        preset = config.get_preset("preset_1")
+        typography = preset['typography']
+        fonts.ensure_families([typography['heading'], typography['body'], typography['mono']], wait=True)
+        context = build_context(metadata, html_body, preset)
+        renderer = TemplateRenderer(use_bytecode_cache=False, fonts=fonts)
+        return renderer.render("base", context, preset_config=context)
+    finally:
+        socket.socket.connect, socket.create_connection, socket.getaddrinfo = original
+
+
+def test_offline_fonts_render_from_local_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        font_file = Path(tmp) / "Custom-SemiBold.ttf"
+        font_file.write_bytes(b"not a real font")
+
+        fonts = FontCache(fonts_dir=Path(tmp) / "fonts", offline=True)
+        heading = config.get_preset("preset_1")['typography']['heading']
+        ok, _ = fonts.import_family(heading, [font_file])
+        assert ok
+
+        html = _render_without_network(fonts)
+        assert "fonts.googleapis.com" not in html
+        assert "@font-face" in html
+        assert "font-weight: 600;" in html
+        assert font_file.name in html
+        assert not fonts.download_family(heading)[0]
+
+
+def test_failed_font_download_does_not_block_render():
+    with tempfile.TemporaryDirectory() as tmp:
+        fonts = FontCache(fonts_dir=Path(tmp) / "fonts", offline=False)
+        finished = []
+        fonts.add_download_listener(lambda family, ok: finished.append((family, ok)))
+        html = _render_without_network(fonts)
+        assert "@font-face" not in html
+        assert not fonts.list_families()
+        assert finished and not any(ok for _, ok in finished)
+
+        # A later successful download is reported, so the preview can be redone
+        fonts.download_family = lambda family: (True, "downloaded")
+        fonts.ensure_families(["Some Family"], wait=True)
+        assert finished[-1] == ("Some Family", True)
+
+def test_google_fonts_links_removed_once_families_are_cached():
+    link = ('<link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600'
+            '&amp;family=JetBrains+Mono&amp;display=swap" rel="stylesheet">')
+    template_overlays.set("font_link_test.html", f"<html><head>{link}</head><body>{{{{ content }}}}</body></html>")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            font_file = Path(tmp) / "Font-Regular.ttf"
+            font_file.write_bytes(b"not a real font")
+            fonts = FontCache(fonts_dir=Path(tmp) / "fonts", offline=False)
+            fonts.download_family = lambda family: (False, "no network in tests")
+            renderer = TemplateRenderer(use_bytecode_cache=False, fonts=fonts)
+            context = {'content': "Body", 'company': {}}
+
+            assert fonts.import_family("Inter", [font_file])[0]
+            assert "fonts.googleapis.com" in renderer.render("font_link_test", context)
+            assert fonts.import_family("JetBrains Mono", [font_file])[0]
+            assert "fonts.googleapis.com" not in renderer.render("font_link_test", context)
+    finally:
+        template_overlays.discard("font_link_test.html")
+
+
+def test_trace_export():
+    tracer.reset()
+    tracer.start()
+    try:
+        metadata, html_body = MarkdownParser().parse_file("examples/programming.md")
+        tracer.count("documents")
+    finally:
+        tracer.stop()
+    MarkdownParser().parse_text("# not recorded")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chrome = json.loads(tracer.export(Path(tmp) / "trace.json").read_text())
+        spans = [e for e in chrome['traceEvents'] if e['ph'] == 'X']
+        assert [e['name'] for e in spans] == ["MarkdownParser.parse_text"]
+        assert chrome['otherData']['counters'] == {"documents": 1}
+
+        lines = (Path(tmp) / "trace.jsonl")
+        tracer.export(lines)
+        events = [json.loads(line) for line in lines.read_text().splitlines()]
+        assert events[-1]['args']['histograms']["MarkdownParser.parse_text"]['count'] == 1
+    tracer.reset()
+
+
+def _minimal_pdf(page_texts, font_tag="ABCDEF"):
+    """Builds a PDF with one hex-encoded text line per page and a shared subset font."""
+    count = len(page_texts)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % (5 + 2 * i) for i in range(count)) + b"] /Count %d >>" % count,
+        b"<< /Type /Font /Subtype /Type0 /BaseFont /" + font_tag.encode() + b"+Inter /Encoding /Identity-H /ToUnicode 4 0 R >>",
+        b"<< /Length 60 >>\nstream\nbeginbfrange\n<0000> <00FF> <0000>\nendbfrange\nendstream",
+    ]
+    for i, text in enumerate(page_texts):
+        content = b"BT /F1 12 Tf <" + "".join(f"{ord(c):04x}" for c in text).encode() + b"> Tj ET"
+        objects.append(b"<< /Type /Page /Parent 2 0 R /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (6 + 2 * i))
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+    body = b"".join(b"%d 0 obj\n" % (n + 1) + obj + b"\nendobj\n" for n, obj in enumerate(objects))
+    return b"%PDF-1.4\n" + body + b"trailer\n<< /Root 1 0 R >>\n%%EOF\n"
+
+
+def test_page_fingerprints_detect_changed_pages():
+    before = page_fingerprints(_minimal_pdf(["one", "two", "three"]))
+    after = page_fingerprints(_minimal_pdf(["one", "TWO", "three"], font_tag="GHIJKL"))
+    assert len(before) == 3
+    assert [a != b for a, b in zip(before, after)] == [False, True, False]
+    assert page_fingerprints(b"not a pdf") is None
+
+
+def test_pdf_cache_lru_disk_tier_and_resource_stamps():
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = PDFCache(max_entries=2)
+        for name in ("a", "b", "c"):
+            memory.put(name, name.encode())
+        assert memory.get("a") is None  # Least recently used, evicted
+        assert memory.get("b") == b"b"
+        memory.put("d", b"d")
+        assert memory.get("c") is None and memory.get("b") == b"b"
+        assert (memory.hits, memory.misses) == (2, 2)
+
+        disk_dir = Path(tmp) / "pdf"
+        PDFCache(max_entries=1, disk_dir=disk_dir).put("x", b"%PDF x")
+        restarted = PDFCache(max_entries=1, disk_dir=disk_dir)
+        assert restarted.get("x") == b"%PDF x"  # Served from disk after a restart
+
+        pruned_dir = Path(tmp) / "pruned"
+        pruned = PDFCache(disk_dir=pruned_dir, max_disk_entries=2)
+        for i, name in enumerate(("y", "z", "w")):
+            pruned.put(name, name.encode())
+            os.utime(pruned_dir / f"{name}.pdf", ns=((i + 1) * 10**9,) * 2)  # Used in this order
+        pruned.put("v", b"v")
+        assert sorted(f.stem for f in pruned_dir.glob("*.pdf")) == ["v", "w"]
+
+        # Replacing a referenced file at the same path changes the key
+        logo = Path(tmp) / "logo.png"
+        logo.write_bytes(b"old")
+        html = f'<img src="{logo.as_uri()}"><img src="logo.png"><a href="https://example.org">x</a>'
+        key = PDFCache.key(html, (20, 20, 20, 20), base_dir=tmp)
+        assert PDFCache.key(html, (20, 20, 20, 20), base_dir=tmp) == key
+        logo.write_bytes(b"new logo")
+        assert PDFCache.key(html, (20, 20, 20, 20), base_dir=tmp) != key
+        assert PDFCache.key(html, (20, 20, 20, 21), base_dir=tmp) != PDFCache.key(html, (20, 20, 20, 20), base_dir=tmp)
+
+
+class _TempConfigLoader(ConfigLoader):
+    """ConfigLoader using a given directory instead of ~/.config/md2quote."""
+
+    def __init__(self, config_dir):
+        self._temp_dir = Path(config_dir)
+        super().__init__()
+        atexit.unregister(self.flush)  # The directory is gone by then
+
+    def _get_config_dir(self):
+        return self._temp_dir
+
+
+def test_config_writes_are_coalesced_and_atomic():
+    with tempfile.TemporaryDirectory() as tmp:
+        loader = _TempConfigLoader(tmp)
+        loader.flush()
+
+        writes = []
+        original_write = loader._write_atomic
+        loader._write_atomic = lambda text: (writes.append(text), original_write(text))
+
+        keys = [loader.add_client({'institution': f"Client {i}"})[0] for i in range(50)]
+        assert loader.get_client(keys[-1])['institution'] == "Client 49"  # Read-your-writes
+        assert writes == []
+
+        loader.flush()
+        loader.flush()
+        assert len(writes) == 1
+        assert not list(Path(tmp).glob("*.tmp"))
+
+        reloaded = _TempConfigLoader(tmp)
+        assert len(reloaded.get_clients()) == 50
+
+        # The snapshot is the written state, not affected by later changes
+        loader.config['clients'][keys[0]]['institution'] = "Unsaved edit"
+        assert loader._load_snapshot()['clients'][keys[0]]['institution'] == "Client 0"
+        assert loader._load_snapshot() == reloaded.config
+
+        # With a Qt application, the timer serializes in the main thread, also
+        # for changes made on other threads
+        app = _qt_app()
+        writers = []
+        loader._write_atomic = lambda text: (writers.append(threading.current_thread()), original_write(text))
+        worker = threading.Thread(target=lambda: loader.add_client({'institution': "From a thread"}))
+        worker.start()
+        worker.join()
+        loader.add_client({'institution': "Same write"})
+        assert writers == []
+        deadline = time.monotonic() + 5
+        while loader._dirty and time.monotonic() < deadline:
+            app.processEvents()
+            time.sleep(0.01)
+        assert writers == [threading.main_thread()]
+        names = {c['institution'] for c in _TempConfigLoader(tmp).get_clients().values()}
+        assert {"From a thread", "Same write", "Unsaved edit"} <= names
+
+
+def test_sqlite_client_store_imports_yaml_and_searches():
+    with tempfile.TemporaryDirectory() as tmp:
+        loader = _TempConfigLoader(tmp)
+        for i in range(30):
+            loader.add_client({'institution': f"Institut {i:02d}", 'email': f"info{i}@example.org"})
+        loader.add_client({'institution': "Zürich Labs", 'contact': "Dr. Jane Roe", 'address': "Main St 1"})
+
+        loader.config['clients_store'] = 'sqlite'
+        assert loader.count_clients() == 31
+        assert 'clients' not in loader.config  # Moved out of the YAML
+        loader.flush()
+
+        reloaded = _TempConfigLoader(tmp)
+        assert reloaded.client_store is not None
+        assert reloaded.count_clients() == 31
+
+        page = reloaded.search_clients(offset=10, limit=5)
+        assert [institution for _, institution in page] == [f"Institut {i:02d}" for i in range(10, 15)]
+
+        assert [inst for _, inst in reloaded.search_clients("jane zur")] == ["Zürich Labs"]
+        assert reloaded.count_clients("info7@example") == 1
+        assert reloaded.count_clients("example.org") == 30
+
+        key = reloaded.find_client_key("Zürich Labs")
+        assert reloaded.update_client(key, {'institution': "Zurich Labs", 'email': "lab@zurich.ch"})[0]
+        assert reloaded.search_clients("lab@zurich") == [(key, "Zurich Labs")]
+        assert reloaded.delete_client(key)[0]
+        assert reloaded.count_clients("zurich") == 0
+        reloaded.client_store.close()
+        loader.client_store.close()
+
+
+def test_yaml_and_sqlite_client_search_agree():
+    clients = [
+        {'institution': "Zürich Labs", 'contact': "Dr. Jane Roe", 'email': "Lab@Zürich.ch"},
+        {'institution': "Café Crème", 'contact': "Ève Noël", 'email': "ève@cafe.fr"},
+        {'institution': "Zurich Insurance", 'email': "info@zurich.com"},
+        {'institution': "Plain Co", 'email': "PLAIN@example.org"},
+    ]
+    queries = ["zur", "ZÜR", "zurich lab", "cafe creme", "eve", "noel", "lab@zurich", "plain@EXAMPLE", "xyz"]
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for store in ('yaml', 'sqlite'):
+            loader = _TempConfigLoader(Path(tmp) / store)
+            loader.config['clients_store'] = store
+            for client in clients:
+                loader.add_client(client)
+            results[store] = {
+                query: ([inst for _, inst in loader.search_clients(query)], loader.count_clients(query))
+                for query in queries
+            }
+            # Email matches for imports compare like SQLite's NOCASE
+            assert loader.import_clients([{'institution': "Plain Co", 'email': "plain@example.ORG"}]) == (0, 1, 0)
+            loader.flush()
+            if loader.client_store is not None:
+                loader.client_store.close()
+        assert results['yaml'] == results['sqlite']
+        assert results['sqlite']["zur"] == (["Zurich Insurance", "Zürich Labs"], 2)
+        assert results['sqlite']["cafe creme"] == (["Café Crème"], 1)
+
+
+def test_bulk_client_import_dedupes_by_email():
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "crm.csv"
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            f.write("\ufeffCompany,Name,E-Mail,Phone\n")
+            for i in range(2500):
+                f.write(f"Firm {i},Person {i},user{i % 2000}@Example.org,0123\n")
+            f.write('"Multi, Line",,,\n,,,0123\n')
+
+        for store in ('yaml', 'sqlite'):
+            loader = _TempConfigLoader(Path(tmp) / store)
+            loader.config['clients_store'] = store
+            loader.add_client({'institution': "Old Firm", 'email': "user5@example.org", 'address': "Kept St 1"})
+
+            reader = ClientFileReader(csv_path)
+            seen = []
+            assert loader.import_clients(reader, seen.append) == (2000, 501, 1)
+            assert reader.bytes_read == reader.size and seen[-1] == 2502
+            assert loader.count_clients() == 2001
+            user5 = loader.get_client(loader.find_client_key("Firm 2005"))
+            assert user5 == {'contact': "Person 2005", 'institution': "Firm 2005",
+                             'email': "user5@Example.org", 'address': "Kept St 1"}
+
+            # Exported and imported again, nothing changes
+            vcf_path = Path(tmp) / f"{store}.vcf"
+            assert write_clients(vcf_path, loader.iter_clients()) == 2001
+            assert loader.import_clients(ClientFileReader(vcf_path)) == (0, 2001, 0)
+            assert loader.count_clients() == 2001
+            assert loader.get_client(loader.find_client_key("Multi, Line"))['contact'] == ""
+            loader.flush()
+            if loader.client_store is not None:
+                loader.client_store.close()
+
+
+def test_cancelled_client_import_is_isolated_from_single_writes():
+    with tempfile.TemporaryDirectory() as tmp:
+        loader = _TempConfigLoader(tmp)
+        loader.config['clients_store'] = 'sqlite'
+        loader.add_client({'institution': "Existing"})
+        store = loader.client_store
+        events = []
+
+        def progress(processed):
+            # Between batches: other writers are turned away and readers see the old rows
+            events.append((loader.add_client({'institution': "During import"})[1] is not None, store.count()))
+            raise KeyboardInterrupt  # Cancel
+
+        clients = ({'institution': f"Firm {i}", 'email': f"f{i}@example.org"} for i in range(2500))
+        try:
+            loader.import_clients(clients, progress)
+        except KeyboardInterrupt:
+            pass
+        assert events == [(True, 1)]
+        assert store.count() == 1
+        assert loader.add_client({'institution': "After import"})[1] is None
+        assert store.count() == 2
+        store.close()
+
+
+def _allocate_quotation_numbers(db_path, results):
+    counter = QuotationCounter(db_path)
+    values = [counter.reserve('preset_1', '{YYYY}-{NNN}', 2025, 1) for _ in range(40)]
+    for _ in range(5):
+        first = counter.reserve('preset_1', '{YYYY}-{NNN}', 2025, 1, count=10)
+        values.extend(range(first, first + 10))
+    results.put(values)
+
+
+def test_quotation_numbers_are_unique_across_processes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "counters.db"
+        QuotationCounter(db_path)
+
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=_allocate_quotation_numbers, args=(db_path, results))
+                   for _ in range(6)]
+        for worker in workers:
+            worker.start()
+        values = [v for _ in workers for v in results.get(timeout=60)]
+        for worker in workers:
+            worker.join()
+
+        assert sorted(values) == list(range(1, 6 * 90 + 1))
+
+        # {YYYY} formats restart every year, {MM} formats every month
+        counter = QuotationCounter(db_path)
+        assert counter.reserve('preset_1', '{YYYY}-{NNN}', 2025, 2) == 541
+        assert counter.reserve('preset_1', '{YYYY}-{NNN}', 2026, 1) == 1
+        assert counter.reserve('preset_2', '{YYYY}{MM}-{NN}', 2026, 1, seed=(7, 2026, 1)) == 8
+        assert counter.reserve('preset_2', '{YYYY}{MM}-{NN}', 2026, 2) == 1
+
+        loader = _TempConfigLoader(tmp)
+        loader.config['presets']['preset_3']['quotation_number'] = {'format': 'Q{N}', 'counter': 41}
+        assert loader.generate_quotation_numbers('preset_3', 3) == ['Q42', 'Q43', 'Q44']
+        assert loader.get_last_quotation_number('preset_3') == 'Q44'
+        loader.reset_quotation_counter('preset_3')
+        assert loader.generate_quotation_number('preset_3') == 'Q1'
+        loader.flush()
+
+
+def test_quotation_counter_only_moves_forward_unless_reset():
+    with tempfile.TemporaryDirectory() as tmp:
+        loader = _TempConfigLoader(tmp)
+        loader.config['presets']['preset_3']['quotation_number'] = {'format': 'Q{N}', 'counter': 0}
+        assert loader.generate_quotation_number('preset_3') == 'Q1'
+        loader.flush()
+        stale = _TempConfigLoader(tmp)  # Another window, loaded now
+        assert loader.generate_quotation_numbers('preset_3', 2) == ['Q2', 'Q3']
+
+        # Lagging copies of the counter in config.yaml never move it back: a window
+        # saving its stale config, or a crash before the config was written
+        stale.replace_config(stale.config, yaml_dump(stale.config, sort_keys=False))
+        assert _TempConfigLoader(tmp).generate_quotation_number('preset_3') == 'Q4'
+        assert stale.generate_quotation_number('preset_3') == 'Q5'
+
+        # Set through the settings dialog
+        loader.set_quotation_counter('preset_3', 41)
+        assert stale.generate_quotation_number('preset_3') == 'Q42'
+        with pytest.raises(ValueError):
+            loader.set_quotation_counter('preset_3', 10)
+        assert loader.generate_quotation_number('preset_3') == 'Q43'
+
+        # A yearly format without last_reset_year keeps the value that was set
+        year = time.localtime().tm_year
+        loader.config['presets']['preset_2']['quotation_number'] = {'format': '{YYYY}-{NNN}', 'counter': 0}
+        loader.set_quotation_counter('preset_2', 20)
+        assert loader.generate_quotation_number('preset_2') == f"{year}-021"
+
+        # Only an explicit reset starts over
+        loader.reset_quotation_counter('preset_3')
+        assert stale.generate_quotation_number('preset_3') == 'Q1'
+
+
+def test_batch_collects_inputs_and_numbers_unnumbered_documents():
+    with tempfile.TemporaryDirectory() as tmp:
+        quotes = Path(tmp) / "quotes"
+        (quotes / "sub").mkdir(parents=True)
+        (quotes / "b.md").write_text("# B\n")
+        (quotes / "a.md").write_text("---\nquotation:\n  number: Q-7\n---\n\n# A\n")
+        (quotes / "sub" / "c.md").write_text("---\nquotation:\n  date: 2026-01-01\n---\n\n# C\n")
+        (quotes / "notes.txt").write_text("not markdown")
+
+        # Directories, files and recursive globs, without duplicates
+        files = collect_inputs([str(quotes), str(quotes / "a.md"), str(quotes / "**" / "*.md")])
+        assert files == [quotes / "a.md", quotes / "b.md", quotes / "sub" / "c.md"]
+        assert collect_inputs([str(quotes / "missing" / "*.md")]) == []
+
+        loader = _TempConfigLoader(Path(tmp) / "config")
+        loader.config['presets']['preset_3']['quotation_number'] = {'format': 'Q{N}', 'counter': 0}
+        original = batch.config
+        batch.config = loader
+        try:
+            run = BatchRun(files, preset_key='preset_3', assign_numbers=True)
+            run._reserve_numbers()
+            assert run.numbers == {quotes / "b.md": 'Q1', quotes / "sub" / "c.md": 'Q2'}
+
+            # The numbers are saved, so the next run does not number the documents again
+            parser = MarkdownParser()
+            assert parser.read_metadata(str(quotes / "b.md"))['quotation'] == {'number': 'Q1'}
+            assert parser.read_metadata(str(quotes / "sub" / "c.md"))['quotation']['number'] == 'Q2'
+            assert parser.parse_file(str(quotes / "sub" / "c.md"))[0]['quotation']['date'].year == 2026
+            assert (quotes / "b.md").read_text().endswith("---\n# B\n")
+            rerun = BatchRun(files, preset_key='preset_3', assign_numbers=True)
+            rerun._reserve_numbers()
+            assert rerun.numbers == {}
+            assert loader.generate_quotation_number('preset_3') == 'Q3'
+        finally:
+            batch.config = original
+
+
+def test_batch_command_renders_headless():
+    probe = subprocess.run([sys.executable, "-c", "import PyQt6.QtWebEngineWidgets"], capture_output=True)
+    if probe.returncode != 0:
+        pytest.skip("QtWebEngine cannot be loaded")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        quotes = Path(tmp) / "quotes"
+        quotes.mkdir()
+        for name in ("one", "two", "three"):
+            (quotes / f"{name}.md").write_text(f"# Quote {name}\n\nText.\n")
+
+        # A fresh process, as `md2quote batch` runs: QtWebEngine loads after the QApplication
+        script = (f"import sys; sys.path.insert(0, {str(Path(__file__).parent / 'src')!r}); "
+                  "from md2quote.batch import main; sys.exit(main(sys.argv[1:]))")
+        env = {**os.environ, 'HOME': tmp, 'QT_QPA_PLATFORM': "offscreen"}
+        result = subprocess.run([sys.executable, "-c", script, str(quotes), "-o", str(Path(tmp) / "out"),
+                                 "-j", "2", "--offline"],
+                                capture_output=True, text=True, env=env, timeout=300)
+        assert result.returncode == 0, result.stdout + result.stderr
+        assert "Rendered 3/3 documents" in result.stdout
+        for name in ("one", "two", "three"):
+            assert (Path(tmp) / "out" / f"{name}.pdf").read_bytes().startswith(b"%PDF")
+
+
+def test_config_snapshot_skips_parsing_until_file_changes():
+    import md2quote.core.config as config_module
+
+    with tempfile.TemporaryDirectory() as tmp:
+        loader = _TempConfigLoader(tmp)
+        loader.add_client({'institution': "Snapshot GmbH"})
+        loader.flush()
+
+        parses = []
+        original_load = config_module.yaml_load
+        config_module.yaml_load = lambda stream: (parses.append(1), original_load(stream))[1]
+        try:
+            cached = _TempConfigLoader(tmp)
+            assert parses == []
+            assert cached.config == loader.config
+
+            # Any change to config.yaml invalidates the snapshot
+            with open(loader.config_path, 'a', encoding='utf-8') as f:
+                f.write("extra_setting: 1\n")
+            reparsed = _TempConfigLoader(tmp)
+            assert len(parses) == 1
+            assert reparsed.get('extra_setting') == 1
+
+            assert _TempConfigLoader(tmp).get('extra_setting') == 1
+            assert len(parses) == 1
+        finally:
+            config_module.yaml_load = original_load
+
+
+class _StubLLMHandler(BaseHTTPRequestHandler):
+    """Chat completions endpoint that fails the first request with a 503."""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    requests_seen = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.requests_seen.append(body)
+        if len(self.requests_seen) == 1:
+            self._reply(503, b'{"error": {"message": "overloaded"}}', 'application/json')
+        elif body['stream']:
+            events = [{'choices': [{'delta': {'content': word}}]} for word in ("Hello", " world")]
+            payload = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+            self._reply(200, payload.encode(), 'text/event-stream')
+        else:
+            reply = {'choices': [{'message': {'content': "Generated"}}]}
+            self._reply(200, json.dumps(reply).encode(), 'application/json')
+
+    def _reply(self, status, payload, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_llm_requests_reuse_connection_and_retry():
+    _StubLLMHandler.requests_seen = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            loader = _TempConfigLoader(tmp)
+            loader.config['llm'].update({
+                'api_key': "test-key",
+                'api_url': f"http://127.0.0.1:{server.server_port}/v1/chat/completions",
+                'timeout': 5,
+            })
+            service = LLMService(loader)
+            service.http_client(service.get_config()).backoff_base = 0.01
+
+            assert service.generate("Write an intro") == "Generated"
+            assert "".join(service.generate_stream("Write an intro")) == "Hello world"
+            assert len(_StubLLMHandler.requests_seen) == 3
+            # The 503, the retry and the streamed request share one connection
+            assert service.http_client(service.get_config()).connections_opened == 1
+
+            loader.config['llm']['api_key'] = ""
+            try:
+                service.generate("Write an intro")
+                assert False, "expected LLMError"
+            except LLMError:
+                pass
+            loader.flush()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_llm_response_cache_replays_chunks():
+    _StubLLMHandler.requests_seen = [{}]  # Skips the stub's initial 503
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            loader = _TempConfigLoader(tmp)
+            loader.config['llm'].update({
+                'api_key': "test-key",
+                'api_url': f"http://127.0.0.1:{server.server_port}/v1/chat/completions",
+                'cache': True,
+            })
+            service = LLMService(loader)
+
+            first = list(service.generate_stream("Write an intro", "# Offer"))
+            replay = list(service.generate_stream("Write an intro", "# Offer"))
+            assert first == replay == ["Hello", " world"]
+            assert len(_StubLLMHandler.requests_seen) == 2
+
+            list(service.generate_stream("Write an intro", "# Changed offer"))
+            assert len(_StubLLMHandler.requests_seen) == 3
+
+            loader.config['llm']['cache_ttl_hours'] = 0
+            list(service.generate_stream("Write an intro", "# Offer"))
+            assert len(_StubLLMHandler.requests_seen) == 4
+
+            cache = service.response_cache(service.get_config())
+            cache.max_bytes = 0
+            cache.prune()
+            assert not list(cache.cache_dir.glob('*.json'))
+            loader.flush()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class _SectionStubHandler(BaseHTTPRequestHandler):
+    """Streams a rewritten section per request with chunked encoding, tracking concurrency."""
+
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        heading = re.search(r'^## .*$', body['messages'][1]['content'], re.M).group(0)
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        time.sleep(0.1)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        events = [{'choices': [{'delta': {'content': text}}]} for text in (heading, "\n\nRewritten.\n")]
+        for payload in [f"data: {json.dumps(event)}\n\n" for event in events] + ["data: [DONE]\n\n"]:
+            data = payload.encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+        with cls.lock:
+            cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def test_llm_generates_sections_concurrently():
+    document = "# Offer\n\nIntro.\n\n" + "".join(f"## Part {i}\n\nText {i}.\n\n" for i in range(5))
+    parts = split_sections(document)
+    assert "".join(parts) == document
+    assert parts[0] == "# Offer\n\nIntro.\n\n"
+    assert len(parts) == 6
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SectionStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            loader = _TempConfigLoader(tmp)
+            loader.config['llm'].update({
+                'api_key': "test-key",
+                'api_url': f"http://127.0.0.1:{server.server_port}/v1/chat/completions",
+            })
+            service = LLMService(loader)
+
+            chunks = []
+            results = asyncio.run(service.generate_sections(
+                "Make it formal", parts[1:], on_chunk=lambda index, chunk: chunks.append((index, chunk)),
+                max_concurrency=2
+            ))
+            assert results == [f"## Part {i}\n\nRewritten.\n" for i in range(5)]
+            assert sorted(chunks) == sorted(
+                [(i, f"## Part {i}") for i in range(5)] + [(i, "\n\nRewritten.\n") for i in range(5)]
+            )
+            assert _SectionStubHandler.max_in_flight == 2
+            loader.flush()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_llm_edit_blocks_apply_atomically():
+    document = "# Offer\n\n## Scope\n\nWebsite redesign.   \n\n## Price\n\nTotal: 1000 EUR\n"
+    response = """Here are the changes:
+
+```
+<<<<<<< SEARCH
+Website redesign.
+=======
+Website redesign and hosting.
+>>>>>>> REPLACE
+
+<<<<<<< SEARCH
+Total: 1000 EUR
+=======
+Total: 1200 EUR
+>>>>>>> REPLACE
+
+<<<<<<< SEARCH
+=======
+## Terms
+
+Valid for 30 days.
+>>>>>>> REPLACE
+```
+"""
+    blocks = parse_edit_blocks(response)
+    assert len(blocks) == 3
+    # Trailing whitespace the model dropped still matches
+    assert apply_edit_blocks(document, blocks) == (
+        "# Offer\n\n## Scope\n\nWebsite redesign and hosting.\n\n## Price\n\n"
+        "Total: 1200 EUR\n\n## Terms\n\nValid for 30 days.\n"
+    )
+
+    # One block that does not match rejects the whole patch
+    bad = blocks[:1] + [EditBlock("Total: 999 EUR\n", "Total: 0 EUR\n")]
+    for edits in (bad, [EditBlock("## ", "### ")]):
+        try:
+            apply_edit_blocks(document, edits)
+            assert False, "expected EditError"
+        except EditError:
+            pass
+
+    try:
+        parse_edit_blocks("Sure! The document looks good.")
+        assert False, "expected EditError"
+    except EditError:
+        pass
+
+
+def test_style_patch_only_for_style_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        renderer = TemplateRenderer(use_bytecode_cache=False, fonts=FontCache(fonts_dir=Path(tmp), offline=True))
+        metadata, html_body = MarkdownParser().parse_text("# Offer\n\nSome text.")
+
+        def render(body=html_body, **changes):
+            preset = json.loads(json.dumps(config.get_preset("preset_1")))
+            preset['company']['logo'] = Path(tmp, "logo.svg").as_uri()
+            preset['company']['show_logo'] = True
+            for key, value in changes.items():
+                section, name = key.split('__')
+                preset[section][name] = value
+            context = build_context(metadata, body, preset)
+            return renderer.render("base", context, preset_config=context)
+
+        html = render()
+        script = style_patch_script(html, render(colors__primary="#123456", company__logo_width=77))
+        assert script is not None
+        assert "#123456" in script and "width: 77mm" in script
+        assert "Some text" not in script
+
+        assert style_patch_script(html, render(body="<p>Other text.</p>")) is None
+        assert style_patch_script(html, render(company__name="Another Company")) is None
+
+
+def test_change_tracking_loader_sees_racy_edits_and_shadowing():
+    with tempfile.TemporaryDirectory() as tmp:
+        user_dir, app_dir = Path(tmp) / "user", Path(tmp) / "app"
+        user_dir.mkdir()
+        app_dir.mkdir()
+        template = app_dir / "note.html"
+        template.write_text("one", encoding='utf-8')
+        env = Environment(loader=ChangeTrackingLoader([str(user_dir), str(app_dir)]))
+        assert env.get_template("note.html").render() == "one"
+
+        # Same size and mtime, written within the timestamp resolution
+        stat = template.stat()
+        template.write_text("two", encoding='utf-8')
+        os.utime(template, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert template.stat().st_mtime_ns == stat.st_mtime_ns
+        assert env.get_template("note.html").render() == "two"
+
+        # A file with the same name earlier in the search path takes over
+        (user_dir / "note.html").write_text("mine", encoding='utf-8')
+        assert env.get_template("note.html").render() == "mine"
+
+
+def test_template_overlays_serve_unsaved_css():
+    with tempfile.TemporaryDirectory() as tmp:
+        renderer = TemplateRenderer(use_bytecode_cache=False, fonts=FontCache(fonts_dir=Path(tmp), offline=True))
+        preset = config.get_preset("preset_1")
+        context = build_context({}, "<p>Body</p>", preset)
+        saved = renderer.render("preset_1", context, preset_config=context)
+        assert "unsaved-rule" not in saved
+
+        css_path = Path("templates/preset_1.css")
+        mtime = css_path.stat().st_mtime_ns
+        template_overlays.set("preset_1.css", ".unsaved-rule { color: red; }")
+        try:
+            edited = renderer.render("preset_1", context, preset_config=context)
+            assert ".unsaved-rule { color: red; }" in edited
+            assert "Body" in edited
+        finally:
+            assert template_overlays.discard("preset_1.css")
+        assert css_path.stat().st_mtime_ns == mtime
+        assert renderer.render("preset_1", context, preset_config=context) == saved
+
+
+def test_client_list_model_pages_and_updates_in_place():
+    with tempfile.TemporaryDirectory() as tmp:
+        loader = _TempConfigLoader(tmp)
+        loader.config['clients_store'] = 'sqlite'
+        loader.import_clients({'institution': f"Client {i:04d}", 'email': f"c{i}@example.org"}
+                              for i in range(CLIENT_PAGE_SIZE + 50))
+
+        model = ClientListModel(loader)
+        model.set_query()
+        assert (model.rowCount(), model.total) == (CLIENT_PAGE_SIZE, CLIENT_PAGE_SIZE + 50)
+        assert model.canFetchMore()
+        model.fetchMore()
+        assert model.rowCount() == model.total and not model.canFetchMore()
+
+        moved = []
+        model.rowsMoved.connect(lambda *args: moved.append(args[1]))
+        key = model.client_key(10)
+        loader.update_client(key, {'institution': "Client 0100a", 'email': "c10@example.org"})
+        model.client_changed(key)
+        assert moved == [10]
+        assert model.row_of(key) == 100 and model.data(model.index(100)) == "Client 0100a"
+
+        added, _ = loader.add_client({'institution': "Client 0000a"})
+        model.client_changed(added)
+        assert model.row_of(added) == 1 and model.rowCount() == model.total
+
+        model.set_query("0100")
+        assert [model.data(model.index(row)) for row in range(model.rowCount())] == ["Client 0100", "Client 0100a"]
+        loader.delete_client(key)
+        model.client_changed(key)
+        assert model.row_of(key) == -1 and model.total == 1
+
+        # The header combo box leaves out clients without an institution
+        loader.client_store.put('unnamed', {'contact': "No Institution"})
+        named = ClientListModel(loader, named_only=True)
+        named.set_query()
+        assert named.total == loader.count_clients() - 1 and named.row_of('unnamed') == -1
+        named.client_changed('unnamed')
+        assert named.row_of('unnamed') == -1
+        loader.client_store.close()
+
+
+def _qt_app():
+    """Returns the application for tests that need a Qt event loop, creating it off-screen."""
+    try:
+        import PyQt6.QtWebEngineWidgets  # Must be loaded before the application is created
+    except ImportError:
+        pass
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+def test_preview_scheduler_adapts_debounce_and_collapses_requests():
+    app = _qt_app()
+    scheduler = PreviewScheduler()
+    refreshes = []
+    scheduler.refreshRequested.connect(lambda: refreshes.append(True))
+
+    # Bounded debounce from the averaged stage times
+    assert scheduler.debounce_ms() == INITIAL_DEBOUNCE_MS
+    for stage in ('parse', 'render', 'pdf'):
+        scheduler.record(stage, 0.01)
+    assert scheduler.debounce_ms() == MIN_DEBOUNCE_MS
+    scheduler.record('pdf', 1.0)
+    assert abs(scheduler.estimate() - (0.02 + 0.3 * 1.0 + 0.7 * 0.01)) < 1e-9
+    assert scheduler.debounce_ms() == int(scheduler.estimate() * 1500)
+    scheduler.record('pdf', 10.0)
+    assert scheduler.debounce_ms() == MAX_DEBOUNCE_MS
+
+    scheduler.request()
+    assert scheduler._timer.isActive() and scheduler._timer.interval() == MAX_DEBOUNCE_MS
+    scheduler._timer.stop()
+
+    # No refresh starts while one is in flight; the requests meanwhile become one
+    scheduler.begin()
+    scheduler._on_timeout()
+    scheduler.defer()
+    scheduler._on_timeout()
+    app.processEvents()
+    assert refreshes == [] and scheduler.in_flight
+    scheduler.finish()
+    app.processEvents()
+    assert refreshes == [True] and not scheduler.in_flight
+    assert scheduler.last_duration is not None
+
+    # Finishing twice, or with nothing deferred, starts nothing
+    scheduler.finish()
+    scheduler.begin()
+    scheduler.finish()
+    app.processEvents()
+    assert refreshes == [True]
+
+    scheduler._on_timeout()
+    assert refreshes == [True, True]
+
+
+def test_render_service_warms_up_before_the_first_job():
+    app = _qt_app()
+    try:
+        from md2quote.core.pdf import PDFRenderService
+    except ImportError as e:
+        pytest.skip(f"QtWebEngine cannot be loaded: {e}")
+
+    service = PDFRenderService(worker_count=2)
+    events = []
+    service.warmedUp.connect(lambda ms: events.append(('warm_up', ms)))
+    service.pdfReady.connect(lambda job_id, pdf_bytes: events.append(('pdf', job_id, pdf_bytes)))
+    service.renderFailed.connect(lambda job_id, message: events.append(('failed', job_id, message)))
+
+    service.warm_up()
+    service.warm_up()  # Warms up once
+    job_id = service.submit("<html><body><p>First preview</p></body></html>")
+    deadline = time.monotonic() + 60
+    while len(events) < 2 and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+
+    assert [e[0] for e in events] == ['warm_up', 'pdf'], events
+    assert events[1][1] == job_id and events[1][2].startswith(b"%PDF")
+    stats = service.stats()
+    assert stats['warm_up_ms'] == events[0][1] and stats['completed'] == 1
+
+
+def test_live_preview_reuses_parsed_document_and_renderer():
+    from md2quote.ui.main_window import MainWindow
+
+    parsed = []
+
+    class CountingParser(MarkdownParser):
+        def parse_text(self, text):
+            parsed.append(text)
+            return super().parse_text(text)
+
+    header_data = {'quotation': {'number': "Q-1"}, 'client': {'institution': "ACME"}}
+    window = SimpleNamespace(parser=CountingParser(incremental=True), _parsed_document=None,
+                             header=SimpleNamespace(get_data=lambda: json.loads(json.dumps(header_data))))
+    window._merge_header_data = lambda metadata, data: MainWindow._merge_header_data(window, metadata, data)
+    text = "---\nquotation:\n  number: Q-0\n---\n\n# Offer\n"
+
+    first = MainWindow._parse_document(window, text)
+    assert first[0]['quotation']['number'] == "Q-1" and first[0]['client']['institution'] == "ACME"
+    assert MainWindow._parse_document(window, text)[0] is first[0] and len(parsed) == 1
+
+    header_data['client']['institution'] = "Other"
+    assert MainWindow._parse_document(window, text)[0]['client']['institution'] == "Other"
+    MainWindow._parse_document(window, text + "\nMore.\n")
+    assert len(parsed) == 3
+
+    # Preset overrides go through the one renderer; the shared metadata is left alone
+    metadata, html_body = MainWindow._parse_document(window, text + "\nMore.\n")
+    renderer = TemplateRenderer(use_bytecode_cache=False)
+    preset = config.get_preset("preset_1")
+    html = []
+    for color in ("#123456", "#abcdef"):
+        override = {**preset, 'colors': {**preset.get('colors', {}), 'primary': color}}
+        context = build_context(metadata, html_body, override)
+        html.append(renderer.render("base", context, preset_config=context))
+    assert "#123456" in html[0] and "#abcdef" in html[1] and "#123456" not in html[1]
+    assert MainWindow._parse_document(window, text + "\nMore.\n") == (metadata, html_body)
+    assert len(parsed) == 3
+
+
+def test_main_window_defers_preview_pipeline_and_dialogs():
+    deferred = ['PyQt6.QtWebEngineWidgets', 'PyQt6.QtWebEngineCore', 'PyQt6.QtPdf', 'mistune', 'jinja2',
+                'md2quote.ui.preview', 'md2quote.ui.config_dialog', 'md2quote.ui.clients_dialog',
+                'ssl', 'asyncio', 'urllib.request']
+    script = (f"import sys; sys.path.insert(0, {str(Path(__file__).parent / 'src')!r}); "
+              f"import md2quote.ui.main_window; print([m for m in {deferred!r} if m in sys.modules])")
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+    timer = StartupTimer()
+    timer.mark("imports")
+    timer.mark("window")
+    first = timer.marks["imports"]
+    timer.mark("imports")
+    assert list(timer.marks) == ["imports", "window"] and timer.marks["imports"] == first
+    assert timer.marks["window"] >= first and json.loads(timer.report()) == timer.marks
+
+
 if __name__ == "__main__":
     test_pipeline()